@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Micro-benchmark for the payment link lookup indexes.
+
+Fills an in-memory ``PaymentLinkGenerator`` up to one million links and
+measures ``mark_payment_completed`` and ``get_user_payments`` at each size.
+With the secondary indexes the per-call latency should stay flat.
+
+    python benchmarks/bench_payment_index.py [--max-links 1000000]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("BOT_TOKEN", "BENCHMARK_TOKEN")
+os.environ.setdefault("BOLD_IDENTITY_KEY", "BENCHMARK_KEY")
+
+from bot.config import PLANS  # noqa: E402
+from bot.payment_links import PaymentLinkGenerator  # noqa: E402
+
+PLAN_NAMES = [info["name"] for info in PLANS.values()]
+
+
+async def _time_calls(func, args_list) -> float:
+    """Return the mean latency in microseconds for ``func(*args)``."""
+    start = time.perf_counter()
+    for args in args_list:
+        await func(*args)
+    return (time.perf_counter() - start) / len(args_list) * 1e6
+
+
+async def run(max_links: int, samples: int) -> None:
+    generator = PaymentLinkGenerator(store=None, cache_size=0)
+    sizes = [size for size in (1_000, 10_000, 100_000, 1_000_000) if size <= max_links]
+    created = 0
+
+    print(f"{'links':>10} {'mark_completed (us)':>20} {'get_user_payments (us)':>23}")
+    for size in sizes:
+        while created < size:
+            await generator.generate_payment_link(created, PLAN_NAMES[created % len(PLAN_NAMES)])
+            created += 1
+
+        users = random.sample(range(created), samples)
+        mark_args = [(u, PLAN_NAMES[u % len(PLAN_NAMES)]) for u in users]
+        mark_us = await _time_calls(generator.mark_payment_completed, mark_args)
+        lookup_us = await _time_calls(generator.get_user_payments, [(u,) for u in users])
+        print(f"{size:>10} {mark_us:>20.2f} {lookup_us:>23.2f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark payment link lookups")
+    parser.add_argument("--max-links", type=int, default=1_000_000)
+    parser.add_argument("--samples", type=int, default=1_000)
+    args = parser.parse_args()
+    asyncio.run(run(args.max_links, args.samples))
+
+
+if __name__ == "__main__":
+    main()
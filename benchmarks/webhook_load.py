@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""Load-test the payment webhook of the admin panel.
+
+Starts a stub Telegram Bot API server, launches ``bot.admin_panel:app``
+under uvicorn with ``TELEGRAM_API_BASE_URL`` pointing at the stub, fires
+signed payment webhooks concurrently and reports throughput and a latency
+histogram. ``DATABASE_URL`` must point at a disposable local Postgres.
+
+Several configurations can be compared in one run, for example fast-ack
+against inline activation and different worker counts:
+
+    DATABASE_URL=postgresql://localhost/pnptv_bench \\
+    python benchmarks/webhook_load.py --requests 2000 --concurrency 100 \\
+        --config fast_ack=1,workers=4 --config fast_ack=1,workers=16 \\
+        --config fast_ack=0
+
+Config keys: ``fast_ack`` (0/1), ``workers`` (activation workers) and
+``uvicorn_workers`` (admin panel processes).
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from typing import Dict, List
+
+import aiohttp
+import asyncpg
+from aiohttp import web
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+BENCH_ENV = {
+    "BOT_TOKEN": "123456:BENCHMARK",
+    "BOLD_IDENTITY_KEY": "BENCHMARK_KEY",
+    "PAYMENT_TOKEN_SECRET": "benchmark-secret",
+    "BOLD_WEBHOOK_SECRET": "benchmark-bold-secret",
+}
+for _key, _value in BENCH_ENV.items():
+    os.environ.setdefault(_key, _value)
+
+from bot.payment_tokens import sign_payment_token  # noqa: E402
+
+HISTOGRAM_BOUNDS_MS = [1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "bench", "username": "bench_bot"}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class StubTelegram:
+    """Minimal Bot API replacement answering every method successfully."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls: Dict[str, int] = {}
+        self.runner = None
+        self.port = _free_port()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        method = method.lower()
+        if method == "exportchatinvitelink":
+            result = "https://t.me/+benchmark"
+        elif method == "createchatinvitelink":
+            # Parsed by PTB as a ChatInviteLink; anything else fails the invite
+            result = {
+                "invite_link": f"https://t.me/+bench{random.randint(1, 1_000_000_000)}",
+                "creator": BOT_USER,
+                "creates_join_request": True,
+                "is_primary": False,
+                "is_revoked": False,
+            }
+        elif method == "getme":
+            result = BOT_USER
+        else:
+            result = {
+                "message_id": random.randint(1, 1_000_000),
+                "date": int(time.time()),
+                "chat": {"id": 1, "type": "private"},
+                "text": "ok",
+            }
+        return web.json_response({"ok": True, "result": result})
+
+    async def start(self) -> None:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, "127.0.0.1", self.port).start()
+
+    async def stop(self) -> None:
+        await self.runner.cleanup()
+
+
+def parse_config(text: str) -> Dict[str, str]:
+    config = {"fast_ack": "1", "workers": "4", "uvicorn_workers": "1"}
+    for item in filter(None, text.split(",")):
+        key, _, value = item.partition("=")
+        if key not in config:
+            raise argparse.ArgumentTypeError(f"Unknown config key: {key}")
+        config[key] = value
+    return config
+
+
+def start_admin_panel(config: Dict[str, str], telegram: StubTelegram) -> tuple:
+    port = _free_port()
+    env = dict(
+        os.environ,
+        TELEGRAM_API_BASE_URL=f"http://127.0.0.1:{telegram.port}/bot",
+        WEBHOOK_FAST_ACK=config["fast_ack"],
+        ACTIVATION_WORKERS=config["workers"],
+        PYTHONUNBUFFERED="1",
+    )
+    process = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "bot.admin_panel:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", config["uvicorn_workers"], "--log-level", "warning",
+        ],
+        cwd=ROOT_DIR,
+        env=env,
+    )
+    return process, f"http://127.0.0.1:{port}"
+
+
+async def wait_ready(session: aiohttp.ClientSession, base_url: str, timeout: float = 30) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{base_url}/health") as resp:
+                if resp.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Admin panel did not become ready")
+
+
+def make_request(user_id: int, plan_id: str, nonce: str) -> tuple:
+    """Return the body and headers of a Bold-signed webhook for a seeded link."""
+    token = sign_payment_token(user_id, plan_id, nonce=nonce, secret=os.environ["PAYMENT_TOKEN_SECRET"])
+    body = json.dumps({
+        "transaction_id": f"bench-{uuid.uuid4().hex}",
+        "status": "completed",
+        "user_id": user_id,
+        "metadata": {"plan_id": plan_id, "token": token},
+    }).encode()
+    signature = hmac.new(
+        os.environ["BOLD_WEBHOOK_SECRET"].encode(), base64.b64encode(body), hashlib.sha256
+    ).hexdigest()
+    return body, {"Content-Type": "application/json", "x-bold-signature": signature}
+
+
+async def seed_links(total: int, user_base: int, plan_id: str) -> List[str]:
+    """Insert one pending payment link per request; each webhook consumes its own."""
+    from bot.config import PLANS
+    nonces = [uuid.uuid4().hex[:16] for _ in range(total)]
+    conn = await asyncpg.connect(os.environ["DATABASE_URL"])
+    try:
+        await conn.executemany(
+            """
+            INSERT INTO payment_links (transaction_id, user_id, plan_id, plan_name, link_id, payment_url, created_at)
+            VALUES ($1, $2, $3, $4, 'LNK_BENCH', '', $5)
+            """,
+            [(nonce, user_base + i, plan_id, PLANS[plan_id]["name"], int(time.time())) for i, nonce in enumerate(nonces)],
+        )
+    finally:
+        await conn.close()
+    return nonces
+
+
+async def fire(session, base_url, total, concurrency, user_base) -> tuple:
+    nonces = await seed_links(total, user_base, "monthly")
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        body, headers = make_request(user_base + i, "monthly", nonces[i])
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                async with session.post(f"{base_url}/webhook/payment", data=body, headers=headers) as resp:
+                    await resp.read()
+                    status = resp.status
+            except aiohttp.ClientError:
+                status = 0
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return time.perf_counter() - start, latencies, statuses
+
+
+async def wait_drained(user_base: int, timeout: float = 120) -> tuple:
+    """Seconds until this run's activations, then its outbox, are done.
+
+    Read from the database, so it holds for any number of admin panel
+    workers. Either value is NaN if it did not drain within ``timeout``.
+    """
+    start = time.perf_counter()
+    activated = float("nan")
+    conn = await asyncpg.connect(os.environ["DATABASE_URL"])
+    try:
+        while time.perf_counter() - start < timeout:
+            if activated != activated:
+                processing = await conn.fetchval(
+                    "SELECT COUNT(*) FROM processed_webhooks WHERE status = 'processing' AND user_id >= $1",
+                    user_base,
+                )
+                if processing == 0:
+                    activated = time.perf_counter() - start
+            if activated == activated:
+                pending = await conn.fetchval("SELECT COUNT(*) FROM outbox WHERE status = 'pending'")
+                if pending == 0:
+                    return activated, time.perf_counter() - start
+            await asyncio.sleep(0.1)
+    finally:
+        await conn.close()
+    return activated, float("nan")
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(p * len(sorted_values)))]
+
+
+def print_report(
+    name: str, elapsed: float, latencies: List[float], statuses: Dict[int, int], drain: tuple
+) -> Dict:
+    values = sorted(latencies)
+    result = {
+        "config": name,
+        "rps": len(values) / elapsed,
+        "p50": percentile(values, 0.50) * 1000,
+        "p90": percentile(values, 0.90) * 1000,
+        "p99": percentile(values, 0.99) * 1000,
+        "max": values[-1] * 1000,
+        "drain": drain[0],
+        "outbox_drain": drain[1],
+    }
+    print(f"\n== {name} ==")
+    print(f"requests: {len(values)} in {elapsed:.2f}s -> {result['rps']:.1f} req/s")
+    print(f"status codes: {dict(sorted(statuses.items()))}")
+    print("latency ms: p50 {p50:.1f}  p90 {p90:.1f}  p99 {p99:.1f}  max {max:.1f}".format(**result))
+    activated, delivered = drain
+    print(f"activations done {activated:.2f}s, outbox delivered {delivered:.2f}s after the last response")
+
+    lower = 0
+    for bound in HISTOGRAM_BOUNDS_MS + [float("inf")]:
+        count = sum(1 for v in values if lower <= v * 1000 < bound)
+        bar = "#" * int(60 * count / len(values))
+        label = f"{lower:>5}-{bound:<5}" if bound != float("inf") else f"{lower:>5}+     "
+        print(f"  {label} ms {count:>7} {bar}")
+        lower = bound
+    return result
+
+
+async def run(args) -> None:
+    if not os.getenv("DATABASE_URL"):
+        raise SystemExit("DATABASE_URL must point at a local benchmark database")
+
+    telegram = StubTelegram(args.telegram_latency)
+    await telegram.start()
+    results = []
+    try:
+        for index, config in enumerate(args.config or [parse_config("")]):
+            name = ",".join(f"{k}={v}" for k, v in config.items())
+            process, base_url = start_admin_panel(config, telegram)
+            try:
+                timeout = aiohttp.ClientTimeout(total=60)
+                connector = aiohttp.TCPConnector(limit=args.concurrency)
+                async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+                    await wait_ready(session, base_url)
+                    user_base = 10_000_000 * (index + 1)
+                    elapsed, latencies, statuses = await fire(
+                        session, base_url, args.requests, args.concurrency, user_base
+                    )
+                    drain = await wait_drained(user_base)
+                results.append(print_report(name, elapsed, latencies, statuses, drain))
+            finally:
+                process.terminate()
+                process.wait(timeout=15)
+    finally:
+        await telegram.stop()
+
+    if len(results) > 1:
+        print("\n== comparison ==")
+        print(f"{'config':<45} {'req/s':>8} {'p50':>8} {'p99':>8}")
+        for r in results:
+            print(f"{r['config']:<45} {r['rps']:>8.1f} {r['p50']:>8.1f} {r['p99']:>8.1f}")
+    print(f"\nstub Telegram calls: {telegram.calls}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Payment webhook load test")
+    parser.add_argument("--requests", type=int, default=1000, help="Total webhooks to send")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent in-flight webhooks")
+    parser.add_argument(
+        "--telegram-latency", type=float, default=0.05,
+        help="Seconds the stub Bot API waits before answering",
+    )
+    parser.add_argument(
+        "--config", type=parse_config, action="append",
+        help="Comma separated key=value settings; repeat to compare configurations",
+    )
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""Background worker pool that activates paid subscriptions."""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict], Awaitable[None]]
+FailureHandler = Callable[[Dict, Exception], Awaitable[None]]
+
+
+class ActivationWorkerPool:
+    """Process queued payment events with bounded concurrency and retries."""
+
+    def __init__(
+        self,
+        handler: Handler,
+        on_failure: Optional[FailureHandler] = None,
+        workers: int = 4,
+        max_attempts: int = 5,
+        retry_delay: float = 1.0,
+    ):
+        self.handler = handler
+        self.on_failure = on_failure
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.queue: "asyncio.Queue[Dict]" = asyncio.Queue()
+        self.in_flight = 0
+        self.processed = 0
+        self.failed = 0
+        self._latencies: deque = deque(maxlen=1000)
+        self._tasks: List[asyncio.Task] = []
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        self._tasks = [
+            asyncio.create_task(self._worker(), name=f"activation-worker-{i}")
+            for i in range(self.workers)
+        ]
+        logger.info("Started %s activation workers", self.workers)
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Wait briefly for queued events, then cancel the workers."""
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Stopping with %s queued payment events", self.queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, event: Dict) -> None:
+        event.setdefault("received_at", time.monotonic())
+        self.queue.put_nowait(event)
+
+    async def _process(self, event: Dict) -> None:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self.handler(event)
+                self.processed += 1
+                return
+            except Exception as exc:
+                error = exc
+                logger.warning(
+                    "Activation of %s failed (attempt %s/%s): %s",
+                    event.get("transaction_id"), attempt, self.max_attempts, exc,
+                )
+                if attempt < self.max_attempts:
+                    await asyncio.sleep(self.retry_delay * 2 ** (attempt - 1))
+        self.failed += 1
+        logger.error("Giving up on activation of %s: %s", event.get("transaction_id"), error)
+        if self.on_failure:
+            try:
+                await self.on_failure(event, error)
+            except Exception as exc:
+                logger.error("Failure handler error for %s: %s", event.get("transaction_id"), exc)
+
+    async def _worker(self) -> None:
+        while True:
+            event = await self.queue.get()
+            self.in_flight += 1
+            try:
+                await self._process(event)
+            finally:
+                self.in_flight -= 1
+                self._latencies.append(time.monotonic() - event["received_at"])
+                self.queue.task_done()
+
+    def stats(self) -> Dict:
+        """Queue depth, counters and recent processing latency in seconds."""
+        latencies = sorted(self._latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))], 4)
+
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "queue_depth": self.queue.qsize(),
+            "in_flight": self.in_flight,
+            "processed": self.processed,
+            "failed": self.failed,
+            "latency_p50": percentile(0.50),
+            "latency_p95": percentile(0.95),
+            "latency_max": round(latencies[-1], 4) if latencies else None,
+        }
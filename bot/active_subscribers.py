@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""In-memory index of active subscribers for instant membership checks."""
+
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Tuple
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class ActiveSubscriberSet:
+    """Map of user_id to expiry kept in memory for O(1) lookups."""
+
+    def __init__(self):
+        self._expires: Dict[int, datetime] = {}
+        self.loaded = False
+
+    def load(self, rows: Iterable[Tuple[int, datetime]]) -> None:
+        """Replace the contents with ``(user_id, expires_at)`` pairs."""
+        self._expires = {user_id: _naive_utc(expires_at) for user_id, expires_at in rows}
+        self.loaded = True
+
+    def add(self, user_id: int, expires_at: datetime) -> None:
+        self._expires[user_id] = _naive_utc(expires_at)
+
+    def discard(self, user_id: int) -> None:
+        self._expires.pop(user_id, None)
+
+    def expires_at(self, user_id: int) -> Optional[datetime]:
+        return self._expires.get(user_id)
+
+    def is_active(self, user_id: int, now: Optional[datetime] = None) -> bool:
+        """Return True if the user has an unexpired subscription."""
+        expires_at = self._expires.get(user_id)
+        if expires_at is None:
+            return False
+        now = _naive_utc(now or datetime.now(timezone.utc))
+        return expires_at > now
+
+    def __contains__(self, user_id: int) -> bool:
+        return self.is_active(user_id)
+
+    def __len__(self) -> int:
+        return len(self._expires)
+
+
+active_subscribers = ActiveSubscriberSet()
@@ -7,7 +7,7 @@ from telegram.ext import ContextTypes
 
 from bot.texts import TEXTS
 from bot.config import ADMIN_IDS, ADMIN_HOST, ADMIN_PORT
-from bot.subscriber_manager import subscriber_manager
+from bot.stats_cache import stats_snapshot
 
 logger = logging.getLogger(__name__)
 
@@ -20,15 +20,17 @@ async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
             await update.message.reply_text(TEXTS["en"]["admin_only"])
             return
 
-        stats = await subscriber_manager.get_stats()
+        stats = await stats_snapshot.get()
         keyboard = [
             [InlineKeyboardButton("📊 Statistics", callback_data="admin_stats")],
+            [InlineKeyboardButton("⏳ Expiring Soon", callback_data="admin_expiring")],
             [InlineKeyboardButton("🌐 Web Panel", url=f"http://{ADMIN_HOST}:{ADMIN_PORT}")],
         ]
         text = (
             "🔧 **Admin Panel**\n\n"
             f"👥 Total users: {stats['total']}\n"
             f"✅ Active subscriptions: {stats['active']}\n"
+            f"💰 Revenue: ${stats['revenue_cents'] / 100:.2f}\n"
             f"🌐 **Web Panel:** http://{ADMIN_HOST}:{ADMIN_PORT}"
         )
         await update.message.reply_text(text, reply_markup=InlineKeyboardMarkup(keyboard), parse_mode="Markdown")
@@ -45,11 +47,12 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
             await update.message.reply_text(TEXTS["en"]["admin_only"])
             return
 
-        stats = await subscriber_manager.get_stats()
+        stats = await stats_snapshot.get()
         text = (
             "📊 **Bot Statistics**\n\n"
             f"👥 Total users: {stats['total']}\n"
             f"✅ Active subscriptions: {stats['active']}\n"
+            f"💰 Revenue: ${stats['revenue_cents'] / 100:.2f}\n"
             f"🌐 **Web Panel:** http://{ADMIN_HOST}:{ADMIN_PORT}"
         )
         keyboard = [[InlineKeyboardButton("🔄 Refresh", callback_data="admin_stats")]]
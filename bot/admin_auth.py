@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""Bearer token check for the admin panel's subscriber data endpoints."""
+
+import hashlib
+import hmac
+import time
+from typing import Mapping, Optional
+from urllib.parse import urlencode
+
+from bot.config import ADMIN_API_TOKEN
+
+
+class AdminAuthError(Exception):
+    """Raised when a request lacks a valid admin token."""
+
+    status_code = 401
+
+
+def require_admin_token(authorization: Optional[str], token: Optional[str] = ADMIN_API_TOKEN) -> None:
+    """Check an ``Authorization: Bearer <token>`` header against ``ADMIN_API_TOKEN``.
+
+    Every request is refused while no token is configured, so a deployment
+    that forgets it does not expose subscriber data.
+    """
+    if not token:
+        raise AdminAuthError("ADMIN_API_TOKEN is not configured")
+    scheme, _, credentials = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not credentials:
+        raise AdminAuthError("Missing bearer token")
+    if not hmac.compare_digest(credentials.strip().encode(), token.encode()):
+        raise AdminAuthError("Invalid admin token")
+
+
+# Seconds a signed download URL stays valid; the browser follows it at once
+DOWNLOAD_LINK_TTL = 60
+
+
+def _url_signature(path: str, query: str, token: str) -> str:
+    return hmac.new(token.encode(), f"{path}?{query}".encode(), hashlib.sha256).hexdigest()
+
+
+def sign_download_url(
+    path: str,
+    params: Mapping[str, str],
+    ttl: int = DOWNLOAD_LINK_TTL,
+    token: Optional[str] = ADMIN_API_TOKEN,
+    now: Optional[float] = None,
+) -> str:
+    """Return ``path`` with ``params`` and a signature that expires in ``ttl`` seconds.
+
+    Browsers cannot send the admin token when they navigate, but a
+    navigation lets them stream a large download straight to disk.
+    """
+    if not token:
+        raise AdminAuthError("ADMIN_API_TOKEN is not configured")
+    expires = int((time.time() if now is None else now) + ttl)
+    query = urlencode(sorted({**params, "expires": str(expires)}.items()))
+    return f"{path}?{query}&signature={_url_signature(path, query, token)}"
+
+
+def verify_download_url(
+    path: str,
+    params: Mapping[str, str],
+    token: Optional[str] = ADMIN_API_TOKEN,
+    now: Optional[float] = None,
+) -> None:
+    """Check a URL made by ``sign_download_url``; its path and every parameter are covered."""
+    if not token:
+        raise AdminAuthError("ADMIN_API_TOKEN is not configured")
+    params = dict(params)
+    signature = params.pop("signature", None)
+    if not signature:
+        raise AdminAuthError("Missing signature")
+    query = urlencode(sorted(params.items()))
+    if not hmac.compare_digest(signature.encode(), _url_signature(path, query, token).encode()):
+        raise AdminAuthError("Invalid signature")
+    try:
+        expires = int(params["expires"])
+    except (KeyError, ValueError):
+        raise AdminAuthError("Invalid signature")
+    if (time.time() if now is None else now) > expires:
+        raise AdminAuthError("Download link expired")
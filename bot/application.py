@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""Build the Telegram application shared by polling, webhook and mounted modes."""
+
+import hmac
+import logging
+
+from telegram import Update
+from telegram.ext import (
+    Application,
+    CallbackQueryHandler,
+    ChatJoinRequestHandler,
+    ChatMemberHandler,
+    CommandHandler,
+    ContextTypes,
+    MessageHandler,
+    filters,
+)
+
+from bot.admin import admin_command, stats_command, admin_help_command
+from bot.callbacks import handle_callback
+from bot.config import (
+    BOT_METRICS_HOST,
+    BOT_METRICS_PORT,
+    BOT_TOKEN,
+    TELEGRAM_API_BASE_URL,
+    TELEGRAM_CONCURRENT_UPDATES,
+    TELEGRAM_WEBHOOK_PATH,
+    TELEGRAM_WEBHOOK_SECRET,
+    TELEGRAM_WEBHOOK_URL,
+)
+from bot.health import CheckPending, health_monitor
+from bot.membership import handle_join_request, load_active_subscribers, track_chat_member
+from bot.metrics import start_exporter
+from bot.metrics_rollup import metrics_rollup
+from bot.outbox import outbox_dispatcher
+from bot.payment_links import payment_generator
+from bot.plans import plans_command
+from bot.screens import screens
+from bot.start import start_command, help_command
+from bot.subscriber_manager import subscriber_manager
+from bot.telegram_metrics import InstrumentedRequest
+from bot.update_processor import PerUserUpdateProcessor
+from bot.utils.expiration_task import check_expired_users
+
+logger = logging.getLogger(__name__)
+
+
+async def notify_kicked_users(
+    update: Update, context: ContextTypes.DEFAULT_TYPE
+):
+    if update.message:
+        await update.message.reply_text(
+            "Has sido expulsado del canal por expiración de tu membresía. "
+            "Puedes renovarla en cualquier momento para volver a ingresar. ✨"
+        )
+
+
+async def job_queue_heartbeat(context) -> None:
+    health_monitor.beat("job_queue")
+
+
+def webhook_url() -> str:
+    if not TELEGRAM_WEBHOOK_URL:
+        raise ValueError("TELEGRAM_WEBHOOK_URL must be set to receive updates by webhook")
+    return TELEGRAM_WEBHOOK_URL + TELEGRAM_WEBHOOK_PATH
+
+
+def valid_secret(token: str | None) -> bool:
+    """Check the ``X-Telegram-Bot-Api-Secret-Token`` header of a webhook call."""
+    return token is not None and hmac.compare_digest(token.encode(), TELEGRAM_WEBHOOK_SECRET.encode())
+
+
+def build_application(standalone: bool = True) -> Application:
+    """Create the bot application with its handlers and scheduled jobs.
+
+    ``standalone`` applications own an updater (polling or the built-in
+    webhook server), the database pool and the health monitor, and serve
+    ``/metrics`` and health on ``BOT_METRICS_PORT``. Otherwise the
+    application is embedded in the admin panel, which owns all of those
+    and feeds it updates from its own endpoint.
+    """
+    # Static menus are rendered once here rather than on every click
+    screens.build()
+
+    async def on_startup(application: Application) -> None:
+        if standalone:
+            # The pool belongs to the loop the application runs on
+            await subscriber_manager.connect()
+        await load_active_subscribers()
+
+        async def telegram():
+            await application.bot.get_me()
+
+        async def scheduler():
+            if not application.job_queue:
+                return
+            if not application.running:
+                # post_init runs before Application.start() starts the JobQueue
+                raise CheckPending("application not started")
+            if not application.job_queue.scheduler.running:
+                raise RuntimeError("job scheduler is not running")
+
+        if standalone:
+            health_monitor.add_check("database", subscriber_manager.ping)
+            health_monitor.add_check("telegram", telegram, cache_for=300)
+        health_monitor.add_check("scheduler", scheduler)
+        if application.job_queue:
+            health_monitor.expect_heartbeat("job_queue", max_age=60)
+        if standalone:
+            await health_monitor.start()
+            try:
+                await start_exporter(BOT_METRICS_PORT, BOT_METRICS_HOST, routes=health_monitor.routes())
+            except OSError as e:
+                logger.error(f"Could not start metrics exporter: {e}")
+
+    async def on_shutdown(application: Application) -> None:
+        # An embedded application shares the admin panel's pool and
+        # monitor, which its lifespan closes after the outbox and
+        # activation workers have drained
+        if standalone:
+            await health_monitor.stop()
+            await subscriber_manager.close()
+
+    builder = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .base_url(TELEGRAM_API_BASE_URL)
+        .request(InstrumentedRequest(connection_pool_size=256))
+        .concurrent_updates(PerUserUpdateProcessor(TELEGRAM_CONCURRENT_UPDATES))
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+    )
+    if not standalone:
+        builder = builder.updater(None)
+    app = builder.build()
+
+    app.add_handler(CommandHandler("start", start_command))
+    app.add_handler(CommandHandler("help", help_command))
+    app.add_handler(CommandHandler("plans", plans_command))
+    app.add_handler(CommandHandler("admin", admin_command))
+    app.add_handler(CommandHandler("stats", stats_command))
+    app.add_handler(CommandHandler("admin_help", admin_help_command))
+    app.add_handler(CallbackQueryHandler(handle_callback))
+    app.add_handler(
+        ChatMemberHandler(track_chat_member, ChatMemberHandler.CHAT_MEMBER)
+    )
+    app.add_handler(ChatJoinRequestHandler(handle_join_request))
+    app.add_handler(
+        MessageHandler(
+            filters.StatusUpdate.LEFT_CHAT_MEMBER, notify_kicked_users
+        )
+    )
+
+    if app.job_queue:
+        app.job_queue.run_repeating(check_expired_users, interval=24 * 60 * 60)
+        # Pick up activations made by the admin panel process
+        app.job_queue.run_repeating(load_active_subscribers, interval=10 * 60)
+        app.job_queue.run_repeating(payment_generator.expire_stale_links, interval=5 * 60)
+        app.job_queue.run_repeating(outbox_dispatcher.drain_once, interval=10)
+        app.job_queue.run_repeating(metrics_rollup.run, interval=15 * 60, first=60)
+        app.job_queue.run_repeating(job_queue_heartbeat, interval=15)
+    else:
+        logger.warning("JobQueue not available - scheduled tasks disabled")
+
+    return app
+
+
+async def start_mounted(application: Application) -> None:
+    """Start an embedded application and point the bot's webhook at the admin panel."""
+    await application.initialize()
+    await application.post_init(application)
+    await application.start()
+    # chat_member updates are only delivered when explicitly requested
+    await application.bot.set_webhook(
+        url=webhook_url(),
+        secret_token=TELEGRAM_WEBHOOK_SECRET,
+        allowed_updates=Update.ALL_TYPES,
+        drop_pending_updates=True,
+    )
+    logger.info("Receiving Telegram updates at %s", TELEGRAM_WEBHOOK_PATH)
+
+
+async def stop_mounted(application: Application) -> None:
+    await application.stop()
+    await application.shutdown()
+    await application.post_shutdown(application)
+
+
+async def feed_update(application: Application, payload: dict) -> None:
+    """Queue a webhook payload for the application's concurrent processing."""
+    await application.update_queue.put(Update.de_json(payload, application.bot))
@@ -11,7 +11,9 @@ import logging
 from telegram import Bot
 
 from bot.subscriber_manager import subscriber_manager
-from bot.config import BOT_TOKEN
+from bot.config import BOT_TOKEN, TELEGRAM_API_BASE_URL
+from bot.metrics import BROADCAST_MESSAGES
+from bot.telegram_metrics import InstrumentedRequest
 
 
 logger = logging.getLogger(__name__)
@@ -21,7 +23,9 @@ class BroadcastManager:
     """Manage broadcasts with optional scheduling and segmentation."""
 
     def __init__(self, bot: Bot | None = None):
-        self.bot = bot or Bot(token=BOT_TOKEN)
+        self.bot = bot or Bot(
+            token=BOT_TOKEN, base_url=TELEGRAM_API_BASE_URL, request=InstrumentedRequest()
+        )
         self.scheduled: List[tuple[datetime, asyncio.Task]] = []
 
     async def send(
@@ -65,7 +69,9 @@ class BroadcastManager:
                         text=text,
                         parse_mode=parse_mode,
                     )
+                BROADCAST_MESSAGES.inc(result="sent")
             except Exception as exc:
+                BROADCAST_MESSAGES.inc(result="failed")
                 logger.error("Error broadcasting to %s: %s", user["user_id"], exc)
 
     def schedule(
@@ -86,7 +92,7 @@ class BroadcastManager:
             raise ValueError("Broadcast time must be within 72 hours")
         day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
         day_end = day_start + timedelta(hours=24)
-        count = sum(bool(day_start <= t < day_end)
+        count = sum(1 for t, _ in self.scheduled if day_start <= t < day_end)
         if count >= 12:
             raise ValueError("Maximum 12 scheduled messages per 24h")
 
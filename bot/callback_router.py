@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""Table-driven dispatch of inline keyboard callback data."""
+
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from bot.metrics import CALLBACK_ERRORS, CALLBACK_LATENCY
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[..., Awaitable[None]]
+
+
+class CallbackRouter:
+    """Map callback data to handlers registered with decorators.
+
+    ``@router.route("help")`` registers an exact match, called as
+    ``handler(query, user_id)``. ``@router.prefix("plan_")`` registers a
+    parameterized route, called as ``handler(query, user_id, data)``.
+    Lookup is one dict probe for exact routes plus one per distinct prefix
+    length, so it does not slow down as screens are added. Each route is
+    timed and its failures counted under its own label.
+    """
+
+    def __init__(self):
+        self._exact: Dict[str, Handler] = {}
+        self._prefixes: Dict[str, Handler] = {}
+        # Longest first, so the most specific prefix wins
+        self._prefix_lengths: List[int] = []
+
+    def route(self, data: str) -> Callable[[Handler], Handler]:
+        def register(handler: Handler) -> Handler:
+            if data in self._exact:
+                raise ValueError(f"Callback route {data!r} already registered")
+            self._exact[data] = handler
+            return handler
+        return register
+
+    def prefix(self, prefix: str) -> Callable[[Handler], Handler]:
+        def register(handler: Handler) -> Handler:
+            if prefix in self._prefixes:
+                raise ValueError(f"Callback prefix {prefix!r} already registered")
+            self._prefixes[prefix] = handler
+            self._prefix_lengths = sorted({len(p) for p in self._prefixes}, reverse=True)
+            return handler
+        return register
+
+    def resolve(self, data: str) -> Tuple[str, Optional[Handler], bool]:
+        """Return ``(route label, handler, handler takes data)`` for callback data."""
+        handler = self._exact.get(data)
+        if handler is not None:
+            return data, handler, False
+        for length in self._prefix_lengths:
+            prefix = data[:length]
+            handler = self._prefixes.get(prefix)
+            if handler is not None:
+                return prefix.rstrip("_"), handler, True
+        return "unknown", None, False
+
+    async def dispatch(self, query, user_id: int, data: str) -> bool:
+        """Run the handler for ``data``; return False if no route matches."""
+        route, handler, with_data = self.resolve(data)
+        if handler is None:
+            CALLBACK_ERRORS.inc(route=route, error="UnknownRoute")
+            return False
+        with CALLBACK_LATENCY.time(route=route):
+            try:
+                if with_data:
+                    await handler(query, user_id, data)
+                else:
+                    await handler(query, user_id)
+            except Exception as e:
+                CALLBACK_ERRORS.inc(route=route, error=type(e).__name__)
+                raise
+        return True
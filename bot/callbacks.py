@@ -3,14 +3,16 @@ from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 import logging
 from bot.texts import TEXTS
-from bot.config import PLANS, ADMIN_IDS
+from bot.config import PLANS, ADMIN_IDS, EXPIRING_SOON_DAYS
 from bot.subscriber_manager import subscriber_manager
+from bot.stats_cache import expiring_snapshot, stats_snapshot
+from bot.callback_router import CallbackRouter
+from bot.screens import screens
+from bot.sessions import user_sessions
 
 logger = logging.getLogger(__name__)
 
-# Global state for user languages and age verification
-user_languages = {}
-age_verified = {}
+router = CallbackRouter()
 
 async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle all callback queries"""
@@ -21,48 +23,32 @@ async def handle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     user_id = query.from_user.id
     
     try:
-        if data.startswith("lang_"):
-            await handle_language_selection(query, user_id, data)
-        elif data == "confirm_age":
-            await handle_age_confirmation(query, user_id)
-        elif data == "decline_age":
-            await handle_age_decline(query, user_id)
-        elif data == "main_menu":
-            await show_main_menu(query, user_id)
-        elif data == "show_plans":
-            await show_plans(query, user_id)
-        elif data == "policies":
-            await show_policies(query, user_id)
-        elif data == "terms":
-            await show_terms(query, user_id)
-        elif data == "privacy":
-            await show_privacy(query, user_id)
-        elif data == "refund":
-            await show_refund(query, user_id)
-        elif data == "contact":
-            await show_contact(query, user_id)
-        elif data == "help":
-            await show_help(query, user_id)
-        elif data == "admin_stats":
-            await show_admin_stats(query, user_id)
-        elif data.startswith("plan_"):
-            await handle_plan_selection(query, user_id, data)
-        else:
+        if not await router.dispatch(query, user_id, data):
             logger.warning(f"Unknown callback data: {data}")
-            
     except Exception as e:
         logger.error(f"Error handling callback {data}: {e}")
         await query.edit_message_text("❌ An error occurred. Please try again.")
 
+async def _show_screen(query, user_id, name, is_admin=False):
+    """Edit the message into a precomputed screen in the user's language"""
+    screen = screens.get(name, await user_sessions.language(user_id), is_admin)
+    await query.edit_message_text(
+        text=screen.text,
+        reply_markup=screen.reply_markup,
+        parse_mode=screen.parse_mode
+    )
+
+@router.prefix("lang_")
 async def handle_language_selection(query, user_id, data):
     """Handle language selection"""
-    lang = data.split("_")[1]
-    user_languages[user_id] = lang
+    lang = data[len("lang_"):]
+    if lang not in TEXTS:
+        # Callback data comes from the client and can be forged
+        logger.warning(f"User {user_id} selected unsupported language: {lang}")
+        return
 
     try:
-        from bot.subscriber_manager import subscriber_manager
-        if subscriber_manager:
-            await subscriber_manager.record_user(user_id, lang)
+        await user_sessions.set_language(user_id, lang)
     except Exception as e:
         logger.error(f"Failed to store language for {user_id}: {e}")
     
@@ -71,81 +57,40 @@ async def handle_language_selection(query, user_id, data):
 
 async def show_age_verification(query, user_id):
     """Show age verification screen"""
-    lang = user_languages.get(user_id, "en")
-    
-    keyboard = [
-        [InlineKeyboardButton(TEXTS[lang]["confirm_age"], callback_data="confirm_age")],
-        [InlineKeyboardButton(TEXTS[lang]["decline_age"], callback_data="decline_age")]
-    ]
-    
-    await query.edit_message_text(
-        text=TEXTS[lang]["age_warning"],
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode='Markdown'
-    )
+    await _show_screen(query, user_id, "age_verification")
 
+@router.route("confirm_age")
 async def handle_age_confirmation(query, user_id):
     """Handle age confirmation"""
-    age_verified[user_id] = True
+    try:
+        await user_sessions.verify_age(user_id)
+    except Exception as e:
+        logger.error(f"Failed to store age verification for {user_id}: {e}")
     logger.info(f"User {user_id} confirmed age verification")
     await show_main_menu(query, user_id)
 
+@router.route("decline_age")
 async def handle_age_decline(query, user_id):
     """Handle age decline"""
-    lang = user_languages.get(user_id, "en")
     await query.edit_message_text("❌ You must be 18+ to use this service.\n❌ Debes tener 18+ para usar este servicio.")
 
+@router.route("main_menu")
 async def show_main_menu(query, user_id):
     """Show main menu"""
-    if not age_verified.get(user_id, False):
+    if not await user_sessions.is_age_verified(user_id):
         await show_age_verification(query, user_id)
         return
-    
-    lang = user_languages.get(user_id, "en")
-    
-    keyboard = [
-        [InlineKeyboardButton(TEXTS[lang]["plans"], callback_data="show_plans")],
-        [InlineKeyboardButton(TEXTS[lang]["policies_menu"], callback_data="policies")],
-        [InlineKeyboardButton(TEXTS[lang]["contact"], callback_data="contact")]
-    ]
-    
-    # Add admin button if user is admin
-    if user_id in ADMIN_IDS:
-        keyboard.append([InlineKeyboardButton("🔧 Admin Stats", callback_data="admin_stats")])
-    
-    text = f"{TEXTS[lang]['welcome']}\n\n{TEXTS[lang]['welcome_desc']}"
-    
-    await query.edit_message_text(
-        text=text,
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode='Markdown'
-    )
+    await _show_screen(query, user_id, "main_menu", is_admin=user_id in ADMIN_IDS)
 
+@router.route("show_plans")
 async def show_plans(query, user_id):
     """Show subscription plans"""
-    lang = user_languages.get(user_id, "en")
-    
-    keyboard = []
-    
-    for plan_id, plan_info in PLANS.items():
-        plan_text = f"{plan_info['name']} - {plan_info['price']}"
-        keyboard.append([
-            InlineKeyboardButton(plan_text, callback_data=f"plan_{plan_id}")
-        ])
-    
-    keyboard.append([InlineKeyboardButton(TEXTS[lang]["back"], callback_data="main_menu")])
-    
-    text = f"{TEXTS[lang]['plans_title']}\n\n{TEXTS[lang]['plan_benefits']}"
-    
-    await query.edit_message_text(
-        text=text,
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode='Markdown'
-    )
+    await _show_screen(query, user_id, "plans")
 
+@router.prefix("plan_")
 async def handle_plan_selection(query, user_id, data):
     """Handle plan selection with new BOLD payment system"""
-    lang = user_languages.get(user_id, "en")
+    lang = await user_sessions.language(user_id)
     plan_id = data.replace("plan_", "")
     
     plan_info = PLANS.get(plan_id)
@@ -157,14 +102,9 @@ async def handle_plan_selection(query, user_id, data):
     from bot.config import PLAN_DESCRIPTIONS
     description = PLAN_DESCRIPTIONS.get(lang, PLAN_DESCRIPTIONS["en"])
     
-    # Generate BOLD payment link directly
-    from bot.config import BOLD_IDENTITY_KEY
-    link_id = plan_info["link_id"]
-    payment_url = (
-        f"https://checkout.bold.co/payment/{link_id}"
-        f"?identity_key={BOLD_IDENTITY_KEY}"
-        f"&metadata[user_id]={user_id}"
-    )
+    # Generate and store the BOLD payment link so the webhook can verify it
+    from bot.payment_links import payment_generator
+    payment_url = await payment_generator.generate_payment_link(user_id, plan_info["name"])
     
     text = f"""**{plan_info['name']}**
 
@@ -190,124 +130,58 @@ Click below to complete payment:"""
         parse_mode='Markdown'
     )
 
+@router.route("policies")
 async def show_policies(query, user_id):
     """Show policies menu"""
-    lang = user_languages.get(user_id, "en")
-    
-    keyboard = [
-        [InlineKeyboardButton(TEXTS[lang]["terms_label"], callback_data="terms")],
-        [InlineKeyboardButton(TEXTS[lang]["privacy_label"], callback_data="privacy")],
-        [InlineKeyboardButton(TEXTS[lang]["refund_label"], callback_data="refund")],
-        [InlineKeyboardButton(TEXTS[lang]["back"], callback_data="main_menu")]
-    ]
-    
-    await query.edit_message_text(
-        text=TEXTS[lang]["policies_menu"],
-        reply_markup=InlineKeyboardMarkup(keyboard)
-    )
+    await _show_screen(query, user_id, "policies")
 
+@router.route("terms")
 async def show_terms(query, user_id):
     """Show terms and conditions"""
-    lang = user_languages.get(user_id, "en")
-    
-    keyboard = [
-        [InlineKeyboardButton(TEXTS[lang]["back"], callback_data="policies")]
-    ]
-    
-    await query.edit_message_text(
-        text=TEXTS[lang]["terms_content"],
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode='Markdown'
-    )
+    await _show_screen(query, user_id, "terms")
 
+@router.route("privacy")
 async def show_privacy(query, user_id):
     """Show privacy policy"""
-    lang = user_languages.get(user_id, "en")
-    
-    keyboard = [
-        [InlineKeyboardButton(TEXTS[lang]["back"], callback_data="policies")]
-    ]
-    
-    await query.edit_message_text(
-        text=TEXTS[lang]["privacy_content"],
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode='Markdown'
-    )
+    await _show_screen(query, user_id, "privacy")
 
+@router.route("refund")
 async def show_refund(query, user_id):
     """Show refund policy"""
-    lang = user_languages.get(user_id, "en")
-    
-    keyboard = [
-        [InlineKeyboardButton(TEXTS[lang]["back"], callback_data="policies")]
-    ]
-    
-    await query.edit_message_text(
-        text=TEXTS[lang]["refund_content"],
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode='Markdown'
-    )
+    await _show_screen(query, user_id, "refund")
 
+@router.route("contact")
 async def show_contact(query, user_id):
     """Show contact information"""
-    lang = user_languages.get(user_id, "en")
-    
-    keyboard = [
-        [InlineKeyboardButton(TEXTS[lang]["back"], callback_data="main_menu")]
-    ]
-    
-    await query.edit_message_text(
-        text=TEXTS[lang]["contact_info"],
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode='Markdown'
-    )
+    await _show_screen(query, user_id, "contact")
 
+@router.route("help")
 async def show_help(query, user_id):
     """Show help information"""
-    lang = user_languages.get(user_id, "en")
-    
-    help_text = """🎬 **PNP Television Bot Help**
-
-**Available Commands:**
-/start - Start the bot and select language
-/help - Show this help message
-/plans - View subscription plans
-
-**How to Subscribe:**
-1. Use /plans to see available options
-2. Choose your preferred plan
-3. Complete payment through the secure link
-4. Get instant access to your content!
-
-**Support:**
-If you need help, contact our support team at @PNPTVSupport"""
-    
-    keyboard = [
-        [InlineKeyboardButton(TEXTS[lang]["back"], callback_data="main_menu")]
-    ]
-    
-    await query.edit_message_text(
-        text=help_text,
-        reply_markup=InlineKeyboardMarkup(keyboard),
-        parse_mode='Markdown'
-    )
+    await _show_screen(query, user_id, "help")
 
+@router.route("admin_stats")
 async def show_admin_stats(query, user_id):
     """Show admin statistics"""
     if user_id not in ADMIN_IDS:
         await query.edit_message_text("⛔ Unauthorized access")
         return
     
-    stats = await subscriber_manager.get_stats()
+    stats = await stats_snapshot.get()
 
     text = (
         "📊 **Bot Statistics**\n\n"
         f"👥 Total users: {stats['total']}\n"
         f"✅ Active subscriptions: {stats['active']}\n"
-        "Last updated: just now"
+        f"💰 Revenue: ${stats['revenue_cents'] / 100:.2f}\n"
+        f"⏳ Expiring in {EXPIRING_SOON_DAYS} days: {stats.get('expiring_soon', 0)}\n"
+        f"Last updated: {stats_snapshot.updated_at:%H:%M:%S} UTC"
     )
 
-    keyboard = [[InlineKeyboardButton("🔄 Refresh", callback_data="admin_stats")]]
+    keyboard = [
+        [InlineKeyboardButton("⏳ Expiring Soon", callback_data="admin_expiring")],
+        [InlineKeyboardButton("🔄 Refresh", callback_data="admin_stats")],
+    ]
 
     await query.edit_message_text(
         text=text,
@@ -316,3 +190,29 @@ async def show_admin_stats(query, user_id):
 
     )
 
+@router.route("admin_expiring")
+async def show_admin_expiring(query, user_id):
+    """Show subscriptions expiring soon"""
+    if user_id not in ADMIN_IDS:
+        await query.edit_message_text("⛔ Unauthorized access")
+        return
+
+    count = (await expiring_snapshot(EXPIRING_SOON_DAYS).get())["count"]
+    page = await subscriber_manager.expiring_within(EXPIRING_SOON_DAYS, limit=10, count=False)
+
+    lines = [f"⏳ **Expiring in {EXPIRING_SOON_DAYS} days: {count}**", ""]
+    for sub in page["subscribers"]:
+        lines.append(f"• `{sub['user_id']}` {sub['plan']} – {sub['expires_at']:%Y-%m-%d %H:%M} UTC")
+    if count > len(page["subscribers"]):
+        lines.append(f"…and {count - len(page['subscribers'])} more in the web panel")
+
+    keyboard = [
+        [InlineKeyboardButton("🔄 Refresh", callback_data="admin_expiring")],
+        [InlineKeyboardButton("📊 Statistics", callback_data="admin_stats")],
+    ]
+
+    await query.edit_message_text(
+        text="\n".join(lines),
+        reply_markup=InlineKeyboardMarkup(keyboard),
+        parse_mode='Markdown'
+    )
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
+import hashlib
 import os
+from decimal import Decimal
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -15,6 +17,9 @@ if not BOT_TOKEN:
     else:
         raise ValueError("BOT_TOKEN must be set in .env file")
 
+# Bot API endpoint; point it at a local stub server for load tests
+TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL", "https://api.telegram.org/bot")
+
 # Parse ADMIN_IDS
 admin_ids_str = os.getenv("ADMIN_IDS", "")
 ADMIN_IDS = []
@@ -41,15 +46,29 @@ PLAN_LINK_IDS = {
     "PNP Forever": "LNK_PNM53KLD99"
 }
 
-def generate_bold_link(link_id: str, user_id: int, plan_id: str) -> str:
+# Secret key Bold signs webhook bodies with (x-bold-signature header).
+# Webhooks are rejected until it is set.
+BOLD_WEBHOOK_SECRET = os.getenv("BOLD_WEBHOOK_SECRET")
+
+# Key used to sign payment tokens. Falls back to the bot token so existing
+# deployments keep working; set it explicitly when rotating either secret.
+PAYMENT_TOKEN_SECRET = os.getenv("PAYMENT_TOKEN_SECRET") or BOT_TOKEN
+
+def generate_bold_link(link_id: str, user_id: int, plan_id: str, token: str | None = None) -> str:
     """Generate a Bold.co payment URL including the plan identifier."""
 
-    return (
+    url = (
         f"https://checkout.bold.co/payment/{link_id}"
         f"?identity_key={BOLD_IDENTITY_KEY}"
         f"&metadata[user_id]={user_id}"
         f"&metadata[plan_id]={plan_id}"
     )
+    if token:
+        url += f"&metadata[token]={token}"
+    return url
+
+# Seconds a generated payment link stays pending before it is expired
+PAYMENT_LINK_TTL = int(os.getenv("PAYMENT_LINK_TTL", 24 * 60 * 60))
 
 # Channel settings
 CHANNELS = {
@@ -104,9 +123,49 @@ PLANS = {
     }
 }
 
+def price_to_cents(price: str) -> int:
+    """Convert a display price such as ``"$24.99"`` to integer cents."""
+    return int(Decimal(price.strip().lstrip("$").replace(",", "")) * 100)
+
+PLAN_PRICE_CENTS = {plan_id: price_to_cents(info["price"]) for plan_id, info in PLANS.items()}
+
 # Admin panel settings
 ADMIN_PORT = int(os.getenv("ADMIN_PORT", 8080))
 ADMIN_HOST = os.getenv("ADMIN_HOST", "0.0.0.0")
+ADMIN_WORKERS = int(os.getenv("ADMIN_WORKERS", 1))
+# Bearer token required by the admin panel's subscriber data endpoints.
+# They answer 401 until it is set.
+ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN")
+
+# Seconds the admin statistics snapshot is reused before hitting the database
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", 5))
+
+# Users whose language and age verification are kept in memory per process
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", 10000))
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", 600))
+
+# Window, in days, of the "expiring soon" statistics and admin views
+EXPIRING_SOON_DAYS = int(os.getenv("EXPIRING_SOON_DAYS", 3))
+
+# Acknowledge payment webhooks immediately and activate in background workers
+WEBHOOK_FAST_ACK = os.getenv("WEBHOOK_FAST_ACK", "1").lower() not in ("0", "false", "no")
+ACTIVATION_WORKERS = int(os.getenv("ACTIVATION_WORKERS", 4))
+
+# Port of the bot process's Prometheus exporter (0 disables it). It has no
+# authentication, so it only listens on loopback unless told otherwise.
+BOT_METRICS_PORT = int(os.getenv("BOT_METRICS_PORT", 9101))
+BOT_METRICS_HOST = os.getenv("BOT_METRICS_HOST", "127.0.0.1")
+
+# How updates reach the bot: "polling" (local runs), "webhook" (run_bot.py
+# serves the endpoint itself) or "mounted" (the admin panel receives them)
+TELEGRAM_MODE = os.getenv("TELEGRAM_MODE", "polling").lower()
+TELEGRAM_WEBHOOK_URL = os.getenv("TELEGRAM_WEBHOOK_URL", "").rstrip("/")
+TELEGRAM_WEBHOOK_PATH = "/" + os.getenv("TELEGRAM_WEBHOOK_PATH", "/telegram/webhook").strip("/")
+TELEGRAM_WEBHOOK_PORT = int(os.getenv("TELEGRAM_WEBHOOK_PORT", 8443))
+# Telegram echoes this in X-Telegram-Bot-Api-Secret-Token ([A-Za-z0-9_-], up to 256 chars)
+TELEGRAM_WEBHOOK_SECRET = os.getenv("TELEGRAM_WEBHOOK_SECRET") or hashlib.sha256(BOT_TOKEN.encode()).hexdigest()
+# Updates handled at once; updates from the same user still run in order
+TELEGRAM_CONCURRENT_UPDATES = int(os.getenv("TELEGRAM_CONCURRENT_UPDATES", 64))
 
 # Database settings
 GOOGLE_CREDENTIALS_JSON = os.getenv("GOOGLE_CREDENTIALS_JSON", "credentials.json")
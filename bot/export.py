@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Encode subscriber rows as CSV or NDJSON for streaming downloads.
+
+Rows are buffered into chunks of roughly ``chunk_size`` bytes and,
+optionally, gzip-compressed on the fly, so an export of any size only
+ever holds one chunk in memory.
+"""
+
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import AsyncIterable, AsyncIterator, Dict
+
+EXPORT_FIELDS = ("user_id", "plan", "status", "start_date", "expires_at", "transaction_id", "language")
+EXPORT_FORMATS = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def _value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+class _CsvEncoder:
+    def __init__(self):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+
+    def header(self) -> str:
+        return self.encode(EXPORT_FIELDS)
+
+    def row(self, row: Dict) -> str:
+        return self.encode(["" if row.get(f) is None else _value(row.get(f)) for f in EXPORT_FIELDS])
+
+    def encode(self, values) -> str:
+        self.writer.writerow(values)
+        line = self.buffer.getvalue()
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return line
+
+
+class _NdjsonEncoder:
+    def header(self) -> str:
+        return ""
+
+    def row(self, row: Dict) -> str:
+        return json.dumps({f: _value(row.get(f)) for f in EXPORT_FIELDS}) + "\n"
+
+
+async def encode_rows(
+    rows: AsyncIterable[Dict],
+    fmt: str = "csv",
+    chunk_size: int = 64 * 1024,
+    compress: bool = False,
+) -> AsyncIterator[bytes]:
+    """Yield ``rows`` encoded as ``fmt`` in chunks of about ``chunk_size`` bytes."""
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    encoder = _CsvEncoder() if fmt == "csv" else _NdjsonEncoder()
+    # wbits=31 writes a gzip header and trailer around the deflate stream
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def finish(data: bytes) -> bytes:
+        return compressor.compress(data) if compressor else data
+
+    parts = [encoder.header()]
+    size = len(parts[0])
+    async for row in rows:
+        line = encoder.row(row)
+        parts.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            chunk = finish("".join(parts).encode("utf-8"))
+            parts, size = [], 0
+            if chunk:
+                yield chunk
+
+    tail = finish("".join(parts).encode("utf-8"))
+    if compressor:
+        tail += compressor.flush()
+    if tail:
+        yield tail
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+"""Cached liveness and readiness state for the bot and admin panel.
+
+A background task runs the registered probes (database ping, Telegram
+reachability, scheduler state) every few seconds and measures event-loop
+lag on the way. The HTTP endpoints only read the cached results, so an
+orchestrator can poll them as often as it likes.
+"""
+
+import asyncio
+import json
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class CheckPending(Exception):
+    """Raised by a probe whose component has not started yet."""
+
+
+class HealthMonitor:
+    """Run readiness probes in the background and answer from their results.
+
+    ``add_check`` registers an async probe that raises on failure.
+    ``expect_heartbeat`` registers a component that must call ``beat``
+    regularly (e.g. a JobQueue job). ``mark_success`` records a success
+    seen elsewhere, so a probe can skip its own request while that is
+    recent enough. A probe raising ``CheckPending`` keeps the process
+    not ready without being reported as a failure.
+    """
+
+    def __init__(
+        self,
+        interval: float = 5.0,
+        probe_timeout: float = 3.0,
+        max_loop_lag: float = 1.0,
+    ):
+        self.interval = interval
+        self.probe_timeout = probe_timeout
+        self.max_loop_lag = max_loop_lag
+        self.loop_lag = 0.0
+        self._checks: Dict[str, Tuple[Callable[[], Awaitable[None]], float]] = {}
+        self._results: Dict[str, Dict] = {}
+        self._successes: Dict[str, float] = {}
+        self._heartbeats: Dict[str, Tuple[float, float]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def add_check(self, name: str, probe: Callable[[], Awaitable[None]], cache_for: float = 0.0) -> None:
+        """Run ``probe`` each interval unless ``name`` succeeded within ``cache_for`` seconds."""
+        self._checks[name] = (probe, cache_for)
+
+    def expect_heartbeat(self, name: str, max_age: float) -> None:
+        self._heartbeats[name] = (time.monotonic(), max_age)
+
+    def beat(self, name: str) -> None:
+        if name in self._heartbeats:
+            self._heartbeats[name] = (time.monotonic(), self._heartbeats[name][1])
+
+    def mark_success(self, name: str) -> None:
+        self._successes[name] = time.monotonic()
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.running:
+            return
+        await self.probe_once()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run_check(self, name: str, probe: Callable[[], Awaitable[None]], cache_for: float) -> None:
+        now = time.monotonic()
+        if cache_for and now - self._successes.get(name, float("-inf")) < cache_for:
+            self._results[name] = {"ok": True, "checked_at": now, "error": None}
+            return
+        try:
+            await asyncio.wait_for(probe(), timeout=self.probe_timeout)
+        except CheckPending as e:
+            self._results[name] = {"ok": False, "checked_at": time.monotonic(), "error": f"pending: {e}"}
+        except Exception as e:
+            self._results[name] = {"ok": False, "checked_at": time.monotonic(), "error": f"{type(e).__name__}: {e}"}
+            logger.warning("Health check %s failed: %s", name, e)
+        else:
+            self.mark_success(name)
+            self._results[name] = {"ok": True, "checked_at": time.monotonic(), "error": None}
+
+    async def probe_once(self) -> None:
+        await asyncio.gather(
+            *(self._run_check(name, probe, cache_for) for name, (probe, cache_for) in self._checks.items())
+        )
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            # Anything beyond the requested sleep is time the loop was blocked
+            self.loop_lag = max(0.0, loop.time() - expected)
+            try:
+                await self.probe_once()
+            except Exception as e:
+                logger.error("Health probes failed: %s", e)
+
+    def live(self) -> Tuple[bool, Dict]:
+        """The process is serving requests and the monitor task is alive."""
+        ok = self.running
+        return ok, {"status": "alive" if ok else "dead", "loop_lag": round(self.loop_lag, 4)}
+
+    def ready(self) -> Tuple[bool, Dict]:
+        """Every probe passed recently, heartbeats are fresh and the loop is responsive."""
+        now = time.monotonic()
+        # A result older than a few intervals means the monitor itself is stuck
+        stale_after = self.interval * 3 + self.probe_timeout
+        checks = {}
+        for name in self._checks:
+            result = self._results.get(name)
+            if result is None:
+                checks[name] = {"ok": False, "error": "not checked yet"}
+                continue
+            age = now - result["checked_at"]
+            ok = result["ok"] and age < stale_after
+            checks[name] = {"ok": ok, "age": round(age, 3), "error": result["error"] or (None if ok else "stale")}
+        for name, (last, max_age) in self._heartbeats.items():
+            age = now - last
+            checks[name] = {"ok": age < max_age, "age": round(age, 3), "error": None if age < max_age else "missed heartbeat"}
+        lag_ok = self.loop_lag < self.max_loop_lag
+        checks["event_loop"] = {"ok": lag_ok, "lag": round(self.loop_lag, 4), "error": None if lag_ok else "lagging"}
+
+        ok = self.running and all(check["ok"] for check in checks.values())
+        return ok, {"status": "ready" if ok else "not_ready", "checks": checks}
+
+    def routes(self) -> Dict[str, Callable[[], Tuple[int, str, bytes]]]:
+        """``/health/live`` and ``/health/ready`` for the bot's metrics exporter."""
+
+        def respond(check):
+            def route():
+                ok, body = check()
+                return (200 if ok else 503), "application/json", json.dumps(body).encode()
+            return route
+
+        return {"/health/live": respond(self.live), "/health/ready": respond(self.ready)}
+
+
+health_monitor = HealthMonitor()
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""Track who is actually present in the subscription channels."""
+
+import logging
+from telegram import Update, ChatMember
+from telegram.ext import ContextTypes
+
+from bot.active_subscribers import active_subscribers
+from bot.config import ALL_CHANNEL_IDS
+from bot.subscriber_manager import subscriber_manager
+
+logger = logging.getLogger(__name__)
+
+PRESENT_STATUSES = {
+    ChatMember.MEMBER,
+    ChatMember.ADMINISTRATOR,
+    ChatMember.OWNER,
+}
+
+
+def _is_present(member: ChatMember) -> bool:
+    if member.status in PRESENT_STATUSES:
+        return True
+    return member.status == ChatMember.RESTRICTED and getattr(member, "is_member", False)
+
+
+async def track_chat_member(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Record joins and leaves reported by chat_member updates"""
+    change = update.chat_member
+    if not change or change.chat.id not in ALL_CHANNEL_IDS:
+        return
+
+    was_present = _is_present(change.old_chat_member)
+    is_present = _is_present(change.new_chat_member)
+    if was_present == is_present:
+        return
+
+    channel_id = change.chat.id
+    user_id = change.new_chat_member.user.id
+    try:
+        if is_present:
+            await subscriber_manager.record_channel_join(channel_id, user_id)
+            logger.info(f"User {user_id} joined channel {channel_id}")
+        else:
+            await subscriber_manager.record_channel_leave(channel_id, user_id)
+            logger.info(f"User {user_id} left channel {channel_id}")
+    except Exception as e:
+        logger.error(f"Failed to track membership of {user_id} in {channel_id}: {e}")
+
+
+async def load_active_subscribers(context: ContextTypes.DEFAULT_TYPE = None) -> None:
+    """Load the in-memory active subscriber set from the database"""
+    rows = await subscriber_manager.get_active_subscribers()
+    active_subscribers.load((row["user_id"], row["expires_at"]) for row in rows)
+    logger.info(f"Loaded {len(active_subscribers)} active subscribers")
+
+
+async def is_active_subscriber(user_id: int) -> bool:
+    """Check the in-memory set, falling back to a primary key lookup on a miss"""
+    if active_subscribers.is_active(user_id):
+        return True
+    # Payments are activated by the admin panel process, so a user that is
+    # missing here may have subscribed since the last refresh.
+    subscription = await subscriber_manager.get_subscription(user_id)
+    if subscription is None:
+        return False
+    active_subscribers.add(user_id, subscription["expires_at"])
+    return active_subscribers.is_active(user_id)
+
+
+async def handle_join_request(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Approve join requests from active subscribers and decline everyone else"""
+    request = update.chat_join_request
+    if not request or request.chat.id not in ALL_CHANNEL_IDS:
+        return
+
+    channel_id = request.chat.id
+    user_id = request.from_user.id
+    try:
+        if await is_active_subscriber(user_id):
+            await request.approve()
+            await subscriber_manager.record_channel_join(channel_id, user_id)
+            logger.info(f"Approved join request of {user_id} for {channel_id}")
+        else:
+            await request.decline()
+            logger.info(f"Declined join request of {user_id} for {channel_id}")
+    except Exception as e:
+        logger.error(f"Error handling join request of {user_id} for {channel_id}: {e}")
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+"""In-process metrics registry rendered in the Prometheus text format.
+
+Counters, gauges and histograms are plain dicts keyed by label values,
+so recording a sample costs a dict update and no extra dependency is
+needed in either the bot or the admin panel process. ``render()``
+produces the exposition format scraped from ``/metrics``.
+"""
+
+import asyncio
+import bisect
+import logging
+import re
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(self._values.items())
+        ]
+
+
+class Gauge(_Metric):
+    """A value that is set directly or read from a callback at render time."""
+
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def set(self, value: float, **labels) -> None:
+        self._values[self._key(labels)] = value
+
+    def set_function(self, function: Callable[[], float], **labels) -> None:
+        self._functions[self._key(labels)] = function
+
+    def samples(self) -> List[str]:
+        values = dict(self._values)
+        for key, function in self._functions.items():
+            try:
+                values[key] = function()
+            except Exception as e:
+                logger.debug("Gauge %s callback failed: %s", self.name, e)
+        return [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"
+            for key, value in sorted(values.items())
+        ]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket..., count in +Inf only, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        state = self._values.get(key)
+        if state is None:
+            state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        state = self._values.get(self._key(labels))
+        return int(sum(state[:-1])) if state else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        for key, state in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), state[:-1]):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {int(cumulative)}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(state[-1])}")
+            lines.append(f"{self.name}_count{labels} {int(cumulative)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.header())
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REGISTRY = Registry()
+
+CALLBACK_LATENCY = REGISTRY.histogram(
+    "bot_callback_duration_seconds", "Callback query handling time by route", ["route"]
+)
+CALLBACK_ERRORS = REGISTRY.counter(
+    "bot_callback_errors_total", "Failed or unrouted callback queries by route and error class", ["route", "error"]
+)
+TELEGRAM_API_LATENCY = REGISTRY.histogram(
+    "telegram_api_duration_seconds", "Telegram Bot API call time by method", ["method"]
+)
+TELEGRAM_API_ERRORS = REGISTRY.counter(
+    "telegram_api_errors_total", "Failed Telegram Bot API calls by method and error class", ["method", "error"]
+)
+DB_QUERY_LATENCY = REGISTRY.histogram(
+    "db_query_duration_seconds", "asyncpg query time by statement", ["statement"]
+)
+DB_POOL_CONNECTIONS = REGISTRY.gauge(
+    "db_pool_connections", "asyncpg pool connections by state", ["state"]
+)
+WEBHOOKS = REGISTRY.counter(
+    "payment_webhooks_total", "Payment webhooks received by outcome", ["outcome"]
+)
+ACTIVATIONS = REGISTRY.counter(
+    "subscription_activations_total", "Subscription activations by result", ["result"]
+)
+BROADCAST_MESSAGES = REGISTRY.counter(
+    "broadcast_messages_total", "Broadcast deliveries by result", ["result"]
+)
+KICKS = REGISTRY.counter(
+    "expired_member_kicks_total", "Expired members removed from channels by result", ["result"]
+)
+
+
+_statement_names: Dict[str, str] = {}
+
+
+def statement_name(query: str) -> str:
+    """Short, low-cardinality name for a SQL statement, e.g. ``select_subscribers``."""
+    name = _statement_names.get(query)
+    if name is None:
+        text = query.strip().lower()
+        verb = text.split(None, 1)[0] if text else "other"
+        if verb == "with":
+            # Name a CTE after the statement that writes, if any
+            match = re.search(r"\b(insert|update|delete)\b", text)
+            verb = match.group(1) if match else "select"
+            text = text[match.start():] if match else text
+        target = re.search(
+            r"\b(?:from|into|update|table|index)\s+(?:if\s+(?:not\s+)?exists\s+)?([a-z_][a-z0-9_]*)",
+            text,
+        )
+        name = f"{verb}_{target.group(1)}" if target else verb
+        if len(_statement_names) < 1024:
+            _statement_names[query] = name
+    return name
+
+
+def _log_query(record) -> None:
+    DB_QUERY_LATENCY.observe(record.elapsed, statement=statement_name(record.query))
+
+
+async def instrument_connection(conn) -> None:
+    """asyncpg pool ``init`` hook recording the latency of every query."""
+    add_query_logger = getattr(conn, "add_query_logger", None)
+    if add_query_logger is not None:
+        add_query_logger(_log_query)
+
+
+def watch_pool(pool) -> None:
+    DB_POOL_CONNECTIONS.set_function(lambda: pool.get_size() - pool.get_idle_size(), state="in_use")
+    DB_POOL_CONNECTIONS.set_function(pool.get_idle_size, state="idle")
+
+
+Route = Callable[[], Tuple[int, str, bytes]]
+
+
+def _metrics_route() -> Tuple[int, str, bytes]:
+    return 200, CONTENT_TYPE, REGISTRY.render().encode()
+
+
+_REASONS = {200: "OK", 404: "Not Found", 503: "Service Unavailable"}
+
+
+async def _serve(reader: asyncio.StreamReader, writer: asyncio.StreamWriter, routes: Dict[str, Route]) -> None:
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), timeout=5)
+        while (await asyncio.wait_for(reader.readline(), timeout=5)) not in (b"\r\n", b"\n", b""):
+            pass
+        parts = request_line.decode("latin-1").split()
+        route = routes.get(parts[1].split("?")[0]) if len(parts) >= 2 and parts[0] == "GET" else None
+        if route is not None:
+            status, content_type, body = route()
+        else:
+            status, content_type, body = 404, "text/plain", b"Not found\n"
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\nContent-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def start_exporter(
+    port: int, host: str = "127.0.0.1", routes: Optional[Dict[str, Route]] = None
+) -> Optional[asyncio.AbstractServer]:
+    """Serve ``/metrics`` (and any extra ``routes``) from a process without a web framework."""
+    if not port:
+        return None
+    routes = {"/metrics": _metrics_route, **(routes or {})}
+    server = await asyncio.start_server(lambda r, w: _serve(r, w, routes), host, port)
+    logger.info("Metrics exporter listening on %s:%d", host, port)
+    return server
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""Incremental daily and cohort metrics built from the payments ledger.
+
+Each run only reads payments above ``last_payment_id`` and subscriptions
+that expired after ``churned_until``, both kept in ``rollup_watermarks``,
+and folds them into ``daily_metrics`` and ``cohort_retention``. Charts
+then read a few hundred precomputed rows instead of scanning history.
+"""
+
+import logging
+from datetime import datetime, timezone
+
+from bot.config import PLANS
+
+logger = logging.getLogger(__name__)
+
+WATERMARK = "metrics"
+# Payments younger than this may belong to a transaction with a lower id
+# that has not committed yet; leave them for the next run.
+SETTLE_INTERVAL = "2 minutes"
+
+_DAILY_FROM_PAYMENTS = """
+    INSERT INTO daily_metrics (day, plan, language, new_subscribers, renewals)
+    SELECT p.paid_at::DATE, p.plan, COALESCE(u.language, ''),
+           COUNT(*) FILTER (WHERE NOT p.renewal), COUNT(*) FILTER (WHERE p.renewal)
+    FROM payments p
+    LEFT JOIN users u ON u.user_id = p.user_id
+    WHERE p.id > $1 AND p.id <= $2
+    GROUP BY 1, 2, 3
+    ON CONFLICT (day, plan, language) DO UPDATE SET
+        new_subscribers = daily_metrics.new_subscribers + EXCLUDED.new_subscribers,
+        renewals = daily_metrics.renewals + EXCLUDED.renewals
+"""
+
+_COHORT_MEMBERS = """
+    INSERT INTO cohort_members (user_id, cohort_month)
+    SELECT user_id, date_trunc('month', MIN(paid_at))::DATE
+    FROM payments
+    WHERE id > $1 AND id <= $2
+    GROUP BY user_id
+    ON CONFLICT (user_id) DO NOTHING
+"""
+
+# Every month a payment covers counts once per user; only newly recorded
+# (user, month) pairs bump the retention counters.
+_COHORT_RETENTION = """
+    WITH durations AS (
+        SELECT * FROM unnest($3::TEXT[], $4::INT[]) AS d(plan, days)
+    ), covered AS (
+        SELECT DISTINCT p.user_id, month::DATE AS month
+        FROM payments p
+        LEFT JOIN durations d ON d.plan = p.plan
+        CROSS JOIN LATERAL generate_series(
+            date_trunc('month', p.paid_at),
+            p.paid_at + make_interval(days => COALESCE(d.days, 0)),
+            INTERVAL '1 month'
+        ) AS month
+        WHERE p.id > $1 AND p.id <= $2
+    ), inserted AS (
+        INSERT INTO cohort_activity (user_id, month)
+        SELECT user_id, month FROM covered
+        ON CONFLICT DO NOTHING
+        RETURNING user_id, month
+    )
+    INSERT INTO cohort_retention (cohort_month, period, users)
+    SELECT c.cohort_month,
+           ((EXTRACT(YEAR FROM i.month) - EXTRACT(YEAR FROM c.cohort_month)) * 12
+            + EXTRACT(MONTH FROM i.month) - EXTRACT(MONTH FROM c.cohort_month))::INT,
+           COUNT(*)
+    FROM inserted i
+    JOIN cohort_members c ON c.user_id = i.user_id
+    GROUP BY 1, 2
+    ON CONFLICT (cohort_month, period) DO UPDATE SET
+        users = cohort_retention.users + EXCLUDED.users
+"""
+
+# A subscription that reaches its expiry without being renewed is churn; a
+# renewal before expiry moves expires_at forward so it is never counted.
+_DAILY_CHURN = """
+    INSERT INTO daily_metrics (day, plan, language, churned)
+    SELECT s.expires_at::DATE, s.plan, COALESCE(u.language, ''), COUNT(*)
+    FROM subscribers s
+    LEFT JOIN users u ON u.user_id = s.user_id
+    WHERE s.expires_at > $1 AND s.expires_at <= $2
+    GROUP BY 1, 2, 3
+    ON CONFLICT (day, plan, language) DO UPDATE SET
+        churned = daily_metrics.churned + EXCLUDED.churned
+"""
+
+_ACTIVE_SNAPSHOT = """
+    INSERT INTO daily_metrics (day, plan, language, active)
+    SELECT $1::DATE, s.plan, COALESCE(u.language, ''), COUNT(*)
+    FROM subscribers s
+    LEFT JOIN users u ON u.user_id = s.user_id
+    WHERE s.expires_at > $2
+    GROUP BY 2, 3
+    ON CONFLICT (day, plan, language) DO UPDATE SET active = EXCLUDED.active
+"""
+
+
+class MetricsRollup:
+    """Fold new payments and expiries into the metrics rollup tables.
+
+    Runs hold a transaction-scoped advisory lock, so the job can be
+    scheduled in several processes and only one does the work at a time.
+    """
+
+    def __init__(self, manager=None, batch_size: int = 5000):
+        self._manager = manager
+        self.batch_size = batch_size
+
+    @property
+    def manager(self):
+        if self._manager is None:
+            from bot.subscriber_manager import subscriber_manager
+            self._manager = subscriber_manager
+        return self._manager
+
+    async def run(self, context=None) -> int:
+        """Process everything up to now; return the number of payments folded in."""
+        processed = 0
+        while True:
+            count = await self.run_once()
+            if count is None:
+                break
+            processed += count
+            if count < self.batch_size:
+                break
+        return processed
+
+    async def run_once(self):
+        """Process one batch of payments plus the expiries since the last run.
+
+        Returns the number of payments processed, or ``None`` if another
+        process holds the rollup lock.
+        """
+        names = [info["name"] for info in PLANS.values()]
+        days = [info["duration_days"] for info in PLANS.values()]
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+
+        async with self.manager.pool.acquire() as conn:
+            async with conn.transaction():
+                if not await conn.fetchval("SELECT pg_try_advisory_xact_lock(hashtext('metrics_rollup'))"):
+                    return None
+                await conn.execute(
+                    "INSERT INTO rollup_watermarks (name) VALUES ($1) ON CONFLICT DO NOTHING", WATERMARK
+                )
+                state = await conn.fetchrow(
+                    "SELECT last_payment_id, churned_until FROM rollup_watermarks WHERE name = $1 FOR UPDATE",
+                    WATERMARK,
+                )
+                last_id = state["last_payment_id"]
+                batch = await conn.fetchrow(
+                    f"""
+                    SELECT MAX(id) AS upper, COUNT(*) AS count FROM (
+                        SELECT id FROM payments
+                        WHERE id > $1 AND paid_at < NOW() - INTERVAL '{SETTLE_INTERVAL}'
+                        ORDER BY id
+                        LIMIT $2
+                    ) batch
+                    """,
+                    last_id,
+                    self.batch_size,
+                )
+                count, upper = batch["count"], batch["upper"]
+                if upper is not None:
+                    await conn.execute(_DAILY_FROM_PAYMENTS, last_id, upper)
+                    await conn.execute(_COHORT_MEMBERS, last_id, upper)
+                    await conn.execute(_COHORT_RETENTION, last_id, upper, names, days)
+                    last_id = upper
+
+                churned_from = state["churned_until"] or datetime.min
+                await conn.execute(_DAILY_CHURN, churned_from, now)
+                await conn.execute(
+                    "UPDATE daily_metrics SET active = 0 WHERE day = $1 AND active IS NOT NULL", now.date()
+                )
+                await conn.execute(_ACTIVE_SNAPSHOT, now.date(), now)
+                await conn.execute(
+                    """
+                    UPDATE rollup_watermarks SET last_payment_id = $2, churned_until = $3
+                    WHERE name = $1
+                    """,
+                    WATERMARK,
+                    last_id,
+                    now,
+                )
+        logger.info("Metrics rollup processed %d payments up to id %d", count, last_id)
+        return count
+
+
+metrics_rollup = MetricsRollup()
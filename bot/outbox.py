@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""Deliver Telegram side effects queued in the ``outbox`` table."""
+
+import asyncio
+import json
+import logging
+from typing import Dict, List
+
+from telegram import Bot
+
+from bot.config import BOT_TOKEN, TELEGRAM_API_BASE_URL
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxDispatcher:
+    """Drain pending outbox rows in batches and perform them with retries.
+
+    A batch is leased (``locked_until``) in one short statement using
+    ``FOR UPDATE SKIP LOCKED``, so any number of dispatchers (bot process,
+    admin panel workers) can drain concurrently without holding a
+    transaction open across Telegram calls. Each row is then marked done
+    or rescheduled on its own; rows of a dispatcher that died mid-batch
+    are picked up again once their lease expires.
+    """
+
+    def __init__(
+        self,
+        manager=None,
+        bot: Bot | None = None,
+        batch_size: int = 50,
+        max_attempts: int = 8,
+        retry_delay: float = 5.0,
+        lease_timeout: float = 300.0,
+    ):
+        self._manager = manager
+        self._bot = bot
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.lease_timeout = lease_timeout
+        self._wake = asyncio.Event()
+
+    @property
+    def manager(self):
+        if self._manager is None:
+            from bot.subscriber_manager import subscriber_manager
+            self._manager = subscriber_manager
+        return self._manager
+
+    @property
+    def bot(self) -> Bot:
+        if self._bot is None:
+            from bot.telegram_metrics import InstrumentedRequest
+            self._bot = Bot(token=BOT_TOKEN, base_url=TELEGRAM_API_BASE_URL, request=InstrumentedRequest())
+        return self._bot
+
+    async def _perform(self, kind: str, payload: Dict) -> None:
+        if kind == "invite":
+            channel = payload["channel_id"]
+            # A join-request link, so handle_join_request still checks the
+            # subscription when the link is used (or shared)
+            invite = await self.bot.create_chat_invite_link(
+                chat_id=channel,
+                name=f"user {payload['user_id']}",
+                creates_join_request=True,
+            )
+            await self.bot.send_message(
+                chat_id=payload["user_id"],
+                text=f"Join {channel}: {invite.invite_link}",
+            )
+        elif kind == "message":
+            await self.bot.send_message(chat_id=payload["chat_id"], text=payload["text"])
+        else:
+            raise ValueError(f"Unknown outbox kind: {kind}")
+
+    async def _lease(self) -> List:
+        # One autocommitted statement: rows are claimed for ``lease_timeout``
+        # and no lock is held while they are sent
+        async with self.manager.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                UPDATE outbox SET
+                    locked_until=NOW() + make_interval(secs => $2),
+                    attempts=attempts + 1
+                WHERE id IN (
+                    SELECT id FROM outbox
+                    WHERE status = 'pending' AND next_attempt_at <= NOW()
+                      AND (locked_until IS NULL OR locked_until < NOW())
+                    ORDER BY id
+                    LIMIT $1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, kind, payload, attempts
+                """,
+                self.batch_size,
+                self.lease_timeout,
+            )
+        return sorted(rows, key=lambda row: row["id"])
+
+    async def drain_once(self, context=None) -> int:
+        """Process one batch of due rows; return how many were claimed."""
+        rows = await self._lease()
+        for row in rows:
+            try:
+                await self._perform(row["kind"], json.loads(row["payload"]))
+            except Exception as e:
+                attempts = row["attempts"]
+                status = "failed" if attempts >= self.max_attempts else "pending"
+                delay = self.retry_delay * 2 ** (attempts - 1)
+                logger.error("Outbox %s %s failed (attempt %s): %s", row["kind"], row["id"], attempts, e)
+                async with self.manager.pool.acquire() as conn:
+                    await conn.execute(
+                        """
+                        UPDATE outbox SET
+                            status=$2,
+                            last_error=$3,
+                            next_attempt_at=NOW() + make_interval(secs => $4),
+                            locked_until=NULL
+                        WHERE id=$1
+                        """,
+                        row["id"],
+                        status,
+                        str(e),
+                        delay,
+                    )
+                continue
+            async with self.manager.pool.acquire() as conn:
+                await conn.execute(
+                    "UPDATE outbox SET status='done', locked_until=NULL WHERE id=$1",
+                    row["id"],
+                )
+        return len(rows)
+
+    def wake(self) -> None:
+        """Ask a running dispatcher loop to drain right away."""
+        self._wake.set()
+
+    async def run(self, interval: float = 2.0) -> None:
+        """Drain continuously, sleeping between empty batches."""
+        while True:
+            try:
+                claimed = await self.drain_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Outbox dispatcher error: %s", e)
+                claimed = 0
+            if claimed >= self.batch_size:
+                continue
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+outbox_dispatcher = OutboxDispatcher()
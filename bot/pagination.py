@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""Opaque keyset cursors for paginated admin APIs.
+
+A cursor is the sort key of the last row of a page, tagged with the
+ordering it belongs to, so the next page is ``WHERE key > cursor`` on an
+index instead of an ``OFFSET`` walk.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Tuple
+
+MAX_PAGE_SIZE = 200
+DEFAULT_PAGE_SIZE = 50
+
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor is malformed or used with another ordering."""
+
+
+def encode_cursor(order: str, expires_at: Optional[datetime], user_id: int) -> str:
+    key = [user_id] if order == "user_id" else [expires_at.isoformat(), user_id]
+    data = json.dumps({"o": order, "k": key}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str, order: str) -> Tuple[Optional[datetime], int]:
+    """Return ``(expires_at, user_id)``; ``expires_at`` is ``None`` for ``user_id`` order."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if data["o"] != order:
+            raise InvalidCursor("Cursor belongs to a different ordering")
+        if order == "user_id":
+            (user_id,) = data["k"]
+            return None, int(user_id)
+        expires_at, user_id = data["k"]
+        return datetime.fromisoformat(expires_at), int(user_id)
+    except InvalidCursor:
+        raise
+    except (ValueError, TypeError, KeyError) as exc:
+        raise InvalidCursor("Malformed cursor") from exc
+
+
+def clamp_page_size(limit: Optional[int]) -> int:
+    if not limit:
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(limit), MAX_PAGE_SIZE))
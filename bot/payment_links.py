@@ -1,17 +1,220 @@
 # -*- coding: utf-8 -*-
-import hashlib
+import heapq
+import secrets
 import time
 import json
-from typing import Dict, Optional
-from bot.config import generate_bold_link, PLAN_LINK_IDS, PLANS
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from bot.config import generate_bold_link, PLAN_LINK_IDS, PLANS, PAYMENT_LINK_TTL
+from bot.payment_tokens import sign_payment_token
+
+LINK_COLUMNS = (
+    "transaction_id, user_id, plan_id, plan_name, link_id, payment_url, "
+    "status, created_at, completed_at"
+)
+
+
+def _row_to_link(row) -> Dict:
+    link = {
+        "user_id": row["user_id"],
+        "plan_name": row["plan_name"],
+        "plan_id": row["plan_id"],
+        "link_id": row["link_id"],
+        "created_at": row["created_at"],
+        "status": row["status"],
+        "payment_url": row["payment_url"],
+    }
+    if row["completed_at"] is not None:
+        link["completed_at"] = row["completed_at"]
+    return link
+
+
+class PaymentLinkStore:
+    """Persist payment links in the ``payment_links`` table.
+
+    The table is created by ``SubscriberManager`` together with the rest of
+    the schema, so the bot and the admin panel share the same links.
+    """
+
+    def __init__(self, manager=None):
+        self._manager = manager
+
+    @property
+    def manager(self):
+        if self._manager is None:
+            from bot.subscriber_manager import subscriber_manager
+            self._manager = subscriber_manager
+        return self._manager
+
+    async def insert(self, transaction_id: str, link: Dict) -> None:
+        async with self.manager.pool.acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO payment_links (
+                    transaction_id, user_id, plan_id, plan_name, link_id,
+                    payment_url, status, created_at
+                )
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                ON CONFLICT (transaction_id) DO NOTHING
+                """,
+                transaction_id,
+                link["user_id"],
+                link["plan_id"],
+                link["plan_name"],
+                link["link_id"],
+                link["payment_url"],
+                link["status"],
+                link["created_at"],
+            )
+
+    async def get(self, transaction_id: str) -> Optional[Dict]:
+        async with self.manager.pool.acquire() as conn:
+            row = await conn.fetchrow(
+                f"SELECT {LINK_COLUMNS} FROM payment_links WHERE transaction_id = $1",
+                transaction_id,
+            )
+        return _row_to_link(row) if row else None
+
+    async def complete_pending(self, user_id: int, plan_id: str, completed_at: int) -> Optional[str]:
+        """Complete the oldest pending link for a user and plan."""
+        async with self.manager.pool.acquire() as conn:
+            return await conn.fetchval(
+                """
+                UPDATE payment_links SET status='completed', completed_at=$3
+                WHERE transaction_id = (
+                    SELECT transaction_id FROM payment_links
+                    WHERE user_id=$1 AND plan_id=$2 AND status='pending'
+                    ORDER BY created_at
+                    LIMIT 1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING transaction_id
+                """,
+                user_id,
+                plan_id,
+                completed_at,
+            )
+
+    async def complete(self, transaction_id: str, completed_at: int) -> bool:
+        """Complete a specific pending link."""
+        async with self.manager.pool.acquire() as conn:
+            result = await conn.fetchval(
+                """
+                UPDATE payment_links SET status='completed', completed_at=$2
+                WHERE transaction_id=$1 AND status='pending'
+                RETURNING transaction_id
+                """,
+                transaction_id,
+                completed_at,
+            )
+        return result is not None
+
+    async def get_by_user(self, user_id: int) -> List[Dict]:
+        async with self.manager.pool.acquire() as conn:
+            rows = await conn.fetch(
+                f"SELECT {LINK_COLUMNS} FROM payment_links WHERE user_id = $1 ORDER BY created_at",
+                user_id,
+            )
+        return [_row_to_link(row) for row in rows]
+
+    async def expire_pending(self, created_before: int) -> int:
+        """Mark pending links created before ``created_before`` as expired."""
+        async with self.manager.pool.acquire() as conn:
+            result = await conn.execute(
+                """
+                UPDATE payment_links SET status='expired'
+                WHERE status='pending' AND created_at < $1
+                """,
+                created_before,
+            )
+        return int(result.split()[-1]) if result else 0
+
 
 class PaymentLinkGenerator:
     """Generate dynamic payment links with BOLD system"""
     
-    def __init__(self):
-        self.active_links = {}  # Store active payment links
-    
-    def generate_payment_link(self, user_id: int, plan_name: str) -> str:
+    def __init__(
+        self,
+        store: Optional[PaymentLinkStore] = None,
+        cache_size: int = 1024,
+        pending_ttl: int = PAYMENT_LINK_TTL,
+    ):
+        self.store = store
+        self.cache_size = cache_size
+        self.pending_ttl = pending_ttl
+        # LRU read cache in front of the store; the table is the source of truth
+        self.active_links: "OrderedDict[str, Dict]" = OrderedDict()
+        # Secondary indexes over the cached links. Dicts are used as ordered
+        # sets so the oldest pending link for a user and plan comes first.
+        self._pending_by_user_plan: Dict[Tuple[int, str], Dict[str, None]] = {}
+        self._by_user: Dict[int, Dict[str, None]] = {}
+        # Min-heap of (created_at, transaction_id) for the expiry sweeper;
+        # entries for links that are no longer pending (or cached) are
+        # skipped when popped, and pruned once the heap outgrows the cache.
+        self._pending_heap: List[Tuple[int, str]] = []
+
+    def _index_add(self, transaction_id: str, link: Dict) -> None:
+        self._by_user.setdefault(link["user_id"], {})[transaction_id] = None
+        if link["status"] == "pending":
+            key = (link["user_id"], link["plan_name"])
+            self._pending_by_user_plan.setdefault(key, {})[transaction_id] = None
+            heapq.heappush(self._pending_heap, (link["created_at"], transaction_id))
+            if self.cache_size and len(self._pending_heap) > 2 * self.cache_size:
+                self._rebuild_pending_heap()
+
+    def _rebuild_pending_heap(self) -> None:
+        # Drop entries of links completed or evicted since they were pushed,
+        # so the heap stays proportional to the cache
+        self._pending_heap = [
+            (link["created_at"], tx_id)
+            for tx_id, link in self.active_links.items()
+            if link["status"] == "pending"
+        ]
+        heapq.heapify(self._pending_heap)
+
+    def _pending_discard(self, key: Tuple[int, str], transaction_id: str) -> None:
+        pending = self._pending_by_user_plan.get(key)
+        if pending is not None:
+            pending.pop(transaction_id, None)
+            if not pending:
+                del self._pending_by_user_plan[key]
+
+    def _index_discard_pending(self, transaction_id: str, link: Dict) -> None:
+        self._pending_discard((link["user_id"], link["plan_name"]), transaction_id)
+
+    def _index_remove(self, transaction_id: str, link: Dict) -> None:
+        self._index_discard_pending(transaction_id, link)
+        links = self._by_user.get(link["user_id"])
+        if links is not None:
+            links.pop(transaction_id, None)
+            if not links:
+                del self._by_user[link["user_id"]]
+
+    def _cache_put(self, transaction_id: str, link: Dict) -> None:
+        previous = self.active_links.get(transaction_id)
+        if previous is not None:
+            self._index_remove(transaction_id, previous)
+        self.active_links[transaction_id] = link
+        self.active_links.move_to_end(transaction_id)
+        self._index_add(transaction_id, link)
+        while self.cache_size and len(self.active_links) > self.cache_size:
+            evicted_id, evicted = self.active_links.popitem(last=False)
+            self._index_remove(evicted_id, evicted)
+
+    def _cache_get(self, transaction_id: str) -> Optional[Dict]:
+        link = self.active_links.get(transaction_id)
+        if link is not None:
+            self.active_links.move_to_end(transaction_id)
+        return link
+
+    def _cache_complete(self, transaction_id: str, completed_at: int) -> None:
+        link = self.active_links.get(transaction_id)
+        if link is not None and link["status"] == "pending":
+            link["status"] = "completed"
+            link["completed_at"] = completed_at
+            self._index_discard_pending(transaction_id, link)
+
+    async def generate_payment_link(self, user_id: int, plan_name: str) -> str:
         """Generate BOLD payment link with user and plan metadata."""
 
         # Get link ID for plan
@@ -28,16 +231,16 @@ class PaymentLinkGenerator:
         if plan_id is None:
             raise ValueError(f"No plan identifier found for plan: {plan_name}")
         
-        # Create unique transaction ID
+        # The token's random nonce doubles as the transaction ID
         timestamp = int(time.time())
-        unique_string = f"{user_id}_{plan_name}_{timestamp}"
-        transaction_id = hashlib.md5(unique_string.encode()).hexdigest()[:12]
+        transaction_id = secrets.token_hex(8)
+        token = sign_payment_token(user_id, plan_id, issued_at=timestamp, nonce=transaction_id)
         
         # Generate BOLD URL with metadata
-        payment_url = generate_bold_link(link_id, user_id, plan_id)
+        payment_url = generate_bold_link(link_id, user_id, plan_id, token=token)
         
         # Store link for verification
-        self.active_links[transaction_id] = {
+        link = {
             "user_id": user_id,
             "plan_name": plan_name,
             "plan_id": plan_id,
@@ -46,29 +249,76 @@ class PaymentLinkGenerator:
             "status": "pending",
             "payment_url": payment_url
         }
+        if self.store:
+            await self.store.insert(transaction_id, link)
+        self._cache_put(transaction_id, link)
         
         return payment_url
     
-    def verify_payment_link(self, transaction_id: str) -> Optional[Dict]:
+    async def verify_payment_link(self, transaction_id: str) -> Optional[Dict]:
         """Verify if payment link exists and is valid"""
-        return self.active_links.get(transaction_id)
+        link = self._cache_get(transaction_id)
+        if link is None and self.store:
+            link = await self.store.get(transaction_id)
+            if link is not None:
+                self._cache_put(transaction_id, link)
+        return link
     
-    def mark_payment_completed(self, user_id: int, plan_name: str) -> bool:
+    def note_completed(self, transaction_id: str, completed_at: int) -> None:
+        """Reflect a link completed in the database (e.g. by an activation) in the cache."""
+        self._cache_complete(transaction_id, completed_at)
+
+    async def mark_payment_completed(self, user_id: int, plan_name: str) -> bool:
         """Mark payment as completed by user_id and plan"""
-        for tx_id, link_data in self.active_links.items():
-            if (link_data["user_id"] == user_id and 
-                link_data["plan_name"] == plan_name and 
-                link_data["status"] == "pending"):
-                link_data["status"] = "completed"
-                link_data["completed_at"] = int(time.time())
+        completed_at = int(time.time())
+
+        # O(1) hit on the cached pending index
+        pending = self._pending_by_user_plan.get((user_id, plan_name))
+        while pending:
+            tx_id = next(iter(pending))
+            if not self.store or await self.store.complete(tx_id, completed_at):
+                self._cache_complete(tx_id, completed_at)
                 return True
-        return False
+            # Completed or expired by another process (the link may also
+            # have been evicted during the await); drop it and retry
+            self._pending_discard((user_id, plan_name), tx_id)
+            pending = self._pending_by_user_plan.get((user_id, plan_name))
+
+        if not self.store:
+            return False
+        plan_id = next(
+            (p_id for p_id, info in PLANS.items() if info["name"] == plan_name),
+            None,
+        )
+        if plan_id is None:
+            return False
+        tx_id = await self.store.complete_pending(user_id, plan_id, completed_at)
+        if tx_id is None:
+            return False
+        self._cache_complete(tx_id, completed_at)
+        return True
     
-    def get_user_payments(self, user_id: int) -> list:
+    async def get_user_payments(self, user_id: int) -> list:
         """Get all payments for a user"""
-        return [link for link in self.active_links.values() 
-                if link["user_id"] == user_id]
+        if self.store:
+            return await self.store.get_by_user(user_id)
+        return [self.active_links[tx_id] for tx_id in self._by_user.get(user_id, ())]
 
-# Global instance
-payment_generator = PaymentLinkGenerator()
+    async def expire_stale_links(self, context=None) -> int:
+        """Expire pending links older than the configured TTL"""
+        cutoff = int(time.time()) - self.pending_ttl
+        expired = 0
+        while self._pending_heap and self._pending_heap[0][0] < cutoff:
+            _, tx_id = heapq.heappop(self._pending_heap)
+            link = self.active_links.get(tx_id)
+            if link is None or link["status"] != "pending":
+                continue
+            link["status"] = "expired"
+            self._index_discard_pending(tx_id, link)
+            expired += 1
+        if self.store:
+            return await self.store.expire_pending(cutoff)
+        return expired
 
+# Global instance
+payment_generator = PaymentLinkGenerator(PaymentLinkStore())
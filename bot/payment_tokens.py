@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""Stateless, HMAC-signed payment tokens passed through Bold metadata."""
+
+import base64
+import hashlib
+import hmac
+import secrets
+import time
+from typing import Dict, Optional
+
+from bot.config import BOLD_WEBHOOK_SECRET, PAYMENT_TOKEN_SECRET
+
+TOKEN_VERSION = "1"
+SIGNATURE_BYTES = 16
+
+
+class InvalidPaymentToken(ValueError):
+    """Raised when a payment token is malformed, forged or too old."""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: bytes, secret: str) -> bytes:
+    return hmac.new(secret.encode(), payload, hashlib.sha256).digest()[:SIGNATURE_BYTES]
+
+
+def sign_payment_token(
+    user_id: int,
+    plan_id: str,
+    issued_at: Optional[int] = None,
+    nonce: Optional[str] = None,
+    secret: str = PAYMENT_TOKEN_SECRET,
+) -> str:
+    """Return a signed token encoding the user, plan, issue time and nonce."""
+    issued_at = int(time.time()) if issued_at is None else issued_at
+    nonce = nonce or secrets.token_hex(8)
+    payload = f"{TOKEN_VERSION}:{user_id}:{plan_id}:{issued_at}:{nonce}".encode()
+    return f"{_b64encode(payload)}.{_b64encode(_sign(payload, secret))}"
+
+
+def verify_payment_token(
+    token: str,
+    max_age: Optional[int] = None,
+    secret: str = PAYMENT_TOKEN_SECRET,
+) -> Dict:
+    """Check the signature and return the encoded fields."""
+    try:
+        payload_part, signature_part = token.split(".")
+        payload = _b64decode(payload_part)
+        signature = _b64decode(signature_part)
+    except (AttributeError, ValueError) as exc:
+        raise InvalidPaymentToken("Malformed payment token") from exc
+
+    if not hmac.compare_digest(signature, _sign(payload, secret)):
+        raise InvalidPaymentToken("Invalid payment token signature")
+
+    try:
+        version, user_id, plan_id, issued_at, nonce = payload.decode().split(":")
+        claims = {
+            "user_id": int(user_id),
+            "plan_id": plan_id,
+            "issued_at": int(issued_at),
+            "nonce": nonce,
+        }
+    except ValueError as exc:
+        raise InvalidPaymentToken("Malformed payment token payload") from exc
+    if version != TOKEN_VERSION:
+        raise InvalidPaymentToken(f"Unsupported payment token version: {version}")
+
+    if max_age is not None and time.time() - claims["issued_at"] > max_age:
+        raise InvalidPaymentToken("Payment token expired")
+    return claims
+
+
+def verify_provider_signature(
+    body: bytes, signature: Optional[str], secret: Optional[str] = BOLD_WEBHOOK_SECRET
+) -> None:
+    """Check Bold's ``x-bold-signature``: hex HMAC-SHA256 of the base64 encoded body.
+
+    The payment token proves which user and plan a checkout was for, but
+    the user holds it too; only this signature proves Bold sent the event.
+    """
+    if not secret:
+        raise InvalidPaymentToken("BOLD_WEBHOOK_SECRET is not configured")
+    if not signature:
+        raise InvalidPaymentToken("Missing provider signature")
+    expected = hmac.new(secret.encode(), base64.b64encode(body), hashlib.sha256).hexdigest()
+    if not hmac.compare_digest(signature.strip().lower(), expected):
+        raise InvalidPaymentToken("Invalid provider signature")
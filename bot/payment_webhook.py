@@ -1,59 +1,181 @@
 # -*- coding: utf-8 -*-
+import asyncio
+import json
+import time
+
 from fastapi import FastAPI, Request, HTTPException
-from telegram import Bot
-from bot.config import BOT_TOKEN, PLANS
-from bot.subscriber_manager import subscriber_manager
+from bot.config import ACTIVATION_WORKERS, PAYMENT_LINK_TTL, PLANS, WEBHOOK_FAST_ACK
+from bot.subscriber_manager import PaymentLinkConsumed, subscriber_manager
 from bot.payment_links import payment_generator
+from bot.payment_tokens import InvalidPaymentToken, verify_payment_token, verify_provider_signature
+from bot.activation_workers import ActivationWorkerPool
+from bot.outbox import outbox_dispatcher
+from bot.metrics import ACTIVATIONS, WEBHOOKS
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+async def activate_payment(
+    transaction_id: str, user_id: int, plan_id: str, payment_nonce: str | None = None
+) -> None:
+    """Activate the subscription paid by a verified webhook
+
+    The payment link named by ``payment_nonce`` is consumed in the same
+    transaction, so each checkout activates at most once.
+    """
+    plan_name = PLANS[plan_id]["name"]
+
+    # Add subscriber; the confirmation and invites go through the outbox
+    success = await subscriber_manager.add_subscriber(
+        user_id=user_id,
+        plan_name=plan_name,
+        transaction_id=transaction_id,
+        confirmation=f"✅ Payment confirmed! Your {plan_name} subscription is now active.",
+        payment_nonce=payment_nonce,
+    )
+    if not success:
+        ACTIVATIONS.inc(result="failed")
+        raise RuntimeError(f"Could not activate subscription {transaction_id}")
+    if payment_nonce is not None:
+        payment_generator.note_completed(payment_nonce, int(time.time()))
+    ACTIVATIONS.inc(result="activated")
+    outbox_dispatcher.wake()
+
+    logger.info(f"Payment confirmed for user {user_id}, plan {plan_name}")
+
+
+async def _process_payment_event(event: dict) -> None:
+    await activate_payment(
+        event["transaction_id"], event["user_id"], event["plan_id"], event.get("payment_nonce")
+    )
+    await subscriber_manager.complete_webhook(event["transaction_id"])
+
+
+async def _fail_payment_event(event: dict, error: Exception) -> None:
+    await subscriber_manager.fail_webhook(event["transaction_id"], str(error))
+
+
+activation_pool = ActivationWorkerPool(
+    _process_payment_event,
+    on_failure=_fail_payment_event,
+    workers=ACTIVATION_WORKERS,
+)
+
+
+async def recover_payment_events() -> int:
+    """Re-queue payment events left unfinished by a previous process"""
+    events = await subscriber_manager.reclaim_stale_webhooks()
+    for event in events:
+        activation_pool.submit(event)
+    if events:
+        logger.info(f"Recovered {len(events)} unfinished payment events")
+    return len(events)
+
+
+async def run_payment_recovery(interval: float = 60.0) -> None:
+    """Keep re-queueing payment events whose processing was interrupted
+
+    Reclaimed events may already have been activated; activation is
+    idempotent per transaction, so running them again is harmless.
+    """
+    while True:
+        try:
+            await recover_payment_events()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Could not recover payment events: {e}")
+        await asyncio.sleep(interval)
+
+
 async def handle_payment_webhook(request: Request):
     """Handle payment confirmation webhook"""
     try:
-        data = await request.json()
+        body = await request.body()
+        # Only Bold can sign the body; the payment token alone is also
+        # known to the user from their checkout URL
+        try:
+            verify_provider_signature(body, request.headers.get("x-bold-signature"))
+        except InvalidPaymentToken as e:
+            logger.warning(f"Rejected unsigned payment webhook: {e}")
+            WEBHOOKS.inc(outcome="forbidden")
+            raise HTTPException(status_code=401, detail="Invalid provider signature")
+        data = json.loads(body)
         
         # Extract payment info (adjust based on your payment provider)
         transaction_id = data.get("transaction_id")
-        user_id = data.get("user_id")
         metadata = data.get("metadata", {})
-        plan_id = metadata.get("plan_id")
+        token = metadata.get("token")
         status = data.get("status")
         
-        if status == "completed" and transaction_id:
-            # Verify payment link
-            payment_info = payment_generator.verify_payment_link(transaction_id)
-            
-            if payment_info:
-                # Look up plan name using identifier
-                plan_info = PLANS.get(plan_id)
-                if not plan_info:
-                    raise ValueError(f"Unknown plan id: {plan_id}")
-                plan_name = plan_info["name"]
-
-                # Mark payment as completed
-                payment_generator.mark_payment_completed(user_id, plan_name)
-
-                # Add subscriber
-                success = await subscriber_manager.add_subscriber(
-                    user_id=user_id,
-                    plan_name=plan_name,
-                    transaction_id=transaction_id
-                )
-                
-                if success:
-                    # Send confirmation to user
-                    bot = Bot(token=BOT_TOKEN)
-                    await bot.send_message(
-                        chat_id=user_id,
-                        text=f"✅ Payment confirmed! Your {plan_name} subscription is now active."
-                    )
-                    
-                    logger.info(f"Payment confirmed for user {user_id}, plan {plan_name}")
-                    return {"status": "success"}
+        if status == "completed" and transaction_id and token:
+            # Verify the signed token; no storage lookup is needed
+            try:
+                claims = verify_payment_token(token, max_age=PAYMENT_LINK_TTL)
+            except InvalidPaymentToken as e:
+                logger.warning(f"Rejected payment webhook {transaction_id}: {e}")
+                WEBHOOKS.inc(outcome="forbidden")
+                raise HTTPException(status_code=403, detail="Invalid payment token")
+
+            user_id = claims["user_id"]
+            plan_id = claims["plan_id"]
+            if data.get("user_id") is not None and int(data["user_id"]) != user_id:
+                WEBHOOKS.inc(outcome="forbidden")
+                raise HTTPException(status_code=403, detail="User does not match payment token")
+            if plan_id not in PLANS:
+                raise ValueError(f"Unknown plan id: {plan_id}")
+            payment_nonce = claims["nonce"]
+
+            # Provider retries must not activate the subscription twice. This
+            # comes first: once a transaction completes its link is no longer
+            # pending, and its retries must still be answered as duplicates
+            if not await subscriber_manager.claim_webhook(transaction_id, user_id, plan_id, payment_nonce):
+                logger.info(f"Duplicate payment webhook {transaction_id} ignored")
+                WEBHOOKS.inc(outcome="duplicate")
+                return {"status": "duplicate"}
+
+            link = await payment_generator.verify_payment_link(payment_nonce)
+            if link is None or link["status"] != "pending":
+                # A new transaction for a link another one already paid;
+                # activation re-checks this atomically, this just answers early
+                logger.warning(f"Payment webhook {transaction_id} reuses payment link {payment_nonce}")
+                await subscriber_manager.fail_webhook(transaction_id, f"payment link {payment_nonce} already used")
+                WEBHOOKS.inc(outcome="replayed")
+                raise HTTPException(status_code=409, detail="Payment link already used")
+
+            event = {
+                "transaction_id": transaction_id,
+                "user_id": user_id,
+                "plan_id": plan_id,
+                "payment_nonce": payment_nonce,
+            }
+            if WEBHOOK_FAST_ACK and activation_pool.running:
+                # The claim row persists the event; activation happens in the background
+                activation_pool.submit(event)
+                WEBHOOKS.inc(outcome="accepted")
+                return {"status": "accepted"}
+
+            try:
+                await _process_payment_event(event)
+            except PaymentLinkConsumed as e:
+                await subscriber_manager.fail_webhook(transaction_id, f"payment link {e} already used")
+                WEBHOOKS.inc(outcome="replayed")
+                raise HTTPException(status_code=409, detail="Payment link already used")
+            except Exception:
+                # Let the provider retry the activation
+                await subscriber_manager.release_webhook(transaction_id)
+                WEBHOOKS.inc(outcome="failed")
+                raise HTTPException(status_code=500, detail="Could not activate subscription")
+            WEBHOOKS.inc(outcome="success")
+            return {"status": "success"}
         
+        WEBHOOKS.inc(outcome="ignored")
         return {"status": "ignored"}
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Webhook error: {e}")
+        WEBHOOKS.inc(outcome="invalid")
         raise HTTPException(status_code=400, detail=str(e))
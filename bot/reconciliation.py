@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+"""Reconcile provider payment exports against the ``payments`` ledger.
+
+Exports are streamed row by row and joined against the ledger in
+batches, so memory use does not depend on the size of the export. The
+ledger keeps one row per transaction, so earlier payments of users who
+renewed since are still found, with the plan and amount they paid.
+"""
+
+import csv
+import json
+import logging
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional
+
+from bot.config import PLANS, PLAN_PRICE_CENTS
+
+logger = logging.getLogger(__name__)
+
+SETTLED_STATUSES = {"approved", "completed", "settled", "paid", "succeeded"}
+TRANSACTION_ID_FIELDS = ("transaction_id", "payment_id", "reference", "id")
+AMOUNT_FIELDS = ("amount", "total", "total_amount")
+
+PRICE_CENTS_BY_PLAN_NAME = {
+    info["name"]: PLAN_PRICE_CENTS[plan_id] for plan_id, info in PLANS.items()
+}
+
+
+def _first(row: Dict, fields) -> Optional[str]:
+    for field in fields:
+        value = row.get(field)
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def normalize_row(row: Dict) -> Optional[Dict]:
+    """Map a raw export row to ``transaction_id``/``amount_cents``.
+
+    Returns ``None`` for rows that are not settled payments.
+    """
+    status = str(row.get("status") or "").strip().lower()
+    if status and status not in SETTLED_STATUSES:
+        return None
+    transaction_id = _first(row, TRANSACTION_ID_FIELDS)
+    if transaction_id is None:
+        return None
+
+    amount_cents = None
+    if row.get("amount_cents") not in (None, ""):
+        amount_cents = int(row["amount_cents"])
+    else:
+        amount = _first(row, AMOUNT_FIELDS)
+        if amount is not None:
+            try:
+                amount_cents = int(Decimal(str(amount).lstrip("$").replace(",", "")) * 100)
+            except InvalidOperation:
+                logger.warning("Unparseable amount %r for %s", amount, transaction_id)
+    return {"transaction_id": str(transaction_id), "amount_cents": amount_cents}
+
+
+def iter_export(path: str, fmt: Optional[str] = None) -> Iterator[Dict]:
+    """Yield normalized rows from a CSV or NDJSON export, one line at a time."""
+    fmt = fmt or ("csv" if path.lower().endswith(".csv") else "ndjson")
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            raw_rows: Iterable[Dict] = csv.DictReader(f)
+        else:
+            raw_rows = (json.loads(line) for line in f if line.strip())
+        for raw in raw_rows:
+            row = normalize_row(raw)
+            if row is not None:
+                yield row
+
+
+def batched(rows: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    iterator = iter(rows)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+async def reconcile(
+    conn,
+    rows: Iterable[Dict],
+    batch_size: int = 1000,
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+) -> AsyncIterator[Dict]:
+    """Yield discrepancies between export ``rows`` and the ``payments`` ledger.
+
+    Produces ``missing_activation`` (paid but never activated),
+    ``amount_mismatch`` (paid amount differs from the amount recorded for
+    that transaction) and ``orphan_subscription`` (ledger payment whose
+    transaction is not in the export, optionally limited to payments made
+    in ``[since, until)``). Transactions activated before the ledger
+    existed are looked up in ``subscribers`` and checked against their
+    plan price. ``conn`` must be a dedicated asyncpg connection.
+    """
+    async with conn.transaction():
+        # Export ids are staged server-side so orphans can be found with an
+        # anti-join instead of holding every id in memory.
+        await conn.execute(
+            "CREATE TEMP TABLE reconcile_export (transaction_id TEXT PRIMARY KEY) ON COMMIT DROP"
+        )
+        for batch in batched(rows, batch_size):
+            ids = list({row["transaction_id"] for row in batch})
+            found = {
+                r["transaction_id"]: r
+                for r in await conn.fetch(
+                    """
+                    SELECT transaction_id, user_id, plan, amount_cents FROM payments
+                    WHERE transaction_id = ANY($1::TEXT[])
+                    UNION ALL
+                    SELECT s.transaction_id, s.user_id, s.plan, NULL FROM subscribers s
+                    WHERE s.transaction_id = ANY($1::TEXT[])
+                      AND NOT EXISTS (SELECT 1 FROM payments p WHERE p.transaction_id = s.transaction_id)
+                    """,
+                    ids,
+                )
+            }
+            await conn.execute(
+                """
+                INSERT INTO reconcile_export (transaction_id)
+                SELECT unnest($1::TEXT[]) ON CONFLICT DO NOTHING
+                """,
+                ids,
+            )
+            for row in batch:
+                payment = found.get(row["transaction_id"])
+                if payment is None:
+                    yield {"kind": "missing_activation", **row}
+                    continue
+                expected = payment["amount_cents"]
+                if expected is None:
+                    expected = PRICE_CENTS_BY_PLAN_NAME.get(payment["plan"])
+                if row["amount_cents"] is not None and expected is not None and row["amount_cents"] != expected:
+                    yield {
+                        "kind": "amount_mismatch",
+                        "transaction_id": row["transaction_id"],
+                        "user_id": payment["user_id"],
+                        "plan": payment["plan"],
+                        "amount_cents": row["amount_cents"],
+                        "expected_cents": expected,
+                    }
+
+        query = """
+            SELECT p.transaction_id, p.user_id, p.plan FROM payments p
+            WHERE ($1::TIMESTAMP IS NULL OR p.paid_at >= $1)
+              AND ($2::TIMESTAMP IS NULL OR p.paid_at < $2)
+              AND NOT EXISTS (
+                  SELECT 1 FROM reconcile_export e WHERE e.transaction_id = p.transaction_id
+              )
+        """
+        async for r in conn.cursor(query, since, until, prefetch=batch_size):
+            yield {
+                "kind": "orphan_subscription",
+                "transaction_id": r["transaction_id"],
+                "user_id": r["user_id"],
+                "plan": r["plan"],
+            }
@@ -0,0 +1,158 @@
+# -*- coding: utf-8 -*-
+"""Static bot screens, rendered once per language instead of on every click."""
+
+import logging
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from bot.config import PLANS
+from bot.texts import TEXTS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LANGUAGE = "en"
+
+HELP_TEXT = """🎬 **PNP Television Bot Help**
+
+**Available Commands:**
+/start - Start the bot and select language
+/help - Show this help message
+/plans - View subscription plans
+
+**How to Subscribe:**
+1. Use /plans to see available options
+2. Choose your preferred plan
+3. Complete payment through the secure link
+4. Get instant access to your content!
+
+**Support:**
+If you need help, contact our support team at @PNPTVSupport"""
+
+PLANS_COMMAND_TEXT = """🎬 **Choose Your Plan**
+
+Select the perfect plan for your needs and get instant access to premium content.
+
+Choose your perfect plan below:"""
+
+
+class Screen(NamedTuple):
+    text: str
+    reply_markup: Optional[InlineKeyboardMarkup]
+    parse_mode: Optional[str]
+
+
+Builder = Callable[[Dict[str, str], bool], Tuple[str, List[List[InlineKeyboardButton]], Optional[str]]]
+
+
+class ScreenRegistry:
+    """Precomputed ``Screen`` per (screen, language, is_admin).
+
+    Builders return ``(text, keyboard rows, parse_mode)`` from ``TEXTS``
+    and ``PLANS`` only; anything that depends on the user beyond language
+    and admin flag (payment links, statistics) is rendered by its handler.
+    Telegram objects are immutable, so one instance is shared by every
+    request.
+    """
+
+    def __init__(self, languages=TEXTS):
+        self.languages = languages
+        self._builders: Dict[str, Builder] = {}
+        self._screens: Dict[Tuple[str, str, bool], Screen] = {}
+
+    def register(self, name: str) -> Callable[[Builder], Builder]:
+        def decorator(builder: Builder) -> Builder:
+            self._builders[name] = builder
+            self._screens.clear()
+            return builder
+        return decorator
+
+    def build(self) -> int:
+        """Render every registered screen; return the number built."""
+        screens = {}
+        for name, builder in self._builders.items():
+            for lang, texts in self.languages.items():
+                for is_admin in (False, True):
+                    text, rows, parse_mode = builder(texts, is_admin)
+                    markup = InlineKeyboardMarkup(rows) if rows else None
+                    screens[(name, lang, is_admin)] = Screen(text, markup, parse_mode)
+        self._screens = screens
+        logger.info("Built %d screens", len(screens))
+        return len(screens)
+
+    def get(self, name: str, lang: str = DEFAULT_LANGUAGE, is_admin: bool = False) -> Screen:
+        if not self._screens:
+            self.build()
+        if lang not in self.languages:
+            lang = DEFAULT_LANGUAGE
+        return self._screens[(name, lang, bool(is_admin))]
+
+
+screens = ScreenRegistry()
+
+
+def _plan_rows() -> List[List[InlineKeyboardButton]]:
+    return [
+        [InlineKeyboardButton(f"{info['name']} - {info['price']}", callback_data=f"plan_{plan_id}")]
+        for plan_id, info in PLANS.items()
+    ]
+
+
+@screens.register("age_verification")
+def _age_verification(t, is_admin):
+    rows = [
+        [InlineKeyboardButton(t["confirm_age"], callback_data="confirm_age")],
+        [InlineKeyboardButton(t["decline_age"], callback_data="decline_age")],
+    ]
+    return t["age_warning"], rows, "Markdown"
+
+
+@screens.register("main_menu")
+def _main_menu(t, is_admin):
+    rows = [
+        [InlineKeyboardButton(t["plans"], callback_data="show_plans")],
+        [InlineKeyboardButton(t["policies_menu"], callback_data="policies")],
+        [InlineKeyboardButton(t["contact"], callback_data="contact")],
+    ]
+    if is_admin:
+        rows.append([InlineKeyboardButton("🔧 Admin Stats", callback_data="admin_stats")])
+    return f"{t['welcome']}\n\n{t['welcome_desc']}", rows, "Markdown"
+
+
+@screens.register("plans")
+def _plans(t, is_admin):
+    rows = _plan_rows() + [[InlineKeyboardButton(t["back"], callback_data="main_menu")]]
+    return f"{t['plans_title']}\n\n{t['plan_benefits']}", rows, "Markdown"
+
+
+@screens.register("plans_command")
+def _plans_command(t, is_admin):
+    return PLANS_COMMAND_TEXT, _plan_rows(), "Markdown"
+
+
+@screens.register("policies")
+def _policies(t, is_admin):
+    rows = [
+        [InlineKeyboardButton(t["terms_label"], callback_data="terms")],
+        [InlineKeyboardButton(t["privacy_label"], callback_data="privacy")],
+        [InlineKeyboardButton(t["refund_label"], callback_data="refund")],
+        [InlineKeyboardButton(t["back"], callback_data="main_menu")],
+    ]
+    return t["policies_menu"], rows, None
+
+
+def _page(key: str, back: str) -> Builder:
+    def builder(t, is_admin):
+        return t[key], [[InlineKeyboardButton(t["back"], callback_data=back)]], "Markdown"
+    return builder
+
+
+screens.register("terms")(_page("terms_content", "policies"))
+screens.register("privacy")(_page("privacy_content", "policies"))
+screens.register("refund")(_page("refund_content", "policies"))
+screens.register("contact")(_page("contact_info", "main_menu"))
+
+
+@screens.register("help")
+def _help(t, is_admin):
+    return HELP_TEXT, [[InlineKeyboardButton(t["back"], callback_data="main_menu")]], "Markdown"
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""Per-user language and age verification, cached in front of Postgres."""
+
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Tuple
+
+from bot.config import SESSION_CACHE_SIZE, SESSION_CACHE_TTL
+from bot.texts import TEXTS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LANGUAGE = "en"
+
+
+class SessionStore:
+    """Bounded LRU of user sessions backed by the ``users`` table.
+
+    A session is loaded from the database the first time a user is seen
+    and reloaded after ``ttl`` seconds, so replicas converge on changes
+    made elsewhere. Writes update the cache and go straight through to the
+    database, which keeps the state across restarts.
+    """
+
+    def __init__(self, manager=None, max_size: int = SESSION_CACHE_SIZE, ttl: float = SESSION_CACHE_TTL):
+        self._manager = manager
+        self.max_size = max_size
+        self.ttl = ttl
+        self._sessions: "OrderedDict[int, Tuple[float, Dict]]" = OrderedDict()
+
+    @property
+    def manager(self):
+        if self._manager is None:
+            from bot.subscriber_manager import subscriber_manager
+            self._manager = subscriber_manager
+        return self._manager
+
+    def _store(self, user_id: int, session: Dict) -> Dict:
+        self._sessions[user_id] = (time.monotonic(), session)
+        self._sessions.move_to_end(user_id)
+        while len(self._sessions) > self.max_size:
+            self._sessions.popitem(last=False)
+        return session
+
+    async def get(self, user_id: int) -> Dict:
+        """Return ``{"language", "age_verified"}`` for a user."""
+        cached = self._sessions.get(user_id)
+        if cached is not None and time.monotonic() - cached[0] < self.ttl:
+            self._sessions.move_to_end(user_id)
+            return cached[1]
+        try:
+            stored = await self.manager.get_session(user_id)
+        except Exception as e:
+            logger.error("Failed to load session for %s: %s", user_id, e)
+            # Keep serving what we had; retry on the next call
+            return cached[1] if cached is not None else {"language": None, "age_verified": False}
+        return self._store(user_id, stored or {"language": None, "age_verified": False})
+
+    async def language(self, user_id: int) -> str:
+        language = (await self.get(user_id))["language"]
+        # Rows written before languages were validated may hold anything
+        return language if language in TEXTS else DEFAULT_LANGUAGE
+
+    async def is_age_verified(self, user_id: int) -> bool:
+        return (await self.get(user_id))["age_verified"]
+
+    async def set_language(self, user_id: int, language: str) -> None:
+        if language not in TEXTS:
+            raise ValueError(f"Unsupported language: {language!r}")
+        session = dict(await self.get(user_id), language=language)
+        self._store(user_id, session)
+        await self.manager.record_user(user_id, language)
+
+    async def verify_age(self, user_id: int) -> None:
+        session = dict(await self.get(user_id), age_verified=True)
+        self._store(user_id, session)
+        await self.manager.record_age_verified(user_id)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+
+user_sessions = SessionStore()
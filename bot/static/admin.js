@@ -0,0 +1,128 @@
+let stats = {};
+
+function renderStats(data, updatedAt) {
+    stats = Object.assign(stats, data);
+    const updated = updatedAt ? new Date(updatedAt) : new Date();
+    document.getElementById('lastUpdated').textContent = updated.toLocaleString();
+    document.getElementById('totalUsers').textContent = stats.total || 0;
+    document.getElementById('activeUsers').textContent = stats.active || 0;
+    document.getElementById('totalRevenue').textContent = '$' + ((stats.revenue_cents || 0) / 100).toFixed(2);
+    document.getElementById('expiringSoon').textContent = stats.expiring_soon || 0;
+}
+
+function adminToken() {
+    let token = sessionStorage.getItem('adminToken');
+    if (!token) {
+        token = prompt('Admin API token');
+        if (token) sessionStorage.setItem('adminToken', token);
+    }
+    return token;
+}
+
+class AuthError extends Error {}
+
+async function adminFetch(url, options = {}) {
+    // Every /api endpoint requires the admin token
+    const token = adminToken();
+    if (!token) throw new AuthError('Admin token required');
+    const headers = Object.assign({ 'Authorization': 'Bearer ' + token }, options.headers || {});
+    const response = await fetch(url, Object.assign({}, options, { headers }));
+    if (response.status === 401) {
+        sessionStorage.removeItem('adminToken');
+        throw new AuthError('Invalid admin token');
+    }
+    return response;
+}
+
+async function refreshStats(notify) {
+    try {
+        const response = await adminFetch('/api/stats');
+        const data = await response.json();
+
+        if (data.success) {
+            renderStats(data.data, data.updated_at);
+            if (notify) alert('✅ Statistics updated!');
+        } else if (notify) {
+            alert('❌ Error updating statistics');
+        }
+    } catch (error) {
+        console.error('Error:', error);
+        if (notify) alert(error instanceof AuthError ? '❌ ' + error.message : '❌ Connection error');
+    }
+}
+
+function handleStatsEvent(block) {
+    let event = 'message';
+    let data = '';
+    for (const line of block.split('\n')) {
+        if (line.startsWith('event: ')) event = line.slice(7);
+        else if (line.startsWith('data: ')) data += line.slice(6);
+    }
+    if ((event === 'snapshot' || event === 'delta') && data) {
+        const payload = JSON.parse(data);
+        renderStats(payload.data, payload.updated_at);
+    }
+}
+
+async function streamStats() {
+    // EventSource cannot send the Authorization header, so the
+    // Server-Sent Events stream is read with fetch
+    const response = await adminFetch('/api/stats/stream', { headers: { 'Accept': 'text/event-stream' } });
+    if (!response.ok) throw new Error('Stats stream answered ' + response.status);
+    const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = '';
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) return;
+        buffer += value;
+        let end;
+        while ((end = buffer.indexOf('\n\n')) >= 0) {
+            handleStatsEvent(buffer.slice(0, end));
+            buffer = buffer.slice(end + 2);
+        }
+    }
+}
+
+function connectStats() {
+    if (!window.ReadableStream || !window.TextDecoderStream) {
+        // Old browsers keep polling
+        setInterval(refreshStats, 30000);
+        refreshStats();
+        return;
+    }
+    streamStats()
+        .then(() => null, (error) => {
+            console.error('Stats stream:', error);
+            return error;
+        })
+        .then((error) => {
+            // Reconnect when the stream ends or the network fails; without
+            // a valid token there is nothing to reconnect with
+            if (error instanceof AuthError) alert('❌ ' + error.message);
+            else setTimeout(connectStats, 5000);
+        });
+}
+
+async function testWebhook() {
+    alert('🧪 Webhook endpoint: /webhook/payment\nReady to receive BOLD payments!');
+}
+
+async function exportData() {
+    try {
+        // A navigation cannot send the Authorization header, so ask for a
+        // short-lived signed URL; the browser then streams the file to disk
+        const response = await adminFetch('/api/export/subscribers/link?format=csv', { method: 'POST' });
+        const data = await response.json();
+        if (!response.ok || !data.success) {
+            alert('❌ Export failed');
+            return;
+        }
+        window.location.href = data.url;
+    } catch (error) {
+        console.error('Error:', error);
+        alert(error instanceof AuthError ? '❌ ' + error.message : '❌ Connection error');
+    }
+}
+
+// Live updates pushed by the server
+connectStats();
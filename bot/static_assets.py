@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+"""Admin panel assets, built once at startup and served from memory.
+
+Stylesheets and scripts in ``bot/static`` are renamed to content-hashed
+file names (``admin.3f9c1e2a7b.css``) so they can be cached forever, the
+HTML page has its ``{{ name }}`` placeholders rewritten to those names,
+and every file is precompressed with gzip and, when the ``brotli``
+package is installed, brotli. Serving a request is then a dict lookup.
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+from typing import Dict, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+STATIC_PREFIX = "/static/"
+INDEX_FILE = "admin.html"
+
+_PLACEHOLDER = re.compile(r"\{\{\s*([\w.-]+)\s*\}\}")
+# Bodies below this size are not worth the extra round of decompression
+_MIN_COMPRESS_SIZE = 256
+
+
+class StaticAsset:
+    """One file with its identity, gzip and brotli encodings and strong ETag."""
+
+    def __init__(self, name: str, body: bytes, content_type: str):
+        self.name = name
+        self.content_type = content_type
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:20] + '"'
+        self.encodings: Dict[str, bytes] = {"identity": body}
+        if len(body) >= _MIN_COMPRESS_SIZE:
+            # mtime=0 keeps the gzip bytes identical across restarts
+            compressed = gzip.compress(body, compresslevel=9, mtime=0)
+            if len(compressed) < len(body):
+                self.encodings["gzip"] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(body, quality=11)
+                if len(compressed) < len(body):
+                    self.encodings["br"] = compressed
+
+    def select(self, accept_encoding: Optional[str]) -> Tuple[str, bytes]:
+        """Pick the smallest encoding the client accepts."""
+        accepted = _parse_accept_encoding(accept_encoding)
+        for encoding in ("br", "gzip"):
+            if encoding in self.encodings and accepted.get(encoding, accepted.get("*", 0)) > 0:
+                return encoding, self.encodings[encoding]
+        return "identity", self.encodings["identity"]
+
+    def etag_for(self, encoding: str) -> str:
+        # Each representation needs its own strong validator
+        if encoding == "identity":
+            return self.etag
+        return self.etag[:-1] + "-" + encoding + '"'
+
+
+def _parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    accepted: Dict[str, float] = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        if not coding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[coding.strip().lower()] = quality
+    return accepted
+
+
+def _content_type(name: str) -> str:
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type.endswith("javascript"):
+        content_type += "; charset=utf-8"
+    return content_type
+
+
+class AssetBundle:
+    """The admin page plus its hashed static files."""
+
+    def __init__(self, directory: str = STATIC_DIR, index: str = INDEX_FILE):
+        self.assets: Dict[str, StaticAsset] = {}
+        self.urls: Dict[str, str] = {}
+
+        for name in sorted(os.listdir(directory)):
+            if name == index:
+                continue
+            with open(os.path.join(directory, name), "rb") as f:
+                body = f.read()
+            stem, ext = os.path.splitext(name)
+            hashed = f"{stem}.{hashlib.sha256(body).hexdigest()[:10]}{ext}"
+            self.assets[hashed] = StaticAsset(hashed, body, _content_type(name))
+            self.urls[name] = STATIC_PREFIX + hashed
+
+        with open(os.path.join(directory, index), encoding="utf-8") as f:
+            html = f.read()
+        html = _PLACEHOLDER.sub(lambda m: self.urls[m.group(1)], html)
+        self.index = StaticAsset(index, html.encode("utf-8"), "text/html; charset=utf-8")
+
+    def get(self, name: str) -> Optional[StaticAsset]:
+        return self.assets.get(name)
+
+
+admin_assets = AssetBundle()
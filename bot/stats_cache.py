@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Short-lived, single-flight cache of the bot statistics."""
+
+import asyncio
+import hashlib
+import json
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional
+
+from bot.config import STATS_CACHE_TTL
+
+
+async def _load_stats() -> Dict:
+    from bot.subscriber_manager import subscriber_manager
+    return await subscriber_manager.get_stats()
+
+
+class StatsSnapshot:
+    """Cache ``get_stats()`` for ``ttl`` seconds and share in-flight refreshes.
+
+    Concurrent callers that find the snapshot stale all await the same
+    refresh, so the database sees at most one stats query per TTL. ``etag``
+    and ``last_modified`` only change when the numbers do.
+    """
+
+    def __init__(self, loader: Callable[[], Awaitable[Dict]] = _load_stats, ttl: float = STATS_CACHE_TTL):
+        self.loader = loader
+        self.ttl = ttl
+        self.data: Optional[Dict] = None
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[datetime] = None
+        self.updated_at: Optional[datetime] = None
+        self._fetched_at = 0.0
+        self._refresh: Optional[asyncio.Future] = None
+
+    @property
+    def fresh(self) -> bool:
+        return self.data is not None and time.monotonic() - self._fetched_at < self.ttl
+
+    async def get(self) -> Dict:
+        if self.fresh:
+            return self.data
+        return await self.refresh()
+
+    async def refresh(self) -> Dict:
+        if self._refresh is None:
+            self._refresh = asyncio.ensure_future(self._load())
+            self._refresh.add_done_callback(self._clear_refresh)
+        return await asyncio.shield(self._refresh)
+
+    def _clear_refresh(self, future: asyncio.Future) -> None:
+        if self._refresh is future:
+            self._refresh = None
+
+    async def _load(self) -> Dict:
+        data = await self.loader()
+        body = json.dumps(data, sort_keys=True, default=str).encode()
+        etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        if etag != self.etag:
+            self.etag = etag
+            self.last_modified = now
+        self.data = data
+        self.updated_at = now
+        self._fetched_at = time.monotonic()
+        return data
+
+
+stats_snapshot = StatsSnapshot()
+
+_expiring_snapshots: Dict[int, StatsSnapshot] = {}
+
+
+def expiring_snapshot(days: int) -> StatsSnapshot:
+    """Shared snapshot of the number of subscriptions expiring within ``days``."""
+    snapshot = _expiring_snapshots.get(days)
+    if snapshot is None:
+        async def load() -> Dict:
+            from bot.subscriber_manager import subscriber_manager
+            result = await subscriber_manager.expiring_within(days)
+            return {"days": days, "count": result["count"]}
+
+        snapshot = _expiring_snapshots[days] = StatsSnapshot(loader=load)
+    return snapshot
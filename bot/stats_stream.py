@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""Push statistics changes to dashboard clients over Server-Sent Events."""
+
+import asyncio
+import json
+import logging
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+from bot.stats_cache import StatsSnapshot, stats_snapshot
+
+logger = logging.getLogger(__name__)
+
+NOTIFY_CHANNEL = "subscription_changes"
+
+
+class StatsBroadcaster:
+    """Single producer that refreshes stats on change and fans out deltas.
+
+    Subscription writes send ``NOTIFY subscription_changes``; the producer
+    listens on one pooled connection, refreshes the shared snapshot and
+    pushes only the fields that changed to every connected client. A
+    periodic refresh catches changes with no notification, such as
+    subscriptions expiring.
+    """
+
+    def __init__(
+        self,
+        snapshot: StatsSnapshot = stats_snapshot,
+        fallback_interval: float = 30.0,
+        debounce: float = 0.25,
+        client_queue_size: int = 16,
+    ):
+        self.snapshot = snapshot
+        self.fallback_interval = fallback_interval
+        self.debounce = debounce
+        self.client_queue_size = client_queue_size
+        self.current: Optional[Dict] = None
+        self._clients: Set[asyncio.Queue] = set()
+        self._changed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._listen_conn = None
+        self._pool = None
+
+    @property
+    def clients(self) -> int:
+        return len(self._clients)
+
+    def _on_notify(self, connection, pid, channel, payload) -> None:
+        self._changed.set()
+
+    async def start(self, pool=None) -> None:
+        if pool is None:
+            from bot.subscriber_manager import subscriber_manager
+            pool = subscriber_manager.pool
+        try:
+            self._listen_conn = await pool.acquire()
+            await self._listen_conn.add_listener(NOTIFY_CHANNEL, self._on_notify)
+            self._pool = pool
+        except Exception as e:
+            logger.error("LISTEN %s failed, falling back to polling: %s", NOTIFY_CHANNEL, e)
+            if self._listen_conn is not None:
+                await pool.release(self._listen_conn)
+            self._listen_conn = None
+        self._task = asyncio.create_task(self._run(), name="stats-broadcaster")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._listen_conn is not None:
+            try:
+                await self._listen_conn.remove_listener(NOTIFY_CHANNEL, self._on_notify)
+            finally:
+                await self._pool.release(self._listen_conn)
+            self._listen_conn = None
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.client_queue_size)
+        self._clients.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        self._clients.discard(queue)
+
+    def _publish(self, delta: Dict) -> None:
+        for queue in self._clients:
+            if queue.full():
+                # A slow client only needs the latest numbers: collapse its
+                # backlog into one delta so no changed field is lost
+                merged = {}
+                while not queue.empty():
+                    merged.update(queue.get_nowait())
+                merged.update(delta)
+                queue.put_nowait(merged)
+            else:
+                queue.put_nowait(delta)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._changed.wait(), self.fallback_interval)
+                # Coalesce bursts of writes into one refresh
+                await asyncio.sleep(self.debounce)
+            except asyncio.TimeoutError:
+                pass
+            self._changed.clear()
+            try:
+                data = await self.snapshot.refresh()
+            except Exception as e:
+                logger.error("Stats refresh failed: %s", e)
+                continue
+            previous = self.current or {}
+            delta = {key: value for key, value in data.items() if previous.get(key) != value}
+            self.current = dict(data)
+            if delta and self._clients:
+                self._publish(delta)
+
+
+def format_event(event: str, data: Dict, updated_at: Optional[datetime] = None) -> str:
+    """Serialize one SSE event shaped like the ``/api/stats`` response body.
+
+    ``updated_at`` is when the snapshot behind ``data`` was computed, so the
+    dashboard can show how old the numbers are.
+    """
+    payload = {"data": data, "updated_at": updated_at.isoformat() if updated_at else None}
+    return f"event: {event}\ndata: {json.dumps(payload, default=str)}\n\n"
+
+
+stats_broadcaster = StatsBroadcaster()
@@ -1,9 +1,9 @@
 # bot/subscriber_manager.py
 """Manage subscriber data using a PostgreSQL database asynchronously."""
 
-import asyncio
+import json
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List
+from typing import AsyncIterator, Dict, List
 import logging
 
 try:
@@ -12,29 +12,55 @@ except ImportError as exc:
     raise ImportError(
         "asyncpg is required. Install dependencies using 'pip install -r requirements.txt'"
     ) from exc
-from bot.config import CHANNELS, PLANS, BOT_TOKEN, DATABASE_URL
-import sys
+from bot.active_subscribers import _naive_utc, active_subscribers
+from bot.config import (
+    ALL_CHANNEL_IDS, CHANNELS, EXPIRING_SOON_DAYS, PLANS, DATABASE_URL, price_to_cents
+)
+from bot.metrics import instrument_connection, watch_pool
 
 logger = logging.getLogger(__name__)
-from telegram import Bot
+
+
+class PaymentLinkConsumed(Exception):
+    """The payment link a webhook refers to was already used or has expired."""
 
 
 class SubscriberManager:
-    def __init__(self, db_url: str = DATABASE_URL):
-        if not db_url:
-            raise ValueError("DATABASE_URL must be provided")
+    def __init__(self, db_url: str | None = DATABASE_URL):
         self.db_url = db_url
-        loop = asyncio.get_event_loop()
+        self.pool = None
+
+    async def connect(self) -> None:
+        """Create this process's connection pool and ensure the schema.
+
+        Must be awaited on the event loop that will use the pool: the
+        admin panel lifespan (once per uvicorn worker) or the bot's
+        ``post_init``. Nothing connects at import time, so importing this
+        module in a forked or spawned worker is safe.
+        """
+        if self.pool is not None:
+            return
+        if not self.db_url:
+            raise ValueError("DATABASE_URL must be provided")
         try:
-            self.pool = loop.run_until_complete(asyncpg.create_pool(dsn=db_url))
+            pool = await asyncpg.create_pool(dsn=self.db_url, init=instrument_connection)
         except Exception as exc:
             raise ConnectionError(
                 "Could not connect to the database. Check DATABASE_URL and that the server is running."
             ) from exc
-        loop.run_until_complete(self._ensure_table())
+        self.pool = pool
+        watch_pool(pool)
+        await self._ensure_table()
+
+    async def close(self) -> None:
+        if self.pool is not None:
+            await self.pool.close()
+            self.pool = None
 
     async def _ensure_table(self) -> None:
-        async with self.pool.acquire() as conn:
+        async with self.pool.acquire() as conn, conn.transaction():
+            # Several workers start at once; let one of them create the schema
+            await conn.execute("SELECT pg_advisory_xact_lock(hashtext('subscriber_schema'))")
             await conn.execute(
                 """
                 CREATE TABLE IF NOT EXISTS subscribers (
@@ -46,8 +72,18 @@ class SubscriberManager:
                 )
                 """
             )
+            # Keyset pages in expiry order; also serves plain expires_at ranges
             await conn.execute(
-                "CREATE INDEX IF NOT EXISTS idx_subscribers_expires_at ON subscribers (expires_at)"
+                "CREATE INDEX IF NOT EXISTS idx_subscribers_expires_user "
+                "ON subscribers (expires_at, user_id)"
+            )
+            await conn.execute("DROP INDEX IF EXISTS idx_subscribers_expires_at")
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_subscribers_plan_expires "
+                "ON subscribers (plan, expires_at, user_id)"
+            )
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_subscribers_transaction_id ON subscribers (transaction_id)"
             )
             await conn.execute(
                 """
@@ -61,8 +97,263 @@ class SubscriberManager:
             await conn.execute(
                 "CREATE INDEX IF NOT EXISTS idx_users_language ON users (language)"
             )
+            # Survives restarts so users are not asked to verify their age again
+            await conn.execute(
+                "ALTER TABLE users ADD COLUMN IF NOT EXISTS age_verified_at TIMESTAMP"
+            )
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS channel_members (
+                    channel_id BIGINT NOT NULL,
+                    user_id BIGINT NOT NULL,
+                    joined_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                    left_at TIMESTAMP,
+                    PRIMARY KEY (channel_id, user_id)
+                )
+                """
+            )
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_channel_members_present "
+                "ON channel_members (user_id) WHERE left_at IS NULL"
+            )
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS payment_links (
+                    transaction_id TEXT PRIMARY KEY,
+                    user_id BIGINT NOT NULL,
+                    plan_id TEXT NOT NULL,
+                    plan_name TEXT NOT NULL,
+                    link_id TEXT NOT NULL,
+                    payment_url TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    created_at BIGINT NOT NULL,
+                    completed_at BIGINT
+                )
+                """
+            )
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_payment_links_user_plan_status "
+                "ON payment_links (user_id, plan_id, status)"
+            )
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS processed_webhooks (
+                    transaction_id TEXT PRIMARY KEY,
+                    user_id BIGINT,
+                    plan_id TEXT,
+                    received_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                    status TEXT NOT NULL DEFAULT 'processing',
+                    updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                    last_error TEXT
+                )
+                """
+            )
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_processed_webhooks_processing "
+                "ON processed_webhooks (updated_at) WHERE status = 'processing'"
+            )
+            # The payment link (token nonce) a claimed webhook will consume
+            await conn.execute(
+                "ALTER TABLE processed_webhooks ADD COLUMN IF NOT EXISTS payment_nonce TEXT"
+            )
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS outbox (
+                    id BIGSERIAL PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    payload JSONB NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INT NOT NULL DEFAULT 0,
+                    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                    next_attempt_at TIMESTAMP NOT NULL DEFAULT NOW(),
+                    last_error TEXT
+                )
+                """
+            )
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_outbox_pending "
+                "ON outbox (next_attempt_at, id) WHERE status = 'pending'"
+            )
+            # Side effects of a paid activation are keyed by its transaction,
+            # so a retried or reclaimed webhook does not queue them twice
+            await conn.execute("ALTER TABLE outbox ADD COLUMN IF NOT EXISTS dedup_key TEXT")
+            await conn.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS idx_outbox_dedup_key ON outbox (dedup_key)"
+            )
+            # Rows being sent by a dispatcher, until its lease runs out
+            await conn.execute("ALTER TABLE outbox ADD COLUMN IF NOT EXISTS locked_until TIMESTAMP")
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS payments (
+                    id BIGSERIAL PRIMARY KEY,
+                    transaction_id TEXT NOT NULL UNIQUE,
+                    user_id BIGINT NOT NULL,
+                    plan TEXT NOT NULL,
+                    amount_cents BIGINT NOT NULL,
+                    paid_at TIMESTAMP NOT NULL DEFAULT NOW()
+                )
+                """
+            )
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS revenue_daily (
+                    day DATE NOT NULL,
+                    plan TEXT NOT NULL,
+                    payments BIGINT NOT NULL DEFAULT 0,
+                    amount_cents BIGINT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, plan)
+                )
+                """
+            )
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS revenue_by_plan (
+                    plan TEXT PRIMARY KEY,
+                    payments BIGINT NOT NULL DEFAULT 0,
+                    amount_cents BIGINT NOT NULL DEFAULT 0
+                )
+                """
+            )
+            # Whether the payment extended a still-active subscription
+            await conn.execute(
+                "ALTER TABLE payments ADD COLUMN IF NOT EXISTS renewal BOOLEAN NOT NULL DEFAULT FALSE"
+            )
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rollup_watermarks (
+                    name TEXT PRIMARY KEY,
+                    last_payment_id BIGINT NOT NULL DEFAULT 0,
+                    churned_until TIMESTAMP
+                )
+                """
+            )
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS daily_metrics (
+                    day DATE NOT NULL,
+                    plan TEXT NOT NULL,
+                    language TEXT NOT NULL DEFAULT '',
+                    new_subscribers INT NOT NULL DEFAULT 0,
+                    renewals INT NOT NULL DEFAULT 0,
+                    churned INT NOT NULL DEFAULT 0,
+                    active INT,
+                    PRIMARY KEY (day, plan, language)
+                )
+                """
+            )
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cohort_members (
+                    user_id BIGINT PRIMARY KEY,
+                    cohort_month DATE NOT NULL
+                )
+                """
+            )
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cohort_activity (
+                    user_id BIGINT NOT NULL,
+                    month DATE NOT NULL,
+                    PRIMARY KEY (user_id, month)
+                )
+                """
+            )
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS cohort_retention (
+                    cohort_month DATE NOT NULL,
+                    period INT NOT NULL,
+                    users INT NOT NULL DEFAULT 0,
+                    PRIMARY KEY (cohort_month, period)
+                )
+                """
+            )
+            # Seed the ledger once so members who joined before tracking
+            # started are still considered by the expiration task.
+            if not await conn.fetchval("SELECT EXISTS (SELECT 1 FROM channel_members)"):
+                await conn.execute(
+                    """
+                    INSERT INTO channel_members (channel_id, user_id)
+                    SELECT c.channel_id, s.user_id
+                    FROM subscribers s
+                    CROSS JOIN unnest($1::BIGINT[]) AS c(channel_id)
+                    ON CONFLICT DO NOTHING
+                    """,
+                    ALL_CHANNEL_IDS,
+                )
+
+    async def ping(self) -> None:
+        """Acquire a pooled connection and run a trivial query."""
+        async with self.pool.acquire() as conn:
+            await conn.fetchval("SELECT 1")
 
-    async def add_subscriber(self, user_id: int, plan_name: str, transaction_id: str = None) -> bool:
+    @staticmethod
+    async def _enqueue(conn, kind: str, payload: Dict, dedup_key: str | None = None) -> None:
+        await conn.execute(
+            """
+            INSERT INTO outbox (kind, payload, dedup_key) VALUES ($1, $2::jsonb, $3)
+            ON CONFLICT (dedup_key) DO NOTHING
+            """,
+            kind,
+            json.dumps(payload),
+            dedup_key,
+        )
+
+    @staticmethod
+    async def _record_payment(
+        conn, transaction_id: str, user_id: int, plan_name: str, amount_cents: int
+    ) -> None:
+        # Append to the ledger and bump the rollups in one statement; a
+        # transaction that is already in the ledger changes nothing.
+        await conn.execute(
+            """
+            WITH inserted AS (
+                INSERT INTO payments (transaction_id, user_id, plan, amount_cents, renewal)
+                VALUES ($1, $2, $3, $4, EXISTS (
+                    SELECT 1 FROM subscribers WHERE user_id = $2 AND expires_at > NOW()
+                ))
+                ON CONFLICT (transaction_id) DO NOTHING
+                RETURNING plan, amount_cents, paid_at
+            ), daily AS (
+                INSERT INTO revenue_daily (day, plan, payments, amount_cents)
+                SELECT paid_at::DATE, plan, 1, amount_cents FROM inserted
+                ON CONFLICT (day, plan) DO UPDATE SET
+                    payments = revenue_daily.payments + 1,
+                    amount_cents = revenue_daily.amount_cents + EXCLUDED.amount_cents
+            )
+            INSERT INTO revenue_by_plan (plan, payments, amount_cents)
+            SELECT plan, 1, amount_cents FROM inserted
+            ON CONFLICT (plan) DO UPDATE SET
+                payments = revenue_by_plan.payments + 1,
+                amount_cents = revenue_by_plan.amount_cents + EXCLUDED.amount_cents
+            """,
+            transaction_id,
+            user_id,
+            plan_name,
+            amount_cents,
+        )
+
+    async def add_subscriber(
+        self,
+        user_id: int,
+        plan_name: str,
+        transaction_id: str = None,
+        confirmation: str | None = None,
+        amount_cents: int | None = None,
+        payment_nonce: str | None = None,
+    ) -> bool:
+        """Upsert a subscription and queue its Telegram side effects.
+
+        Invites (and the optional ``confirmation`` message) are written to
+        the outbox in the same transaction and sent by ``OutboxDispatcher``.
+        Paid activations (with a ``transaction_id``) are also appended to the
+        ``payments`` ledger, at the plan price unless ``amount_cents`` is given.
+        ``payment_nonce`` names the pending payment link being paid; it is
+        marked completed in the same transaction and ``PaymentLinkConsumed``
+        is raised if it was already used, so a link can activate only once.
+        Re-running a paid activation that already committed is a no-op, and
+        its outbox rows are keyed by ``transaction_id`` so none are duplicated.
+        """
         try:
             plan_info = None
             for key, info in PLANS.items():
@@ -78,39 +369,151 @@ class SubscriberManager:
             expiry_date = start_date + timedelta(days=duration_days)
 
             async with self.pool.acquire() as conn:
-                await conn.execute(
-                    """
-                    INSERT INTO subscribers (user_id, plan, start_date, expires_at, transaction_id)
-                    VALUES ($1, $2, $3, $4, $5)
-                    ON CONFLICT (user_id) DO UPDATE SET
-                        plan=EXCLUDED.plan,
-                        start_date=EXCLUDED.start_date,
-                        expires_at=EXCLUDED.expires_at,
-                        transaction_id=EXCLUDED.transaction_id
-                    """,
-                    user_id,
-                    plan_name,
-                    start_date,
-                    expiry_date,
-                    transaction_id,
-                )
-
-            bot = Bot(token=BOT_TOKEN)
-            for channel in CHANNELS.values():
-                try:
-                    invite_link = await bot.export_chat_invite_link(chat_id=channel)
-                    await bot.send_message(
-                        chat_id=user_id,
-                        text=f"Join {channel}: {invite_link}",
+                async with conn.transaction():
+                    if payment_nonce is not None:
+                        consumed = await conn.fetchval(
+                            """
+                            UPDATE payment_links SET status='completed', completed_at=$2
+                            WHERE transaction_id=$1 AND status='pending'
+                            RETURNING transaction_id
+                            """,
+                            payment_nonce,
+                            int(start_date.timestamp()),
+                        )
+                        if consumed is None:
+                            if transaction_id and await conn.fetchval(
+                                "SELECT 1 FROM payments WHERE transaction_id=$1", transaction_id
+                            ):
+                                # Consumed by an earlier attempt at this same
+                                # transaction, which committed; nothing to redo
+                                return True
+                            raise PaymentLinkConsumed(payment_nonce)
+                    if transaction_id:
+                        if amount_cents is None:
+                            amount_cents = price_to_cents(plan_info["price"])
+                        # Before the upsert, so the ledger sees whether this renews
+                        await self._record_payment(conn, transaction_id, user_id, plan_name, amount_cents)
+                    await conn.execute(
+                        """
+                        INSERT INTO subscribers (user_id, plan, start_date, expires_at, transaction_id)
+                        VALUES ($1, $2, $3, $4, $5)
+                        ON CONFLICT (user_id) DO UPDATE SET
+                            plan=EXCLUDED.plan,
+                            start_date=EXCLUDED.start_date,
+                            expires_at=EXCLUDED.expires_at,
+                            transaction_id=EXCLUDED.transaction_id
+                        """,
+                        user_id,
+                        plan_name,
+                        start_date,
+                        expiry_date,
+                        transaction_id,
+                    )
+                    if confirmation:
+                        await self._enqueue(
+                            conn,
+                            "message",
+                            {"chat_id": user_id, "text": confirmation},
+                            f"{transaction_id}:message" if transaction_id else None,
+                        )
+                    for channel in CHANNELS.values():
+                        await self._enqueue(
+                            conn,
+                            "invite",
+                            {"user_id": user_id, "channel_id": channel},
+                            f"{transaction_id}:invite:{channel}" if transaction_id else None,
+                        )
+                    # Delivered on commit; drives the live dashboard stream
+                    await conn.execute(
+                        "SELECT pg_notify('subscription_changes', $1)", str(user_id)
                     )
-                except Exception as e:
-                    logger.error("Error inviting user %s to %s: %s", user_id, channel, e)
+            active_subscribers.add(user_id, expiry_date)
             await self.record_user(user_id)
             return True
+        except PaymentLinkConsumed:
+            raise
         except Exception as e:
             logger.error("Error adding subscriber: %s", e)
             return False
 
+    async def claim_webhook(
+        self,
+        transaction_id: str,
+        user_id: int | None = None,
+        plan_id: str | None = None,
+        payment_nonce: str | None = None,
+    ) -> bool:
+        """Claim a payment webhook; return False if it was already processed."""
+        async with self.pool.acquire() as conn:
+            claimed = await conn.fetchval(
+                """
+                INSERT INTO processed_webhooks (transaction_id, user_id, plan_id, payment_nonce)
+                VALUES ($1, $2, $3, $4)
+                ON CONFLICT (transaction_id) DO NOTHING
+                RETURNING transaction_id
+                """,
+                transaction_id,
+                user_id,
+                plan_id,
+                payment_nonce,
+            )
+        return claimed is not None
+
+    async def complete_webhook(self, transaction_id: str) -> None:
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                """
+                UPDATE processed_webhooks SET status='done', updated_at=NOW()
+                WHERE transaction_id = $1
+                """,
+                transaction_id,
+            )
+
+    async def fail_webhook(self, transaction_id: str, error: str) -> None:
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                """
+                UPDATE processed_webhooks SET status='failed', updated_at=NOW(), last_error=$2
+                WHERE transaction_id = $1
+                """,
+                transaction_id,
+                error,
+            )
+
+    async def reclaim_stale_webhooks(self, stale_after: int = 300) -> List[Dict]:
+        """Take over claimed webhooks whose processing was interrupted."""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                UPDATE processed_webhooks SET updated_at=NOW()
+                WHERE transaction_id IN (
+                    SELECT transaction_id FROM processed_webhooks
+                    WHERE status = 'processing'
+                      AND updated_at < NOW() - make_interval(secs => $1)
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING transaction_id, user_id, plan_id, payment_nonce
+                """,
+                stale_after,
+            )
+        return [
+            {
+                "transaction_id": r["transaction_id"],
+                "user_id": r["user_id"],
+                "plan_id": r["plan_id"],
+                "payment_nonce": r["payment_nonce"],
+            }
+            for r in rows
+        ]
+
+    async def release_webhook(self, transaction_id: str) -> None:
+        """Drop a claim so a retried webhook can be processed again."""
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                "DELETE FROM processed_webhooks WHERE transaction_id = $1",
+                transaction_id,
+            )
+
     async def get_all(self) -> List[Dict]:
         async with self.pool.acquire() as conn:
             rows = await conn.fetch("SELECT user_id, expires_at FROM subscribers")
@@ -118,13 +521,245 @@ class SubscriberManager:
             {"user_id": row[0], "expires_at": row[1]} for row in rows
         ]
 
+    async def iter_subscribers(
+        self,
+        *,
+        status: str | None = None,
+        plan: str | None = None,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        prefetch: int = 1000,
+    ) -> AsyncIterator[Dict]:
+        """Yield subscribers from a server-side cursor, ``prefetch`` rows at a time.
+
+        ``status`` is ``"active"`` or ``"expired"``; ``since``/``until`` bound
+        the subscription start date. Memory use does not grow with the table.
+        """
+        if status not in (None, "active", "expired"):
+            raise ValueError(f"Unknown status: {status}")
+        # start_date is a naive UTC TIMESTAMP column
+        since = _naive_utc(since) if since else None
+        until = _naive_utc(until) if until else None
+        query = """
+            SELECT s.user_id, s.plan, s.start_date, s.expires_at, s.transaction_id,
+                   u.language,
+                   CASE WHEN s.expires_at > NOW() THEN 'active' ELSE 'expired' END AS status
+            FROM subscribers s
+            LEFT JOIN users u ON u.user_id = s.user_id
+            WHERE ($1::text IS NULL OR s.plan = $1)
+              AND ($2::timestamp IS NULL OR s.start_date >= $2)
+              AND ($3::timestamp IS NULL OR s.start_date < $3)
+        """
+        if status == "active":
+            query += " AND s.expires_at > NOW()"
+        elif status == "expired":
+            query += " AND s.expires_at <= NOW()"
+        query += " ORDER BY s.user_id"
+
+        async with self.pool.acquire() as conn:
+            # Cursors only live inside a transaction
+            async with conn.transaction():
+                async for row in conn.cursor(query, plan, since, until, prefetch=prefetch):
+                    yield dict(row)
+
+    async def search_subscribers(
+        self,
+        *,
+        user_id: int | None = None,
+        plan: str | None = None,
+        language: str | None = None,
+        expires_after: datetime | None = None,
+        expires_before: datetime | None = None,
+        order: str = "expires_at",
+        after: tuple | None = None,
+        limit: int = 50,
+    ) -> List[Dict]:
+        """Return one keyset page of subscribers matching the filters.
+
+        ``order`` is ``"expires_at"`` (by ``(expires_at, user_id)``) or
+        ``"user_id"``; ``after`` is the sort key of the previous page's last
+        row. Each predicate maps onto an index so pages are range scans.
+        """
+        if order not in ("expires_at", "user_id"):
+            raise ValueError(f"Unknown order: {order}")
+        args: List = []
+        conditions = []
+
+        def param(value) -> str:
+            args.append(value)
+            return f"${len(args)}"
+
+        if user_id is not None:
+            conditions.append(f"s.user_id = {param(user_id)}")
+        if plan:
+            conditions.append(f"s.plan = {param(plan)}")
+        if language:
+            conditions.append(f"u.language = {param(language)}")
+        if expires_after is not None:
+            conditions.append(f"s.expires_at >= {param(_naive_utc(expires_after))}")
+        if expires_before is not None:
+            conditions.append(f"s.expires_at < {param(_naive_utc(expires_before))}")
+        if after is not None:
+            after_expires, after_user = after
+            if order == "user_id":
+                conditions.append(f"s.user_id > {param(after_user)}")
+            else:
+                # Row comparison is answered by the (expires_at, user_id) index
+                conditions.append(f"(s.expires_at, s.user_id) > ({param(after_expires)}, {param(after_user)})")
+
+        query = """
+            SELECT s.user_id, s.plan, s.start_date, s.expires_at, s.transaction_id, u.language,
+                   s.expires_at > NOW() AS active
+            FROM subscribers s
+            LEFT JOIN users u ON u.user_id = s.user_id
+        """
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY s.user_id" if order == "user_id" else " ORDER BY s.expires_at, s.user_id"
+        query += f" LIMIT {param(limit)}"
+
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(query, *args)
+        return [dict(r) for r in rows]
+
+    async def expiring_within(
+        self,
+        days: int,
+        *,
+        limit: int = 0,
+        after: tuple | None = None,
+        count: bool = True,
+    ) -> Dict:
+        """Count and optionally list subscriptions expiring in the next ``days``.
+
+        Both are range scans of the ``(expires_at, user_id)`` index between
+        now and now + ``days``, so the cost follows the size of the window,
+        not of the table. ``limit`` > 0 returns one keyset page resumed
+        from ``after``; ``count=False`` skips the count.
+        """
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        until = now + timedelta(days=days)
+        total = None
+        if count:
+            async with self.pool.acquire() as conn:
+                total = await conn.fetchval(
+                    "SELECT COUNT(*) FROM subscribers WHERE expires_at >= $1 AND expires_at < $2",
+                    now,
+                    until,
+                )
+        subscribers = []
+        if limit:
+            subscribers = await self.search_subscribers(
+                expires_after=now, expires_before=until, after=after, limit=limit
+            )
+        return {"count": total, "subscribers": subscribers}
+
+    async def get_active_subscribers(self) -> List[Dict]:
+        """Return user ids and expiry of all unexpired subscriptions."""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT user_id, expires_at FROM subscribers WHERE expires_at > NOW()"
+            )
+        return [
+            {"user_id": row["user_id"], "expires_at": row["expires_at"]} for row in rows
+        ]
+
+    async def get_subscription(self, user_id: int) -> Dict | None:
+        """Return the subscription row for a single user, if any."""
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(
+                "SELECT user_id, plan, expires_at FROM subscribers WHERE user_id = $1",
+                user_id,
+            )
+        if row is None:
+            return None
+        return {"user_id": row["user_id"], "plan": row["plan"], "expires_at": row["expires_at"]}
+
     async def get_stats(self) -> Dict[str, int]:
         async with self.pool.acquire() as conn:
             total = await conn.fetchval("SELECT COUNT(*) FROM subscribers")
             active = await conn.fetchval(
                 "SELECT COUNT(*) FROM subscribers WHERE expires_at > NOW()"
             )
-        return {"total": total, "active": active}
+            revenue = await conn.fetchrow(
+                """
+                SELECT COALESCE(SUM(amount_cents), 0) AS amount_cents,
+                       COALESCE(SUM(payments), 0) AS payments
+                FROM revenue_by_plan
+                """
+            )
+            revenue_today = await conn.fetchval(
+                "SELECT COALESCE(SUM(amount_cents), 0) FROM revenue_daily WHERE day = CURRENT_DATE"
+            )
+        expiring = await self.expiring_within(EXPIRING_SOON_DAYS)
+        return {
+            "total": total,
+            "active": active,
+            "revenue_cents": int(revenue["amount_cents"]) if revenue else 0,
+            "payments": int(revenue["payments"]) if revenue else 0,
+            "revenue_today_cents": int(revenue_today or 0),
+            "expiring_soon": expiring["count"],
+        }
+
+    async def get_revenue(self, days: int = 30) -> Dict[str, List[Dict]]:
+        """Return per-plan totals and the daily rollup for the last ``days``."""
+        async with self.pool.acquire() as conn:
+            by_plan = await conn.fetch(
+                "SELECT plan, payments, amount_cents FROM revenue_by_plan ORDER BY amount_cents DESC"
+            )
+            daily = await conn.fetch(
+                """
+                SELECT day, plan, payments, amount_cents FROM revenue_daily
+                WHERE day > CURRENT_DATE - $1::INT
+                ORDER BY day, plan
+                """,
+                days,
+            )
+        return {
+            "by_plan": [dict(r) for r in by_plan],
+            "daily": [{**dict(r), "day": r["day"].isoformat()} for r in daily],
+        }
+
+    async def get_daily_metrics(
+        self, days: int = 30, plan: str | None = None, language: str | None = None
+    ) -> List[Dict]:
+        """Return ``daily_metrics`` rows for the last ``days``, optionally filtered."""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT day, plan, language, new_subscribers, renewals, churned, active
+                FROM daily_metrics
+                WHERE day > CURRENT_DATE - $1::INT
+                  AND ($2::TEXT IS NULL OR plan = $2)
+                  AND ($3::TEXT IS NULL OR language = $3)
+                ORDER BY day, plan, language
+                """,
+                days,
+                plan,
+                language,
+            )
+        return [{**dict(r), "day": r["day"].isoformat()} for r in rows]
+
+    async def get_cohort_retention(self, months: int = 12) -> List[Dict]:
+        """Return retention per monthly cohort; period 0 is the cohort size."""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT cohort_month, period, users FROM cohort_retention
+                WHERE cohort_month >= date_trunc('month', CURRENT_DATE) - make_interval(months => $1)
+                ORDER BY cohort_month, period
+                """,
+                months,
+            )
+        cohorts: Dict[str, Dict] = {}
+        for r in rows:
+            cohort = cohorts.setdefault(
+                r["cohort_month"].isoformat(), {"cohort": r["cohort_month"].isoformat(), "users": 0, "retention": []}
+            )
+            if r["period"] == 0:
+                cohort["users"] = r["users"]
+            cohort["retention"].append({"period": r["period"], "users": r["users"]})
+        return list(cohorts.values())
 
     async def record_user(self, user_id: int, language: str | None = None) -> None:
         """Insert or update a user in the tracking table."""
@@ -141,6 +776,74 @@ class SubscriberManager:
                 language,
             )
 
+    async def get_session(self, user_id: int) -> Dict | None:
+        """Return the stored language and age verification of a user."""
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(
+                "SELECT language, age_verified_at IS NOT NULL AS age_verified FROM users WHERE user_id = $1",
+                user_id,
+            )
+        if row is None:
+            return None
+        return {"language": row["language"], "age_verified": row["age_verified"]}
+
+    async def record_age_verified(self, user_id: int) -> None:
+        """Remember that a user confirmed they are of age."""
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO users (user_id, age_verified_at, last_seen)
+                VALUES ($1, NOW(), NOW())
+                ON CONFLICT (user_id) DO UPDATE SET
+                    age_verified_at=COALESCE(users.age_verified_at, NOW()),
+                    last_seen=NOW()
+                """,
+                user_id,
+            )
+
+    async def record_channel_join(self, channel_id: int, user_id: int) -> None:
+        """Mark a user as present in a channel."""
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                """
+                INSERT INTO channel_members (channel_id, user_id, joined_at, left_at)
+                VALUES ($1, $2, NOW(), NULL)
+                ON CONFLICT (channel_id, user_id) DO UPDATE SET
+                    joined_at=NOW(),
+                    left_at=NULL
+                """,
+                channel_id,
+                user_id,
+            )
+
+    async def record_channel_leave(self, channel_id: int, user_id: int) -> None:
+        """Mark a user as no longer present in a channel."""
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                """
+                UPDATE channel_members SET left_at=NOW()
+                WHERE channel_id=$1 AND user_id=$2 AND left_at IS NULL
+                """,
+                channel_id,
+                user_id,
+            )
+
+    async def get_expired_members(self) -> List[Dict]:
+        """Return expired subscribers that are still present in a channel."""
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT m.channel_id, m.user_id
+                FROM channel_members m
+                JOIN subscribers s ON s.user_id = m.user_id
+                WHERE m.left_at IS NULL AND s.expires_at < NOW()
+                """
+            )
+        return [
+            {"channel_id": row["channel_id"], "user_id": row["user_id"]}
+            for row in rows
+        ]
+
     async def get_users(
         self,
         *,
@@ -181,7 +884,4 @@ class SubscriberManager:
         ]
 
 
-if "pytest" in sys.modules or any("pytest" in arg for arg in sys.argv):
-    subscriber_manager = None
-else:
-    subscriber_manager = SubscriberManager()
+subscriber_manager = SubscriberManager()
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""Bot API request class that records latency and errors per API method."""
+
+import time
+
+from telegram.request import HTTPXRequest
+
+from bot.health import health_monitor
+from bot.metrics import TELEGRAM_API_ERRORS, TELEGRAM_API_LATENCY
+
+# Bot API status codes mapped to the telegram.error class they raise
+_ERROR_CLASSES = {
+    400: "BadRequest",
+    401: "InvalidToken",
+    403: "Forbidden",
+    404: "InvalidToken",
+    409: "Conflict",
+    429: "RetryAfter",
+}
+
+
+class InstrumentedRequest(HTTPXRequest):
+    """``HTTPXRequest`` timing every call into ``telegram_api_duration_seconds``.
+
+    Answered calls also refresh the health monitor's Telegram check, so
+    readiness rarely needs a request of its own.
+    """
+
+    async def do_request(self, url: str, *args, **kwargs):
+        # The URL ends with the API method; the token before it is never a label
+        api_method = url.rsplit("/", 1)[-1]
+        start = time.perf_counter()
+        try:
+            code, payload = await super().do_request(url, *args, **kwargs)
+        except Exception as e:
+            TELEGRAM_API_ERRORS.inc(method=api_method, error=type(e).__name__)
+            raise
+        finally:
+            TELEGRAM_API_LATENCY.observe(time.perf_counter() - start, method=api_method)
+        if code >= 400:
+            error = _ERROR_CLASSES.get(code, "NetworkError" if code >= 500 else f"HTTP{code}")
+            TELEGRAM_API_ERRORS.inc(method=api_method, error=error)
+        if code < 500:
+            # Any answer from the Bot API proves it is reachable
+            health_monitor.mark_success("telegram")
+        return code, payload
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Concurrent update processing that keeps each user's updates in order."""
+
+import logging
+from collections import deque
+from typing import Awaitable, Deque, Dict, Optional
+
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+def ordering_key(update: object) -> Optional[int]:
+    """The user (or, failing that, chat) whose updates must not overlap."""
+    user = getattr(update, "effective_user", None)
+    if user is not None:
+        return user.id
+    chat = getattr(update, "effective_chat", None)
+    return chat.id if chat is not None else None
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Handle up to ``max_concurrent_updates`` updates at once.
+
+    Updates from different users run concurrently, so one slow database
+    call no longer stalls everyone; updates from the same user run one
+    after another in arrival order, so a double click cannot race the
+    first. The base class takes a concurrency slot before
+    ``do_process_update``, so an update whose user is busy is handed to
+    the update already running for that user and gives its slot back at
+    once: a user flooding the bot holds at most one slot. Queues only
+    exist while a user has updates in flight.
+    """
+
+    def __init__(self, max_concurrent_updates: int):
+        super().__init__(max_concurrent_updates)
+        self._queues: Dict[int, Deque[Awaitable]] = {}
+
+    async def do_process_update(self, update: object, coroutine: Awaitable) -> None:
+        key = ordering_key(update)
+        if key is None:
+            await coroutine
+            return
+        queue = self._queues.get(key)
+        if queue is not None:
+            queue.append(coroutine)
+            return
+        queue = self._queues[key] = deque([coroutine])
+        try:
+            while queue:
+                coroutine = queue.popleft()
+                try:
+                    await coroutine
+                except Exception:
+                    # Later updates of the user must still run
+                    logger.exception("Update for %s failed", key)
+        finally:
+            del self._queues[key]
+            for pending in queue:
+                # Cancelled with updates still queued
+                pending.close()
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
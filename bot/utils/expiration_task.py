@@ -1,28 +1,29 @@
 import asyncio
-from datetime import datetime
 from telegram import Bot
-from bot.config import BOT_TOKEN, CHANNELS
+from bot.active_subscribers import active_subscribers
+from bot.config import BOT_TOKEN, TELEGRAM_API_BASE_URL
+from bot.metrics import KICKS
 from bot.subscriber_manager import subscriber_manager
+from bot.telegram_metrics import InstrumentedRequest
 import logging
 
 logger = logging.getLogger(__name__)
 
-bot = Bot(token=BOT_TOKEN)
+bot = Bot(token=BOT_TOKEN, base_url=TELEGRAM_API_BASE_URL, request=InstrumentedRequest())
 
-async def check_expired_users():
-    expired_users = []
-    now = datetime.now()
-
-    for record in await subscriber_manager.get_all():
-        exp_date = record["expires_at"]
-        if exp_date < now:
-            expired_users.append(record["user_id"])
-
-    for user_id in expired_users:
-        for channel in CHANNELS.values():
-            try:
-                await bot.ban_chat_member(chat_id=channel, user_id=user_id)
-                await bot.unban_chat_member(chat_id=channel, user_id=user_id)
-                logger.info("Removed expired user: %s", user_id)
-            except Exception as e:
-                logger.error("Error removing %s: %s", user_id, e)
+async def check_expired_users(context=None):
+    # Only users the membership ledger still sees in a channel are kicked;
+    # anyone who never joined or already left costs no API calls.
+    for member in await subscriber_manager.get_expired_members():
+        channel = member["channel_id"]
+        user_id = member["user_id"]
+        active_subscribers.discard(user_id)
+        try:
+            await bot.ban_chat_member(chat_id=channel, user_id=user_id)
+            await bot.unban_chat_member(chat_id=channel, user_id=user_id)
+            await subscriber_manager.record_channel_leave(channel, user_id)
+            KICKS.inc(result="removed")
+            logger.info("Removed expired user %s from %s", user_id, channel)
+        except Exception as e:
+            KICKS.inc(result="failed")
+            logger.error("Error removing %s from %s: %s", user_id, channel, e)
@@ -1,47 +1,46 @@
 #!/usr/bin/env python3
-import subprocess
+"""Exit 0 when the bot and the admin panel report ready, 1 otherwise.
+
+Both processes answer ``/health/ready`` from cached probe results, so this
+can run as often as the orchestrator likes.
+"""
+import json
+import os
 import sys
-import time
+import urllib.error
+import urllib.request
+
 
-def check_supervisor_status():
-    """Check if all programs are running"""
+def check_ready(name, url, timeout=2):
+    """Return True if ``url`` answers 200, printing any failing checks"""
     try:
-        result = subprocess.run(
-            ['supervisorctl', 'status'],
-            capture_output=True,
-            text=True,
-            check=True
-        )
-        
-        lines = result.stdout.strip().split('\n')
-        all_running = True
-        
-        for line in lines:
-            if line:
-                parts = line.split()
-                if len(parts) >= 2:
-                    program_name = parts[0]
-                    status = parts[1]
-                    
-                    if status != 'RUNNING':
-                        print(f"ERROR: {program_name} is {status}")
-                        all_running = False
-                    else:
-                        print(f"OK: {program_name} is running")
-        
-        return all_running
-        
+        with urllib.request.urlopen(url, timeout=timeout):
+            print(f"OK: {name} is ready")
+            return True
+    except urllib.error.HTTPError as e:
+        try:
+            checks = json.loads(e.read()).get("checks", {})
+        except ValueError:
+            checks = {}
+        failing = ", ".join(f"{k} ({v.get('error')})" for k, v in checks.items() if not v.get("ok"))
+        print(f"ERROR: {name} is not ready: {failing or e}")
     except Exception as e:
-        print(f"ERROR checking supervisor status: {e}")
-        return False
+        print(f"ERROR: {name} did not answer: {e}")
+    return False
+
 
 if __name__ == "__main__":
-    # Give services time to start
-    time.sleep(5)
-    
-    if check_supervisor_status():
-        print("All services are running")
+    admin_port = os.getenv("ADMIN_PORT", "8080")
+    bot_port = os.getenv("BOT_METRICS_PORT", "9101")
+    targets = {"admin_panel": f"http://127.0.0.1:{admin_port}/health/ready"}
+    # A mounted bot runs inside the admin panel and shares its health
+    mounted = os.getenv("TELEGRAM_MODE", "polling").lower() == "mounted"
+    if bot_port != "0" and not mounted:
+        targets["telegram_bot"] = f"http://127.0.0.1:{bot_port}/health/ready"
+
+    results = [check_ready(name, url) for name, url in targets.items()]
+    if all(results):
+        print("All services are ready")
         sys.exit(0)
-    else:
-        print("Some services are not running")
-        sys.exit(1)
+    print("Some services are not ready")
+    sys.exit(1)
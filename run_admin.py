@@ -28,6 +28,21 @@ except ImportError:
 
 
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Run the admin panel")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=int(os.getenv("ADMIN_WORKERS", 1)),
+        help="number of uvicorn worker processes (default: ADMIN_WORKERS or 1)",
+    )
+    args = parser.parse_args()
+    # Worker processes read the effective count from the environment
+    os.environ["ADMIN_WORKERS"] = str(args.workers)
+    import bot.config
+    bot.config.ADMIN_WORKERS = args.workers
+
     try:
         from bot.admin_panel import app
     except (ModuleNotFoundError, ImportError) as e:
@@ -42,12 +57,14 @@ if __name__ == "__main__":
     port = int(os.getenv("ADMIN_PORT", 8080))
     host = os.getenv("ADMIN_HOST", "0.0.0.0")
     
-    print(f"Starting admin panel on {host}:{port}")
+    print(f"Starting admin panel on {host}:{port} with {args.workers} worker(s)")
     
-    # Run with uvicorn
+    # Run with uvicorn. Worker processes import the app themselves, so
+    # uvicorn needs the import string rather than the app object.
     uvicorn.run(
-        app,  # Use the app object directly, not a string
+        "bot.admin_panel:app" if args.workers > 1 else app,
         host=host,
         port=port,
+        workers=args.workers,
         reload=False  # Don't use reload in production
     )
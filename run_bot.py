@@ -5,14 +5,6 @@ import sys
 
 from dotenv import load_dotenv
 from telegram import Update
-from telegram.ext import (
-    Application,
-    CallbackQueryHandler,
-    CommandHandler,
-    ContextTypes,
-    MessageHandler,
-    filters,
-)
 
 load_dotenv()
 
@@ -25,50 +17,39 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-async def notify_kicked_users(
-    update: Update, context: ContextTypes.DEFAULT_TYPE
-):
-    if update.message:
-        await update.message.reply_text(
-            "Has sido expulsado del canal por expiración de tu membresía. "
-            "Puedes renovarla en cualquier momento para volver a ingresar. ✨"
-        )
-
-
 def main():
     try:
-        from bot.config import BOT_TOKEN, ADMIN_IDS
-        from bot.start import start_command, help_command
-        from bot.admin import admin_command, stats_command, admin_help_command
-        from bot.plans import plans_command
-        from bot.callbacks import handle_callback
-        from bot.utils.expiration_task import check_expired_users
-
-        # logger.info(f"Bot Token: {BOT_TOKEN}")
-        # logger.info(f"Admin IDs: {ADMIN_IDS}")
-
-        app = Application.builder().token(BOT_TOKEN).build()
-
-        app.add_handler(CommandHandler("start", start_command))
-        app.add_handler(CommandHandler("help", help_command))
-        app.add_handler(CommandHandler("plans", plans_command))
-        app.add_handler(CommandHandler("admin", admin_command))
-        app.add_handler(CommandHandler("stats", stats_command))
-        app.add_handler(CommandHandler("admin_help", admin_help_command))
-        app.add_handler(CallbackQueryHandler(handle_callback))
-        app.add_handler(
-            MessageHandler(
-                filters.StatusUpdate.LEFT_CHAT_MEMBER, notify_kicked_users
-            )
+        from bot.config import (
+            TELEGRAM_MODE,
+            TELEGRAM_WEBHOOK_PATH,
+            TELEGRAM_WEBHOOK_PORT,
+            TELEGRAM_WEBHOOK_SECRET,
         )
-
-        if app.job_queue:
-            app.job_queue.run_repeating(check_expired_users, interval=24 * 60 * 60)
+        from bot.application import build_application, webhook_url
+
+        if TELEGRAM_MODE == "mounted":
+            print("TELEGRAM_MODE=mounted: updates are handled by the admin panel, run 'python run_admin.py'")
+            return
+        if TELEGRAM_MODE not in ("polling", "webhook"):
+            raise ValueError(f"Unknown TELEGRAM_MODE: {TELEGRAM_MODE}")
+
+        app = build_application()
+
+        print(f"✅ Bot starting ({TELEGRAM_MODE})...")
+        # chat_member updates are only delivered when explicitly requested
+        if TELEGRAM_MODE == "webhook":
+            app.run_webhook(
+                listen="0.0.0.0",
+                port=TELEGRAM_WEBHOOK_PORT,
+                url_path=TELEGRAM_WEBHOOK_PATH.lstrip("/"),
+                secret_token=TELEGRAM_WEBHOOK_SECRET,
+                webhook_url=webhook_url(),
+                drop_pending_updates=True,
+                allowed_updates=Update.ALL_TYPES,
+            )
         else:
-            print("WARNING: JobQueue not available - scheduled tasks disabled")
-
-        print("✅ Bot starting...")
-        app.run_polling(drop_pending_updates=True)
+            # Local runs without a public URL
+            app.run_polling(drop_pending_updates=True, allowed_updates=Update.ALL_TYPES)
 
     except (ModuleNotFoundError, ImportError) as e:
         if e.name == "asyncpg":
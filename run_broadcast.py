@@ -5,6 +5,7 @@ import argparse
 from datetime import datetime, timezone
 
 from bot.broadcast_manager import broadcast_manager
+from bot.subscriber_manager import subscriber_manager
 
 
 def parse_args():
@@ -34,6 +35,7 @@ async def main() -> None:
             exit(1)
         if when.tzinfo is None:
             when = when.replace(tzinfo=timezone.utc)
+    await subscriber_manager.connect()
     if when:
         broadcast_manager.schedule(
             when,
@@ -56,6 +58,7 @@ async def main() -> None:
             language=args.language,
             statuses=args.status,
         )
+    await subscriber_manager.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,49 @@
+"""Reconcile a Bold payment export against activated subscriptions."""
+
+import argparse
+import asyncio
+import json
+import sys
+from collections import Counter
+from datetime import datetime
+
+import asyncpg
+
+from bot.active_subscribers import _naive_utc
+from bot.config import DATABASE_URL
+from bot.reconciliation import iter_export, reconcile
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Reconcile provider payments with subscribers")
+    parser.add_argument("export", help="Path to the provider export (CSV or NDJSON)")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="Export format (default: from extension)")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per database lookup")
+    parser.add_argument("--since", help="Only report orphan payments made at or after this ISO timestamp")
+    parser.add_argument("--until", help="Only report orphan payments made before this ISO timestamp")
+    return parser.parse_args()
+
+
+async def main() -> int:
+    args = parse_args()
+    # Columns are naive UTC; an offset in the input is converted, not dropped
+    since = _naive_utc(datetime.fromisoformat(args.since)) if args.since else None
+    until = _naive_utc(datetime.fromisoformat(args.until)) if args.until else None
+
+    conn = await asyncpg.connect(dsn=DATABASE_URL)
+    counts = Counter()
+    try:
+        rows = iter_export(args.export, args.format)
+        async for finding in reconcile(conn, rows, args.batch_size, since, until):
+            counts[finding["kind"]] += 1
+            sys.stdout.write(json.dumps(finding) + "\n")
+    finally:
+        await conn.close()
+
+    for kind in ("missing_activation", "orphan_subscription", "amount_mismatch"):
+        print(f"{kind}: {counts[kind]}", file=sys.stderr)
+    return 1 if counts else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
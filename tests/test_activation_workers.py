@@ -0,0 +1,89 @@
+import asyncio
+import os
+import sys
+import unittest
+from unittest.mock import AsyncMock
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from bot.activation_workers import ActivationWorkerPool
+
+
+class TestActivationWorkerPool(unittest.IsolatedAsyncioTestCase):
+    async def test_submitted_event_completes(self):
+        complete_webhook = AsyncMock()
+
+        async def handler(event):
+            await complete_webhook(event["transaction_id"])
+
+        fail_webhook = AsyncMock()
+        pool = ActivationWorkerPool(handler, on_failure=fail_webhook, workers=2)
+        await pool.start()
+        pool.submit({"transaction_id": "tx1"})
+        await asyncio.wait_for(pool.queue.join(), 1)
+        await pool.stop()
+
+        complete_webhook.assert_awaited_once_with("tx1")
+        fail_webhook.assert_not_awaited()
+        stats = pool.stats()
+        self.assertEqual((stats["processed"], stats["failed"], stats["queue_depth"]), (1, 0, 0))
+        self.assertFalse(pool.running)
+
+    async def test_failure_retries_then_fails_webhook(self):
+        error = RuntimeError("db down")
+        handler = AsyncMock(side_effect=error)
+        fail_webhook = AsyncMock()
+        pool = ActivationWorkerPool(handler, on_failure=fail_webhook, workers=1, max_attempts=3, retry_delay=0)
+        await pool.start()
+        event = {"transaction_id": "tx2"}
+        pool.submit(event)
+        await asyncio.wait_for(pool.queue.join(), 1)
+        await pool.stop()
+
+        self.assertEqual(handler.await_count, 3)
+        fail_webhook.assert_awaited_once_with(event, error)
+        self.assertEqual(pool.stats()["failed"], 1)
+
+    async def test_stop_drains_queued_events(self):
+        done = []
+
+        async def handler(event):
+            await asyncio.sleep(0.01)
+            done.append(event["transaction_id"])
+
+        pool = ActivationWorkerPool(handler, workers=2)
+        await pool.start()
+        for i in range(6):
+            pool.submit({"transaction_id": f"tx{i}"})
+        await pool.stop(timeout=1)
+
+        self.assertEqual(sorted(done), [f"tx{i}" for i in range(6)])
+        self.assertFalse(pool.running)
+
+    async def test_stop_cancels_workers_after_timeout(self):
+        started = []
+
+        async def handler(event):
+            started.append(event["transaction_id"])
+            await asyncio.Event().wait()
+
+        fail_webhook = AsyncMock()
+        pool = ActivationWorkerPool(handler, on_failure=fail_webhook, workers=1)
+        await pool.start()
+        for i in range(3):
+            pool.submit({"transaction_id": f"tx{i}"})
+        await asyncio.sleep(0)
+        await pool.stop(timeout=0.05)
+
+        self.assertFalse(pool.running)
+        # Unfinished events stay claimed in the database for the next recovery
+        self.assertEqual(pool.queue.qsize(), 2)
+        self.assertEqual(started, ["tx0"])
+        self.assertEqual(pool.processed, 0)
+        fail_webhook.assert_not_awaited()
+
+
+if __name__ == "__main__":
+    unittest.main()
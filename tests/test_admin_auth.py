@@ -0,0 +1,81 @@
+import os
+import sys
+import types
+import unittest
+from urllib.parse import parse_qsl, urlsplit
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+sys.modules.setdefault('dotenv', types.SimpleNamespace(load_dotenv=lambda: None))
+
+from bot.admin_auth import (
+    AdminAuthError,
+    require_admin_token,
+    sign_download_url,
+    verify_download_url,
+)
+
+
+class TestRequireAdminToken(unittest.TestCase):
+    def assertUnauthorized(self, authorization, token='s3cret'):
+        with self.assertRaises(AdminAuthError) as ctx:
+            require_admin_token(authorization, token=token)
+        self.assertEqual(ctx.exception.status_code, 401)
+
+    def test_unauthenticated_request_is_refused(self):
+        self.assertUnauthorized(None)
+        self.assertUnauthorized('')
+
+    def test_wrong_token_or_scheme_is_refused(self):
+        self.assertUnauthorized('Bearer wrong')
+        self.assertUnauthorized('Basic s3cret')
+        self.assertUnauthorized('Bearer ')
+
+    def test_refused_when_no_token_is_configured(self):
+        self.assertUnauthorized('Bearer anything', token=None)
+        self.assertUnauthorized('Bearer ', token='')
+
+    def test_valid_bearer_token_is_accepted(self):
+        require_admin_token('Bearer s3cret', token='s3cret')
+        require_admin_token('bearer s3cret', token='s3cret')
+
+
+class TestDownloadUrl(unittest.TestCase):
+    PATH = '/api/export/subscribers'
+
+    def sign(self, params, now=1000.0):
+        url = urlsplit(sign_download_url(self.PATH, params, ttl=60, token='s3cret', now=now))
+        return url.path, dict(parse_qsl(url.query))
+
+    def assertRefused(self, path, params, now=1000.0, token='s3cret'):
+        with self.assertRaises(AdminAuthError) as ctx:
+            verify_download_url(path, params, token=token, now=now)
+        self.assertEqual(ctx.exception.status_code, 401)
+
+    def test_signed_url_is_accepted_until_it_expires(self):
+        path, params = self.sign({'format': 'csv', 'status': 'active'})
+        self.assertEqual(path, self.PATH)
+        self.assertEqual(params['format'], 'csv')
+        verify_download_url(path, params, token='s3cret', now=1060.0)
+        self.assertRefused(path, params, now=1061.0)
+
+    def test_changed_parameters_or_path_are_refused(self):
+        path, params = self.sign({'format': 'csv', 'status': 'active'})
+        self.assertRefused(path, dict(params, status='expired'))
+        self.assertRefused(path, dict(params, plan='vip'))
+        self.assertRefused(path, dict(params, expires='99999'))
+        self.assertRefused('/api/stats', params)
+
+    def test_missing_signature_or_token_is_refused(self):
+        path, params = self.sign({'format': 'csv'})
+        self.assertRefused(path, {k: v for k, v in params.items() if k != 'signature'})
+        self.assertRefused(path, params, token='other')
+        self.assertRefused(path, params, token=None)
+        with self.assertRaises(AdminAuthError):
+            sign_download_url(self.PATH, {}, token='')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import sys
+import os
+import types
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+sys.modules.setdefault('dotenv', types.SimpleNamespace(load_dotenv=lambda: None))
+
+from bot.callback_router import CallbackRouter
+from bot.metrics import CALLBACK_ERRORS, CALLBACK_LATENCY
+
+
+class TestCallbackRouter(unittest.IsolatedAsyncioTestCase):
+    async def test_exact_and_prefix_routes(self):
+        router = CallbackRouter()
+        calls = []
+
+        @router.route("help")
+        async def show_help(query, user_id):
+            calls.append(("help", user_id))
+
+        @router.prefix("plan_")
+        async def select_plan(query, user_id, data):
+            calls.append(("plan", data))
+
+        @router.prefix("plan_vip_")
+        async def select_vip(query, user_id, data):
+            calls.append(("vip", data))
+
+        self.assertTrue(await router.dispatch(None, 1, "help"))
+        self.assertTrue(await router.dispatch(None, 1, "plan_monthly"))
+        self.assertTrue(await router.dispatch(None, 1, "plan_vip_year"))
+        self.assertEqual(calls, [("help", 1), ("plan", "plan_monthly"), ("vip", "plan_vip_year")])
+        self.assertEqual(router.resolve("plan_monthly")[0], "plan")
+
+    async def test_unknown_route(self):
+        router = CallbackRouter()
+        before = CALLBACK_ERRORS.value(route="unknown", error="UnknownRoute")
+        self.assertFalse(await router.dispatch(None, 1, "nope"))
+        self.assertEqual(CALLBACK_ERRORS.value(route="unknown", error="UnknownRoute"), before + 1)
+
+    async def test_errors_and_latency_per_route(self):
+        router = CallbackRouter()
+
+        @router.route("test_broken")
+        async def broken(query, user_id):
+            raise KeyError("missing")
+
+        with self.assertRaises(KeyError):
+            await router.dispatch(None, 1, "test_broken")
+        self.assertEqual(CALLBACK_ERRORS.value(route="test_broken", error="KeyError"), 1)
+        self.assertEqual(CALLBACK_LATENCY.count(route="test_broken"), 1)
+
+    def test_duplicate_registration_fails(self):
+        router = CallbackRouter()
+        router.route("help")(lambda q, u: None)
+        with self.assertRaises(ValueError):
+            router.route("help")(lambda q, u: None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,79 @@
+import csv
+import gzip
+import io
+import json
+import unittest
+import sys
+import os
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from bot.export import EXPORT_FIELDS, encode_rows
+
+
+async def aiter_rows(rows):
+    for row in rows:
+        yield row
+
+
+def make_rows(count):
+    return [
+        {
+            'user_id': i,
+            'plan': 'Monthly',
+            'status': 'active',
+            'start_date': datetime(2024, 1, 1),
+            'expires_at': datetime(2024, 2, 1),
+            'transaction_id': f'tx{i}',
+            'language': None,
+        }
+        for i in range(count)
+    ]
+
+
+async def collect(chunks):
+    return [chunk async for chunk in chunks]
+
+
+class TestEncodeRows(unittest.IsolatedAsyncioTestCase):
+    async def test_csv_has_header_and_rows(self):
+        chunks = await collect(encode_rows(aiter_rows(make_rows(3)), 'csv'))
+        reader = list(csv.DictReader(io.StringIO(b''.join(chunks).decode())))
+
+        self.assertEqual(tuple(reader[0].keys()), EXPORT_FIELDS)
+        self.assertEqual([r['user_id'] for r in reader], ['0', '1', '2'])
+        self.assertEqual(reader[0]['start_date'], '2024-01-01T00:00:00')
+        self.assertEqual(reader[0]['language'], '')
+
+    async def test_ndjson_one_object_per_line(self):
+        chunks = await collect(encode_rows(aiter_rows(make_rows(2)), 'ndjson'))
+        lines = b''.join(chunks).decode().splitlines()
+
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(json.loads(lines[1])['transaction_id'], 'tx1')
+
+    async def test_output_is_chunked(self):
+        chunks = await collect(encode_rows(aiter_rows(make_rows(2000)), 'csv', chunk_size=4096))
+
+        self.assertGreater(len(chunks), 10)
+        self.assertTrue(all(len(c) < 4096 + 200 for c in chunks))
+
+    async def test_gzip_stream_decompresses(self):
+        plain = b''.join(await collect(encode_rows(aiter_rows(make_rows(500)), 'ndjson')))
+        packed = b''.join(await collect(
+            encode_rows(aiter_rows(make_rows(500)), 'ndjson', chunk_size=1024, compress=True)
+        ))
+
+        self.assertEqual(gzip.decompress(packed), plain)
+        self.assertLess(len(packed), len(plain))
+
+    async def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            await collect(encode_rows(aiter_rows([]), 'xml'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import asyncio
+import json
+import unittest
+import sys
+import os
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from bot.health import CheckPending, HealthMonitor
+
+
+class TestHealthMonitor(unittest.IsolatedAsyncioTestCase):
+    async def asyncTearDown(self):
+        await self.monitor.stop()
+
+    async def test_ready_when_all_probes_pass(self):
+        calls = []
+
+        async def database():
+            calls.append('db')
+
+        self.monitor = HealthMonitor(interval=60)
+        self.monitor.add_check('database', database)
+        await self.monitor.start()
+
+        ok, body = self.monitor.ready()
+        self.assertTrue(ok)
+        self.assertEqual(body['status'], 'ready')
+        self.assertTrue(body['checks']['database']['ok'])
+        # Answering the endpoint does not run the probe again
+        self.monitor.ready()
+        self.assertEqual(calls, ['db'])
+
+    async def test_failing_probe_makes_not_ready(self):
+        async def database():
+            raise ConnectionError('refused')
+
+        self.monitor = HealthMonitor(interval=60)
+        self.monitor.add_check('database', database)
+        await self.monitor.start()
+
+        ok, body = self.monitor.ready()
+        self.assertFalse(ok)
+        self.assertIn('refused', body['checks']['database']['error'])
+        self.assertTrue(self.monitor.live()[0])
+
+    async def test_pending_probe_is_not_ready_until_it_passes(self):
+        started = False
+
+        async def scheduler():
+            if not started:
+                raise CheckPending('application not started')
+
+        self.monitor = HealthMonitor(interval=60)
+        self.monitor.add_check('scheduler', scheduler)
+        with self.assertNoLogs('bot.health', level='WARNING'):
+            await self.monitor.start()
+
+        ok, body = self.monitor.ready()
+        self.assertFalse(ok)
+        self.assertEqual(body['checks']['scheduler']['error'], 'pending: application not started')
+        started = True
+        await self.monitor.probe_once()
+        self.assertTrue(self.monitor.ready()[0])
+
+    async def test_recent_success_skips_probe(self):
+        calls = []
+
+        async def telegram():
+            calls.append('getMe')
+
+        self.monitor = HealthMonitor(interval=60)
+        self.monitor.add_check('telegram', telegram, cache_for=300)
+        self.monitor.mark_success('telegram')
+        await self.monitor.start()
+
+        self.assertEqual(calls, [])
+        self.assertTrue(self.monitor.ready()[0])
+
+    async def test_slow_probe_times_out(self):
+        async def database():
+            await asyncio.sleep(1)
+
+        self.monitor = HealthMonitor(interval=60, probe_timeout=0.01)
+        self.monitor.add_check('database', database)
+        await self.monitor.start()
+
+        self.assertFalse(self.monitor.ready()[0])
+
+    async def test_missed_heartbeat(self):
+        self.monitor = HealthMonitor(interval=60)
+        self.monitor.expect_heartbeat('job_queue', max_age=0)
+        await self.monitor.start()
+
+        ok, body = self.monitor.ready()
+        self.assertFalse(ok)
+        self.assertEqual(body['checks']['job_queue']['error'], 'missed heartbeat')
+
+    async def test_routes_render_json(self):
+        self.monitor = HealthMonitor(interval=60)
+        routes = self.monitor.routes()
+
+        status, content_type, body = routes['/health/ready']()
+        self.assertEqual(status, 503)
+        self.assertEqual(json.loads(body)['status'], 'not_ready')
+        await self.monitor.start()
+        self.assertEqual(routes['/health/live']()[0], 200)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import unittest
+import sys
+import os
+import types
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock, patch
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+sys.modules.setdefault('dotenv', types.SimpleNamespace(load_dotenv=lambda: None))
+sys.modules.setdefault('asyncpg', types.SimpleNamespace(create_pool=None))
+
+telegram = types.SimpleNamespace(
+    Update=object,
+    ChatMember=types.SimpleNamespace(
+        MEMBER='member', ADMINISTRATOR='administrator', OWNER='creator', RESTRICTED='restricted'
+    ),
+)
+telegram_ext = types.SimpleNamespace(ContextTypes=types.SimpleNamespace(DEFAULT_TYPE=object))
+
+from bot.active_subscribers import ActiveSubscriberSet, active_subscribers
+from bot.config import ALL_CHANNEL_IDS
+import bot.subscriber_manager
+
+with patch.dict(sys.modules, {'telegram': telegram, 'telegram.ext': telegram_ext}):
+    from bot import membership
+
+
+class TestActiveSubscriberSet(unittest.TestCase):
+    def test_expiry_decides_membership(self):
+        now = datetime(2024, 1, 1)
+        subscribers = ActiveSubscriberSet()
+        subscribers.load([(1, now + timedelta(days=1)), (2, now - timedelta(days=1))])
+
+        self.assertTrue(subscribers.loaded)
+        self.assertTrue(subscribers.is_active(1, now=now))
+        self.assertFalse(subscribers.is_active(2, now=now))
+        self.assertFalse(subscribers.is_active(3, now=now))
+        self.assertEqual(len(subscribers), 2)
+
+    def test_aware_timestamps_are_normalized(self):
+        subscribers = ActiveSubscriberSet()
+        expires = datetime(2024, 1, 1, 12, tzinfo=timezone(timedelta(hours=2)))
+        subscribers.add(1, expires)
+        self.assertEqual(subscribers.expires_at(1), datetime(2024, 1, 1, 10))
+        self.assertTrue(subscribers.is_active(1, now=datetime(2024, 1, 1, 9, tzinfo=timezone.utc)))
+        subscribers.discard(1)
+        self.assertIsNone(subscribers.expires_at(1))
+
+
+def join_request(user_id):
+    request = types.SimpleNamespace(
+        chat=types.SimpleNamespace(id=ALL_CHANNEL_IDS[0]),
+        from_user=types.SimpleNamespace(id=user_id),
+        approve=AsyncMock(),
+        decline=AsyncMock(),
+    )
+    return types.SimpleNamespace(chat_join_request=request), request
+
+
+class TestHandleJoinRequest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.manager = types.SimpleNamespace(
+            get_subscription=AsyncMock(return_value=None),
+            record_channel_join=AsyncMock(),
+        )
+        patcher = patch.object(membership, 'subscriber_manager', self.manager)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_active_subscriber_is_approved(self):
+        active_subscribers.add(10, datetime.now(timezone.utc) + timedelta(days=1))
+        self.addCleanup(active_subscribers.discard, 10)
+        update, request = join_request(10)
+
+        await membership.handle_join_request(update, None)
+        request.approve.assert_awaited_once()
+        request.decline.assert_not_awaited()
+        self.manager.record_channel_join.assert_awaited_once_with(ALL_CHANNEL_IDS[0], 10)
+
+    async def test_expired_subscriber_is_declined(self):
+        self.manager.get_subscription.return_value = {
+            'user_id': 11, 'plan': 'Trial', 'expires_at': datetime.now(timezone.utc) - timedelta(days=1),
+        }
+        self.addCleanup(active_subscribers.discard, 11)
+        update, request = join_request(11)
+
+        await membership.handle_join_request(update, None)
+        request.decline.assert_awaited_once()
+        request.approve.assert_not_awaited()
+        self.manager.record_channel_join.assert_not_awaited()
+
+    async def test_subscriber_activated_elsewhere_is_approved(self):
+        self.manager.get_subscription.return_value = {
+            'user_id': 12, 'plan': 'Trial', 'expires_at': datetime.now(timezone.utc) + timedelta(days=1),
+        }
+        self.addCleanup(active_subscribers.discard, 12)
+        update, request = join_request(12)
+
+        await membership.handle_join_request(update, None)
+        request.approve.assert_awaited_once()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import asyncio
+import unittest
+import sys
+import os
+import types
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from bot import metrics
+from bot.metrics import Registry, statement_name
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = Registry()
+
+    def test_counter_renders_labels(self):
+        counter = self.registry.counter('webhooks_total', 'Webhooks', ['outcome'])
+        counter.inc(outcome='success')
+        counter.inc(2, outcome='duplicate')
+
+        text = self.registry.render()
+        self.assertIn('# TYPE webhooks_total counter', text)
+        self.assertIn('webhooks_total{outcome="duplicate"} 2', text)
+        self.assertIn('webhooks_total{outcome="success"} 1', text)
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = self.registry.histogram('latency_seconds', 'Latency', ['route'], buckets=(0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 3.0):
+            histogram.observe(value, route='plan')
+
+        text = self.registry.render()
+        self.assertIn('latency_seconds_bucket{route="plan",le="0.1"} 2', text)
+        self.assertIn('latency_seconds_bucket{route="plan",le="1"} 3', text)
+        self.assertIn('latency_seconds_bucket{route="plan",le="+Inf"} 4', text)
+        self.assertIn('latency_seconds_count{route="plan"} 4', text)
+        self.assertIn('latency_seconds_sum{route="plan"} 3.65', text)
+
+    def test_gauge_reads_callback(self):
+        pool = types.SimpleNamespace(get_size=lambda: 10, get_idle_size=lambda: 7)
+        gauge = self.registry.gauge('pool_connections', 'Pool', ['state'])
+        gauge.set_function(lambda: pool.get_size() - pool.get_idle_size(), state='in_use')
+
+        self.assertIn('pool_connections{state="in_use"} 3', self.registry.render())
+
+    def test_wrong_labels_are_rejected(self):
+        counter = self.registry.counter('kicks_total', 'Kicks', ['result'])
+        with self.assertRaises(ValueError):
+            counter.inc(outcome='x')
+        with self.assertRaises(ValueError):
+            self.registry.counter('kicks_total', 'Kicks again')
+
+
+class TestStatementName(unittest.TestCase):
+    def test_names(self):
+        self.assertEqual(statement_name('SELECT COUNT(*) FROM subscribers'), 'select_subscribers')
+        self.assertEqual(statement_name('\n INSERT INTO payments (a) VALUES ($1)'), 'insert_payments')
+        self.assertEqual(
+            statement_name('WITH inserted AS (INSERT INTO payments VALUES (1)) SELECT 1'),
+            'insert_payments',
+        )
+        self.assertEqual(statement_name('SELECT id FROM outbox FOR UPDATE SKIP LOCKED'), 'select_outbox')
+        self.assertEqual(statement_name("SELECT pg_notify('a', $1)"), 'select')
+
+
+class TestExporter(unittest.IsolatedAsyncioTestCase):
+    async def test_serves_metrics(self):
+        routes = {'/metrics': metrics._metrics_route}
+        server = await asyncio.start_server(lambda r, w: metrics._serve(r, w, routes), '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        metrics.KICKS.inc(result='removed')
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b'GET /metrics HTTP/1.1\r\nHost: x\r\n\r\n')
+            response = (await reader.read()).decode()
+            writer.close()
+        finally:
+            server.close()
+            await server.wait_closed()
+
+        self.assertTrue(response.startswith('HTTP/1.1 200 OK'))
+        self.assertIn('expired_member_kicks_total{result="removed"}', response)
+
+
+if __name__ == '__main__':
+    unittest.main()
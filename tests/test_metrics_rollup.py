@@ -0,0 +1,88 @@
+import unittest
+import sys
+import os
+import types
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+sys.modules.setdefault('dotenv', types.SimpleNamespace(load_dotenv=lambda: None))
+
+from bot.metrics_rollup import MetricsRollup
+
+
+class FakeTransaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+
+class FakeConn:
+    def __init__(self, batches, locked=True):
+        self.batches = list(batches)
+        self.locked = locked
+        self.executed = []
+        self.last_payment_id = 0
+
+    def transaction(self):
+        return FakeTransaction()
+
+    async def fetchval(self, query, *args):
+        return self.locked
+
+    async def fetchrow(self, query, *args):
+        if 'rollup_watermarks' in query:
+            return {'last_payment_id': self.last_payment_id, 'churned_until': None}
+        return self.batches.pop(0) if self.batches else {'upper': None, 'count': 0}
+
+    async def execute(self, query, *args):
+        self.executed.append((query, args))
+        if 'UPDATE rollup_watermarks' in query:
+            self.last_payment_id = args[1]
+
+
+def make_rollup(conn, batch_size=2):
+    class Acquire:
+        async def __aenter__(self):
+            return conn
+
+        async def __aexit__(self, exc_type, exc, tb):
+            pass
+
+    manager = types.SimpleNamespace(pool=types.SimpleNamespace(acquire=lambda: Acquire()))
+    return MetricsRollup(manager=manager, batch_size=batch_size)
+
+
+class TestMetricsRollup(unittest.IsolatedAsyncioTestCase):
+    async def test_batches_advance_the_watermark(self):
+        conn = FakeConn([{'upper': 4, 'count': 2}, {'upper': 7, 'count': 1}])
+        rollup = make_rollup(conn)
+
+        self.assertEqual(await rollup.run(), 3)
+        self.assertEqual(conn.last_payment_id, 7)
+        ranges = [args[:2] for query, args in conn.executed if 'INSERT INTO daily_metrics (day, plan, language, new_subscribers' in query]
+        self.assertEqual(ranges, [(0, 4), (4, 7)])
+
+    async def test_churn_and_active_are_refreshed_without_payments(self):
+        conn = FakeConn([])
+        rollup = make_rollup(conn)
+
+        self.assertEqual(await rollup.run(), 0)
+        queries = [query for query, args in conn.executed]
+        self.assertTrue(any('churned = daily_metrics.churned' in q for q in queries))
+        self.assertTrue(any('SET active = EXCLUDED.active' in q for q in queries))
+        self.assertFalse(any('cohort_retention' in q for q in queries))
+
+    async def test_skips_when_another_process_holds_the_lock(self):
+        conn = FakeConn([{'upper': 4, 'count': 2}], locked=False)
+        rollup = make_rollup(conn)
+
+        self.assertIsNone(await rollup.run_once())
+        self.assertEqual(conn.executed, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
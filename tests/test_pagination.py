@@ -0,0 +1,48 @@
+import unittest
+import sys
+import os
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from bot.pagination import (
+    MAX_PAGE_SIZE,
+    InvalidCursor,
+    clamp_page_size,
+    decode_cursor,
+    encode_cursor,
+)
+
+
+class TestCursor(unittest.TestCase):
+    def test_expiry_cursor_roundtrip(self):
+        expires_at = datetime(2024, 5, 1, 12, 30)
+        cursor = encode_cursor('expires_at', expires_at, 42)
+
+        self.assertEqual(decode_cursor(cursor, 'expires_at'), (expires_at, 42))
+        self.assertNotIn('=', cursor)
+
+    def test_user_id_cursor_roundtrip(self):
+        cursor = encode_cursor('user_id', datetime(2024, 5, 1), 7)
+        self.assertEqual(decode_cursor(cursor, 'user_id'), (None, 7))
+
+    def test_cursor_is_bound_to_its_ordering(self):
+        cursor = encode_cursor('user_id', None, 7)
+        with self.assertRaises(InvalidCursor):
+            decode_cursor(cursor, 'expires_at')
+
+    def test_garbage_is_rejected(self):
+        for cursor in ('not-a-cursor', 'e30', encode_cursor('expires_at', datetime(2024, 1, 1), 1)[:-4]):
+            with self.assertRaises(InvalidCursor):
+                decode_cursor(cursor, 'expires_at')
+
+    def test_page_size_is_capped(self):
+        self.assertEqual(clamp_page_size(None), 50)
+        self.assertEqual(clamp_page_size(10_000), MAX_PAGE_SIZE)
+        self.assertEqual(clamp_page_size(-5), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
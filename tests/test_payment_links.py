@@ -0,0 +1,85 @@
+import unittest
+import sys
+import os
+import types
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+sys.modules.setdefault('dotenv', types.SimpleNamespace(load_dotenv=lambda: None))
+
+from bot.payment_links import PaymentLinkGenerator
+
+
+class TestPaymentLinkGenerator(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.generator = PaymentLinkGenerator(store=None, cache_size=0)
+
+    async def test_mark_payment_completed_uses_pending_index(self):
+        await self.generator.generate_payment_link(1, 'Trial Trip')
+        await self.generator.generate_payment_link(2, 'Trial Trip')
+
+        self.assertTrue(await self.generator.mark_payment_completed(1, 'Trial Trip'))
+        self.assertFalse(await self.generator.mark_payment_completed(1, 'Trial Trip'))
+        self.assertNotIn((1, 'Trial Trip'), self.generator._pending_by_user_plan)
+        self.assertIn((2, 'Trial Trip'), self.generator._pending_by_user_plan)
+
+        payments = await self.generator.get_user_payments(1)
+        self.assertEqual([p['status'] for p in payments], ['completed'])
+
+    async def test_eviction_keeps_indexes_consistent(self):
+        self.generator.cache_size = 2
+        for user_id in (1, 2, 3):
+            await self.generator.generate_payment_link(user_id, 'Full Year')
+
+        self.assertEqual(len(self.generator.active_links), 2)
+        self.assertNotIn(1, self.generator._by_user)
+        self.assertNotIn((1, 'Full Year'), self.generator._pending_by_user_plan)
+        self.assertFalse(await self.generator.mark_payment_completed(1, 'Full Year'))
+
+    async def test_link_evicted_while_completing(self):
+        generator = self.generator
+
+        class RacingStore:
+            async def insert(self, transaction_id, link):
+                pass
+
+            async def complete(self, transaction_id, completed_at):
+                # Another request pushes the link out of the cache meanwhile,
+                # and another process already completed it
+                generator.cache_size = 1
+                await generator.generate_payment_link(2, 'Full Year')
+                return False
+
+            async def complete_pending(self, user_id, plan_id, completed_at):
+                return None
+
+        generator.store = RacingStore()
+        await generator.generate_payment_link(1, 'Full Year')
+        self.assertFalse(await generator.mark_payment_completed(1, 'Full Year'))
+        self.assertNotIn((1, 'Full Year'), generator._pending_by_user_plan)
+
+    async def test_pending_heap_stays_bounded(self):
+        self.generator.cache_size = 4
+        for user_id in range(50):
+            await self.generator.generate_payment_link(user_id, 'Full Year')
+            await self.generator.mark_payment_completed(user_id, 'Full Year')
+
+        self.assertLessEqual(len(self.generator._pending_heap), 8)
+        await self.generator.generate_payment_link(99, 'Full Year')
+        self.generator.pending_ttl = -1
+        self.assertEqual(await self.generator.expire_stale_links(), 1)
+
+    async def test_expire_stale_links(self):
+        await self.generator.generate_payment_link(1, 'Cloudy Month')
+        self.generator.pending_ttl = -1
+
+        self.assertEqual(await self.generator.expire_stale_links(), 1)
+        self.assertFalse(await self.generator.mark_payment_completed(1, 'Cloudy Month'))
+        payments = await self.generator.get_user_payments(1)
+        self.assertEqual(payments[0]['status'], 'expired')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import base64
+import hashlib
+import hmac
+import unittest
+import sys
+import os
+import types
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+sys.modules.setdefault('dotenv', types.SimpleNamespace(load_dotenv=lambda: None))
+
+from bot.payment_tokens import (
+    InvalidPaymentToken, sign_payment_token, verify_payment_token, verify_provider_signature
+)
+
+
+class TestPaymentTokens(unittest.TestCase):
+    def test_round_trip(self):
+        token = sign_payment_token(42, 'monthly', issued_at=1700000000, nonce='abc123', secret='s')
+        claims = verify_payment_token(token, secret='s')
+        self.assertEqual(
+            claims,
+            {'user_id': 42, 'plan_id': 'monthly', 'issued_at': 1700000000, 'nonce': 'abc123'},
+        )
+
+    def test_nonces_are_unique(self):
+        first = sign_payment_token(42, 'monthly', issued_at=1700000000, secret='s')
+        second = sign_payment_token(42, 'monthly', issued_at=1700000000, secret='s')
+        self.assertNotEqual(first, second)
+
+    def test_rejects_forged_or_tampered_tokens(self):
+        token = sign_payment_token(42, 'monthly', secret='s')
+        with self.assertRaises(InvalidPaymentToken):
+            verify_payment_token(token, secret='other')
+        forged_payload = sign_payment_token(43, 'monthly', secret='x').split('.')[0]
+        with self.assertRaises(InvalidPaymentToken):
+            verify_payment_token(forged_payload + '.' + token.split('.')[1], secret='s')
+        with self.assertRaises(InvalidPaymentToken):
+            verify_payment_token('not-a-token', secret='s')
+
+    def test_max_age(self):
+        token = sign_payment_token(42, 'monthly', issued_at=0, secret='s')
+        with self.assertRaises(InvalidPaymentToken):
+            verify_payment_token(token, max_age=60, secret='s')
+
+    def test_provider_signature(self):
+        body = b'{"transaction_id": "tx1", "status": "completed"}'
+        signature = hmac.new(b'bold', base64.b64encode(body), hashlib.sha256).hexdigest()
+        verify_provider_signature(body, signature, secret='bold')
+
+        for bad_body, bad_signature, secret in (
+            (body + b' ', signature, 'bold'),
+            (body, signature, 'other'),
+            (body, None, 'bold'),
+            (body, signature, None),
+        ):
+            with self.assertRaises(InvalidPaymentToken):
+                verify_provider_signature(bad_body, bad_signature, secret=secret)
+
+
+if __name__ == '__main__':
+    unittest.main()
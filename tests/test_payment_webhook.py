@@ -0,0 +1,161 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import json
+import os
+import sys
+import types
+import unittest
+from unittest.mock import AsyncMock, Mock, patch
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+sys.modules.setdefault('dotenv', types.SimpleNamespace(load_dotenv=lambda: None))
+sys.modules.setdefault('asyncpg', types.SimpleNamespace(create_pool=None))
+
+import bot.subscriber_manager
+from bot.payment_tokens import sign_payment_token, verify_provider_signature
+
+
+class HTTPException(Exception):
+    def __init__(self, status_code, detail=None, headers=None):
+        super().__init__(detail)
+        self.status_code, self.detail = status_code, detail
+
+
+fastapi = types.SimpleNamespace(FastAPI=object, Request=object, HTTPException=HTTPException)
+stubs = {'fastapi': fastapi}
+if 'bot.outbox' not in sys.modules:
+    stubs['telegram'] = types.SimpleNamespace(Bot=object)
+
+with patch.dict(sys.modules, stubs):
+    from bot import payment_webhook
+
+SECRET = 'bold-secret'
+
+
+class FakeRequest:
+    def __init__(self, payload, signature=True):
+        self._body = json.dumps(payload).encode()
+        self.headers = {}
+        if signature is True:
+            signature = hmac.new(SECRET.encode(), base64.b64encode(self._body), hashlib.sha256).hexdigest()
+        if signature:
+            self.headers['x-bold-signature'] = signature
+
+    async def body(self):
+        return self._body
+
+
+class FakeManager:
+    """The webhook ledger and activation, in memory."""
+
+    def __init__(self):
+        self.claimed = {}
+        self.add_subscriber = AsyncMock(return_value=True)
+        self.complete_webhook = AsyncMock()
+        self.fail_webhook = AsyncMock()
+        self.release_webhook = AsyncMock(side_effect=lambda tx: self.claimed.pop(tx, None))
+
+    async def claim_webhook(self, transaction_id, user_id=None, plan_id=None, payment_nonce=None):
+        if transaction_id in self.claimed:
+            return False
+        self.claimed[transaction_id] = payment_nonce
+        return True
+
+
+class FakeLinks:
+    def __init__(self, *nonces):
+        self.links = {nonce: {'status': 'pending'} for nonce in nonces}
+
+    async def verify_payment_link(self, nonce):
+        return self.links.get(nonce)
+
+    def note_completed(self, nonce, completed_at):
+        self.links[nonce]['status'] = 'completed'
+
+
+def payment(transaction_id, nonce='n1', user_id=7, plan_id='monthly'):
+    token = sign_payment_token(user_id, plan_id, nonce=nonce)
+    return {'transaction_id': transaction_id, 'status': 'completed', 'metadata': {'token': token}}
+
+
+class TestPaymentWebhook(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.manager = FakeManager()
+        self.links = FakeLinks('n1')
+        self.pool = types.SimpleNamespace(running=False, submit=Mock())
+        plan_id = next(iter(payment_webhook.PLANS))
+        self.payment = lambda tx, nonce='n1': payment(tx, nonce=nonce, plan_id=plan_id)
+        for patcher in (
+            patch.object(payment_webhook, 'subscriber_manager', self.manager),
+            patch.object(payment_webhook, 'payment_generator', self.links),
+            patch.object(payment_webhook, 'activation_pool', self.pool),
+            patch.object(payment_webhook, 'outbox_dispatcher', Mock()),
+            patch.object(payment_webhook, 'WEBHOOK_FAST_ACK', False),
+            patch.object(
+                payment_webhook,
+                'verify_provider_signature',
+                lambda body, signature: verify_provider_signature(body, signature, secret=SECRET),
+            ),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def call(self, request):
+        try:
+            return 200, await payment_webhook.handle_payment_webhook(request)
+        except HTTPException as e:
+            return e.status_code, e.detail
+
+    async def test_unsigned_or_badly_signed_is_rejected(self):
+        for signature in (None, 'deadbeef'):
+            status, _ = await self.call(FakeRequest(self.payment('tx1'), signature=signature))
+            self.assertEqual(status, 401)
+        self.assertEqual(self.manager.claimed, {})
+
+    async def test_retry_after_completion_is_duplicate(self):
+        self.assertEqual(await self.call(FakeRequest(self.payment('tx1'))), (200, {'status': 'success'}))
+        self.manager.complete_webhook.assert_awaited_once_with('tx1')
+        self.assertEqual(self.links.links['n1']['status'], 'completed')
+
+        self.assertEqual(await self.call(FakeRequest(self.payment('tx1'))), (200, {'status': 'duplicate'}))
+        self.manager.add_subscriber.assert_awaited_once()
+
+    async def test_retry_while_claimed_is_duplicate(self):
+        self.pool.running = True
+        with patch.object(payment_webhook, 'WEBHOOK_FAST_ACK', True):
+            await self.call(FakeRequest(self.payment('tx1')))
+            self.assertEqual(await self.call(FakeRequest(self.payment('tx1'))), (200, {'status': 'duplicate'}))
+        self.pool.submit.assert_called_once()
+
+    async def test_other_transaction_for_consumed_link_conflicts(self):
+        self.links.links['n1']['status'] = 'completed'
+        status, _ = await self.call(FakeRequest(self.payment('tx2')))
+        self.assertEqual(status, 409)
+        self.manager.fail_webhook.assert_awaited_once()
+        self.manager.add_subscriber.assert_not_awaited()
+
+    async def test_fast_ack_accepts_and_queues(self):
+        self.pool.running = True
+        with patch.object(payment_webhook, 'WEBHOOK_FAST_ACK', True):
+            self.assertEqual(await self.call(FakeRequest(self.payment('tx1'))), (200, {'status': 'accepted'}))
+        event = self.pool.submit.call_args.args[0]
+        self.assertEqual((event['transaction_id'], event['user_id'], event['payment_nonce']), ('tx1', 7, 'n1'))
+        self.manager.add_subscriber.assert_not_awaited()
+
+    async def test_inline_failure_releases_claim(self):
+        self.manager.add_subscriber.return_value = False
+        status, _ = await self.call(FakeRequest(self.payment('tx1')))
+        self.assertEqual(status, 500)
+        self.manager.release_webhook.assert_awaited_once_with('tx1')
+        # The provider's retry is processed again rather than ignored
+        self.manager.add_subscriber.return_value = True
+        self.assertEqual(await self.call(FakeRequest(self.payment('tx1'))), (200, {'status': 'success'}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import unittest
+import sys
+import os
+import types
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+sys.modules.setdefault('dotenv', types.SimpleNamespace(load_dotenv=lambda: None))
+
+from bot.reconciliation import iter_export, reconcile
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'bold_export.csv')
+
+PAYMENTS = [
+    {'transaction_id': 'tx-ok', 'user_id': 1, 'plan': 'Cloudy Month', 'amount_cents': 2499},
+    {'transaction_id': 'tx-short', 'user_id': 2, 'plan': 'Cloudy Month', 'amount_cents': 2499},
+    {'transaction_id': 'tx-orphan', 'user_id': 3, 'plan': 'Trial Trip', 'amount_cents': 1499},
+]
+
+# Activations from before the ledger; renewals overwrite transaction_id here
+SUBSCRIBERS = [
+    {'transaction_id': 'tx-ok', 'user_id': 1, 'plan': 'Cloudy Month'},
+    {'transaction_id': 'tx-legacy', 'user_id': 4, 'plan': 'Cloudy Month'},
+]
+
+
+class FakeTransaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
+
+class FakeCursor:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for row in self.rows:
+            yield row
+
+
+class FakeConn:
+    def __init__(self):
+        self.staged = set()
+        self.lookups = []
+
+    def transaction(self):
+        return FakeTransaction()
+
+    async def execute(self, query, *args):
+        if 'INSERT INTO reconcile_export' in query:
+            self.staged.update(args[0])
+
+    async def fetch(self, query, ids):
+        self.lookups.append(list(ids))
+        ledger = [p for p in PAYMENTS if p['transaction_id'] in ids]
+        recorded = {p['transaction_id'] for p in PAYMENTS}
+        legacy = [
+            dict(s, amount_cents=None) for s in SUBSCRIBERS
+            if s['transaction_id'] in ids and s['transaction_id'] not in recorded
+        ]
+        return ledger + legacy
+
+    def cursor(self, query, *args, prefetch=None):
+        return FakeCursor([p for p in PAYMENTS if p['transaction_id'] not in self.staged])
+
+
+class TestReconciliation(unittest.IsolatedAsyncioTestCase):
+    def test_iter_export_skips_unsettled_rows(self):
+        rows = list(iter_export(FIXTURE))
+        self.assertEqual([r['transaction_id'] for r in rows], ['tx-ok', 'tx-missing', 'tx-short'])
+        self.assertEqual(rows[0]['amount_cents'], 2499)
+
+    async def test_reconcile_reports_discrepancies(self):
+        conn = FakeConn()
+        findings = [f async for f in reconcile(conn, iter_export(FIXTURE), batch_size=2)]
+
+        self.assertEqual(len(conn.lookups), 2)
+        kinds = {(f['kind'], f['transaction_id']) for f in findings}
+        self.assertEqual(kinds, {
+            ('missing_activation', 'tx-missing'),
+            ('amount_mismatch', 'tx-short'),
+            ('orphan_subscription', 'tx-orphan'),
+        })
+        mismatch = next(f for f in findings if f['kind'] == 'amount_mismatch')
+        self.assertEqual((mismatch['amount_cents'], mismatch['expected_cents']), (1000, 2499))
+
+    async def test_earlier_payment_of_renewed_user_is_matched_in_ledger(self):
+        PAYMENTS.append({'transaction_id': 'tx-first', 'user_id': 1, 'plan': 'Trial Trip', 'amount_cents': 1499})
+        self.addCleanup(PAYMENTS.pop)
+        rows = [
+            {'transaction_id': 'tx-first', 'amount_cents': 1499},
+            {'transaction_id': 'tx-ok', 'amount_cents': 2499},
+            {'transaction_id': 'tx-legacy', 'amount_cents': 1000},
+        ]
+        findings = [f async for f in reconcile(FakeConn(), rows)]
+
+        # tx-first is user 1's earlier plan, no longer in subscribers
+        self.assertEqual(
+            {(f['kind'], f['transaction_id']) for f in findings},
+            {('amount_mismatch', 'tx-legacy'), ('orphan_subscription', 'tx-short'), ('orphan_subscription', 'tx-orphan')},
+        )
+        legacy = next(f for f in findings if f['kind'] == 'amount_mismatch')
+        self.assertEqual(legacy['expected_cents'], 2499)
+
+
+if __name__ == '__main__':
+    unittest.main()
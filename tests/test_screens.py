@@ -0,0 +1,63 @@
+import unittest
+import sys
+import os
+import types
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+sys.modules.setdefault('dotenv', types.SimpleNamespace(load_dotenv=lambda: None))
+
+from unittest.mock import patch
+
+try:
+    import telegram
+    telegram.InlineKeyboardMarkup
+except (ImportError, AttributeError):
+    # Minimal keyboard classes when python-telegram-bot is not installed
+    class InlineKeyboardButton:
+        def __init__(self, text, callback_data=None, url=None):
+            self.text, self.callback_data, self.url = text, callback_data, url
+
+    class InlineKeyboardMarkup:
+        def __init__(self, inline_keyboard):
+            self.inline_keyboard = tuple(tuple(row) for row in inline_keyboard)
+
+    telegram = types.SimpleNamespace(
+        InlineKeyboardButton=InlineKeyboardButton, InlineKeyboardMarkup=InlineKeyboardMarkup
+    )
+
+with patch.dict(sys.modules, {'telegram': telegram}):
+    from bot.config import PLANS
+    from bot.screens import ScreenRegistry, screens
+
+class TestScreens(unittest.TestCase):
+    def callbacks(self, screen):
+        return [button.callback_data for row in screen.reply_markup.inline_keyboard for button in row]
+
+    def test_screens_are_shared(self):
+        self.assertIs(screens.get('plans', 'es'), screens.get('plans', 'es'))
+        self.assertIsNot(screens.get('plans', 'es'), screens.get('plans', 'en'))
+
+    def test_admin_flag(self):
+        self.assertIn('admin_stats', self.callbacks(screens.get('main_menu', 'en', is_admin=True)))
+        self.assertNotIn('admin_stats', self.callbacks(screens.get('main_menu', 'en')))
+
+    def test_plans_screen_lists_every_plan(self):
+        callbacks = self.callbacks(screens.get('plans', 'en'))
+        self.assertEqual(callbacks[:-1], [f'plan_{plan_id}' for plan_id in PLANS])
+        self.assertEqual(callbacks[-1], 'main_menu')
+
+    def test_unknown_language_falls_back(self):
+        self.assertIs(screens.get('terms', 'fr'), screens.get('terms', 'en'))
+
+    def test_build_renders_each_combination(self):
+        registry = ScreenRegistry(languages={'en': {'back': 'Back'}})
+        registry.register('page')(lambda t, is_admin: ('Hi', [], None))
+        self.assertEqual(registry.build(), 2)
+        self.assertIsNone(registry.get('page').reply_markup)
+
+
+if __name__ == '__main__':
+    unittest.main()
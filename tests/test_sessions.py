@@ -0,0 +1,87 @@
+import unittest
+import sys
+import os
+import types
+from unittest.mock import AsyncMock
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+sys.modules.setdefault('dotenv', types.SimpleNamespace(load_dotenv=lambda: None))
+
+from bot.sessions import SessionStore
+
+
+def make_manager(stored=None):
+    return types.SimpleNamespace(
+        get_session=AsyncMock(return_value=stored),
+        record_user=AsyncMock(),
+        record_age_verified=AsyncMock(),
+    )
+
+
+class TestSessionStore(unittest.IsolatedAsyncioTestCase):
+    async def test_loads_once_per_user(self):
+        manager = make_manager({'language': 'es', 'age_verified': True})
+        store = SessionStore(manager=manager, max_size=10, ttl=60)
+
+        self.assertEqual(await store.language(1), 'es')
+        self.assertTrue(await store.is_age_verified(1))
+        manager.get_session.assert_awaited_once_with(1)
+
+    async def test_unknown_user_defaults(self):
+        store = SessionStore(manager=make_manager(None), max_size=10, ttl=60)
+        self.assertEqual(await store.language(2), 'en')
+        self.assertFalse(await store.is_age_verified(2))
+
+    async def test_rejects_unsupported_language(self):
+        manager = make_manager(None)
+        store = SessionStore(manager=manager, max_size=10, ttl=60)
+
+        with self.assertRaises(ValueError):
+            await store.set_language(5, 'xx')
+        manager.record_user.assert_not_awaited()
+        self.assertEqual(await store.language(5), 'en')
+
+    async def test_unsupported_stored_language_falls_back(self):
+        store = SessionStore(manager=make_manager({'language': 'xx', 'age_verified': False}), max_size=10, ttl=60)
+        self.assertEqual(await store.language(6), 'en')
+
+    async def test_writes_go_through(self):
+        manager = make_manager(None)
+        store = SessionStore(manager=manager, max_size=10, ttl=60)
+
+        await store.set_language(3, 'es')
+        await store.verify_age(3)
+        manager.record_user.assert_awaited_once_with(3, 'es')
+        manager.record_age_verified.assert_awaited_once_with(3)
+        self.assertEqual(await store.get(3), {'language': 'es', 'age_verified': True})
+        manager.get_session.assert_awaited_once()
+
+    async def test_evicts_least_recently_used(self):
+        manager = make_manager(None)
+        store = SessionStore(manager=manager, max_size=2, ttl=60)
+        await store.get(1)
+        await store.get(2)
+        await store.get(1)
+        await store.get(3)
+
+        self.assertEqual(len(store), 2)
+        manager.get_session.reset_mock()
+        await store.get(1)
+        manager.get_session.assert_not_awaited()
+        await store.get(2)
+        manager.get_session.assert_awaited_once_with(2)
+
+    async def test_load_failure_is_not_cached(self):
+        manager = make_manager(None)
+        manager.get_session.side_effect = [RuntimeError('down'), {'language': 'es', 'age_verified': True}]
+        store = SessionStore(manager=manager, max_size=10, ttl=60)
+
+        self.assertFalse(await store.is_age_verified(4))
+        self.assertTrue(await store.is_age_verified(4))
+
+
+if __name__ == '__main__':
+    unittest.main()
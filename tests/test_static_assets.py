@@ -0,0 +1,63 @@
+import gzip
+import unittest
+import sys
+import os
+import tempfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from bot.static_assets import AssetBundle, StaticAsset, admin_assets
+
+
+class TestAssetBundle(unittest.TestCase):
+    def test_index_references_hashed_assets(self):
+        html = admin_assets.index.encodings['identity'].decode('utf-8')
+
+        self.assertNotIn('{{', html)
+        for url in admin_assets.urls.values():
+            self.assertIn(url, html)
+            self.assertIsNotNone(admin_assets.get(url.rsplit('/', 1)[1]))
+
+    def test_hash_follows_content(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, 'admin.html'), 'w') as f:
+                f.write('<link href="{{ admin.css }}">')
+            with open(os.path.join(directory, 'admin.css'), 'w') as f:
+                f.write('body { color: red; }')
+            first = AssetBundle(directory).urls['admin.css']
+            self.assertEqual(AssetBundle(directory).urls['admin.css'], first)
+
+            with open(os.path.join(directory, 'admin.css'), 'w') as f:
+                f.write('body { color: blue; }')
+            self.assertNotEqual(AssetBundle(directory).urls['admin.css'], first)
+
+
+class TestStaticAsset(unittest.TestCase):
+    def setUp(self):
+        self.body = b'body { margin: 0; }\n' * 100
+        self.asset = StaticAsset('admin.css', self.body, 'text/css; charset=utf-8')
+
+    def test_gzip_variant_roundtrips(self):
+        encoding, body = self.asset.select('gzip, deflate')
+
+        self.assertEqual(encoding, 'gzip')
+        self.assertEqual(gzip.decompress(body), self.body)
+        self.assertLess(len(body), len(self.body))
+
+    def test_identity_without_accept_encoding(self):
+        self.assertEqual(self.asset.select(None), ('identity', self.body))
+        self.assertEqual(self.asset.select('gzip;q=0'), ('identity', self.body))
+
+    def test_etag_differs_per_encoding(self):
+        self.assertNotEqual(self.asset.etag_for('gzip'), self.asset.etag_for('identity'))
+        self.assertTrue(self.asset.etag_for('gzip').startswith('"'))
+
+    def test_small_bodies_are_not_compressed(self):
+        asset = StaticAsset('tiny.js', b'x', 'text/javascript')
+        self.assertEqual(list(asset.encodings), ['identity'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import asyncio
+import unittest
+import sys
+import os
+import types
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+sys.modules.setdefault('dotenv', types.SimpleNamespace(load_dotenv=lambda: None))
+
+from bot.stats_cache import StatsSnapshot
+
+
+class TestStatsSnapshot(unittest.IsolatedAsyncioTestCase):
+    async def test_concurrent_callers_share_one_refresh(self):
+        calls = 0
+
+        async def loader():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return {'total': 1, 'active': 1}
+
+        snapshot = StatsSnapshot(loader=loader, ttl=60)
+        results = await asyncio.gather(*(snapshot.get() for _ in range(10)))
+
+        self.assertEqual(calls, 1)
+        self.assertTrue(all(r == {'total': 1, 'active': 1} for r in results))
+        await snapshot.get()
+        self.assertEqual(calls, 1)
+
+    async def test_etag_changes_only_with_data(self):
+        values = iter([{'active': 1}, {'active': 1}, {'active': 2}])
+
+        async def loader():
+            return next(values)
+
+        snapshot = StatsSnapshot(loader=loader, ttl=0)
+        await snapshot.get()
+        first = snapshot.etag
+        await snapshot.get()
+        self.assertEqual(snapshot.etag, first)
+        await snapshot.get()
+        self.assertNotEqual(snapshot.etag, first)
+
+
+if __name__ == '__main__':
+    unittest.main()
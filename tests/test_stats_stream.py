@@ -0,0 +1,114 @@
+import asyncio
+import json
+import os
+import sys
+import types
+import unittest
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+sys.modules.setdefault('dotenv', types.SimpleNamespace(load_dotenv=lambda: None))
+
+from bot.stats_stream import StatsBroadcaster, format_event
+
+
+class FakeSnapshot:
+    def __init__(self, values):
+        self.values = iter(values)
+
+    async def refresh(self):
+        return next(self.values)
+
+
+class FakeListenConn:
+    async def add_listener(self, channel, callback):
+        self.callback = callback
+
+    async def remove_listener(self, channel, callback):
+        pass
+
+
+class FakePool:
+    def __init__(self):
+        self.conn = FakeListenConn()
+
+    async def acquire(self):
+        return self.conn
+
+    async def release(self, conn):
+        pass
+
+
+class TestStatsBroadcaster(unittest.IsolatedAsyncioTestCase):
+    async def test_fans_out_deltas_to_every_client(self):
+        snapshot = FakeSnapshot([
+            {'total': 1, 'active': 1},
+            {'total': 2, 'active': 1},
+        ])
+        broadcaster = StatsBroadcaster(snapshot=snapshot, fallback_interval=60, debounce=0)
+        first, second = broadcaster.subscribe(), broadcaster.subscribe()
+        pool = FakePool()
+        await broadcaster.start(pool)
+        try:
+            for expected in ({'total': 1, 'active': 1}, {'total': 2}):
+                pool.conn.callback(None, 0, 'subscription_changes', '1')
+                self.assertEqual(await asyncio.wait_for(first.get(), 1), expected)
+                self.assertEqual(await asyncio.wait_for(second.get(), 1), expected)
+        finally:
+            await broadcaster.stop()
+        self.assertEqual(broadcaster.current, {'total': 2, 'active': 1})
+
+    async def test_slow_client_overflow_does_not_block_others(self):
+        broadcaster = StatsBroadcaster(snapshot=FakeSnapshot([]), client_queue_size=2)
+        slow, fast = broadcaster.subscribe(), broadcaster.subscribe()
+        received = []
+
+        async def consume():
+            while True:
+                received.append(await fast.get())
+
+        consumer = asyncio.create_task(consume())
+        deltas = [{'active': 1}, {'total': 5}, {'active': 2}, {'expired': 1}]
+        for delta in deltas:
+            broadcaster._publish(delta)
+            await asyncio.sleep(0)
+        consumer.cancel()
+
+        self.assertEqual(received, deltas)
+        # The slow client's queue stays bounded and keeps every field's latest value
+        self.assertLessEqual(slow.qsize(), 2)
+        latest = {}
+        while not slow.empty():
+            latest.update(slow.get_nowait())
+        self.assertEqual(latest, {'active': 2, 'total': 5, 'expired': 1})
+
+    async def test_unsubscribed_client_gets_nothing(self):
+        broadcaster = StatsBroadcaster(snapshot=FakeSnapshot([]))
+        queue = broadcaster.subscribe()
+        broadcaster.unsubscribe(queue)
+        broadcaster._publish({'active': 1})
+        self.assertTrue(queue.empty())
+        self.assertEqual(broadcaster.clients, 0)
+
+
+class TestFormatEvent(unittest.TestCase):
+    def test_event_carries_snapshot_time(self):
+        event = format_event('snapshot', {'total': 3}, datetime(2026, 1, 2, 3, 4, 5))
+        name, data = event.rstrip('\n').split('\n')
+        self.assertEqual(name, 'event: snapshot')
+        self.assertEqual(
+            json.loads(data[len('data: '):]),
+            {'data': {'total': 3}, 'updated_at': '2026-01-02T03:04:05'},
+        )
+        self.assertTrue(event.endswith('\n\n'))
+
+    def test_unknown_snapshot_time_is_null(self):
+        data = format_event('delta', {'active': 1}).split('\n')[1]
+        self.assertIsNone(json.loads(data[len('data: '):])['updated_at'])
+
+
+if __name__ == "__main__":
+    unittest.main()
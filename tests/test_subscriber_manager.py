@@ -4,6 +4,7 @@ import importlib
 import sys
 import os
 import types
+from datetime import datetime
 
 # Ensure the 'bot' package is importable
 ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
@@ -21,7 +22,17 @@ class FakeCursor:
     def __exit__(self, exc_type, exc_value, traceback):
         pass
 
+class FakeTransaction:
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        pass
+
 class FakeConn:
+    def transaction(self):
+        return FakeTransaction()
+
     async def execute(self, *args, **kwargs):
         pass
 
@@ -55,7 +66,7 @@ with patch('asyncpg.create_pool', side_effect=fake_create_pool):
         importlib.reload(sys.modules['bot.subscriber_manager'])
     else:
         import bot.subscriber_manager
-from bot.subscriber_manager import SubscriberManager
+from bot.subscriber_manager import PaymentLinkConsumed, SubscriberManager
 
 class TestSubscriberManager(unittest.IsolatedAsyncioTestCase):
     async def asyncSetUp(self):
@@ -65,16 +76,178 @@ class TestSubscriberManager(unittest.IsolatedAsyncioTestCase):
         self.manager = TestManager()
 
     async def test_add_subscriber_invite(self):
-        with patch('bot.subscriber_manager.Bot') as MockBot:
-            mock_bot = MockBot.return_value
-            mock_bot.export_chat_invite_link = AsyncMock(return_value='link')
-            mock_bot.send_message = AsyncMock()
-            with patch('bot.subscriber_manager.PLANS', {'trial': {'name': 'Trial', 'duration_days': 1}}), \
-                 patch('bot.subscriber_manager.CHANNELS', {'main': '@channel'}):
-                result = await self.manager.add_subscriber(user_id=1, plan_name='Trial')
-                self.assertTrue(result)
-                mock_bot.export_chat_invite_link.assert_called_with(chat_id='@channel')
-                mock_bot.send_message.assert_called_with(chat_id=1, text='Join @channel: link')
+        executed = []
+
+        class DummyConn(FakeConn):
+            async def execute(self, query, *args):
+                executed.append((query, args))
+
+        class DummyAcquire:
+            async def __aenter__(self):
+                return DummyConn()
+            async def __aexit__(self, exc_type, exc, tb):
+                pass
+
+        self.manager.pool.acquire = lambda: DummyAcquire()
+        with patch('bot.subscriber_manager.PLANS', {'trial': {'name': 'Trial', 'duration_days': 1}}), \
+             patch('bot.subscriber_manager.CHANNELS', {'main': '@channel'}):
+            result = await self.manager.add_subscriber(user_id=1, plan_name='Trial', confirmation='Paid')
+        self.assertTrue(result)
+        outbox = [args for query, args in executed if 'INSERT INTO outbox' in query]
+        self.assertEqual(outbox, [
+            ('message', '{"chat_id": 1, "text": "Paid"}', None),
+            ('invite', '{"user_id": 1, "channel_id": "@channel"}', None),
+        ])
+
+    async def test_add_subscriber_keys_outbox_by_transaction(self):
+        executed = []
+
+        class DummyConn(FakeConn):
+            async def execute(self, query, *args):
+                executed.append((query, args))
+
+        class DummyAcquire:
+            async def __aenter__(self):
+                return DummyConn()
+            async def __aexit__(self, exc_type, exc, tb):
+                pass
+
+        self.manager.pool.acquire = lambda: DummyAcquire()
+        plans = {'trial': {'name': 'Trial', 'price': '$1', 'duration_days': 1}}
+        with patch('bot.subscriber_manager.PLANS', plans), \
+             patch('bot.subscriber_manager.CHANNELS', {'main': '@channel'}):
+            await self.manager.add_subscriber(
+                user_id=1, plan_name='Trial', transaction_id='tx1', confirmation='Paid'
+            )
+        outbox = [(query, args) for query, args in executed if 'INSERT INTO outbox' in query]
+        self.assertEqual([args[2] for _, args in outbox], ['tx1:message', 'tx1:invite:@channel'])
+        self.assertTrue(all('ON CONFLICT (dedup_key) DO NOTHING' in query for query, _ in outbox))
+
+    async def test_add_subscriber_retry_after_commit_is_a_noop(self):
+        executed = []
+
+        class DummyConn(FakeConn):
+            async def execute(self, query, *args):
+                executed.append(query)
+
+            async def fetchval(self, query, *args):
+                # The link was consumed and the payment recorded by a prior attempt
+                if 'FROM payments' in query:
+                    return 1
+                return None
+
+        class DummyAcquire:
+            async def __aenter__(self):
+                return DummyConn()
+            async def __aexit__(self, exc_type, exc, tb):
+                pass
+
+        self.manager.pool.acquire = lambda: DummyAcquire()
+        with patch('bot.subscriber_manager.PLANS', {'trial': {'name': 'Trial', 'price': '$1', 'duration_days': 1}}), \
+             patch('bot.subscriber_manager.CHANNELS', {'main': '@channel'}):
+            self.assertTrue(await self.manager.add_subscriber(
+                user_id=4, plan_name='Trial', transaction_id='tx1', payment_nonce='n1'
+            ))
+        self.assertEqual(executed, [])
+
+    async def test_add_subscriber_records_payment(self):
+        executed = []
+
+        class DummyConn(FakeConn):
+            async def execute(self, query, *args):
+                executed.append((query, args))
+
+        class DummyAcquire:
+            async def __aenter__(self):
+                return DummyConn()
+            async def __aexit__(self, exc_type, exc, tb):
+                pass
+
+        self.manager.pool.acquire = lambda: DummyAcquire()
+        plans = {'monthly': {'name': 'Cloudy Month', 'price': '$24.99', 'duration_days': 30}}
+        with patch('bot.subscriber_manager.PLANS', plans), \
+             patch('bot.subscriber_manager.CHANNELS', {}):
+            await self.manager.add_subscriber(user_id=3, plan_name='Cloudy Month', transaction_id='tx9')
+        ledger = [args for query, args in executed if 'INSERT INTO payments' in query]
+        self.assertEqual(ledger, [('tx9', 3, 'Cloudy Month', 2499)])
+
+    async def test_add_subscriber_consumes_payment_link_once(self):
+        executed = []
+        consumed = set()
+
+        class DummyConn(FakeConn):
+            async def execute(self, query, *args):
+                executed.append(query)
+
+            async def fetchval(self, query, *args):
+                if 'UPDATE payment_links' in query:
+                    if args[0] in consumed:
+                        return None
+                    consumed.add(args[0])
+                    return args[0]
+                return None
+
+        class DummyAcquire:
+            async def __aenter__(self):
+                return DummyConn()
+            async def __aexit__(self, exc_type, exc, tb):
+                pass
+
+        self.manager.pool.acquire = lambda: DummyAcquire()
+        with patch('bot.subscriber_manager.PLANS', {'trial': {'name': 'Trial', 'duration_days': 1}}), \
+             patch('bot.subscriber_manager.CHANNELS', {}):
+            self.assertTrue(await self.manager.add_subscriber(user_id=4, plan_name='Trial', payment_nonce='n1'))
+            executed.clear()
+            with self.assertRaises(PaymentLinkConsumed):
+                await self.manager.add_subscriber(user_id=4, plan_name='Trial', payment_nonce='n1')
+        self.assertFalse(any('INSERT INTO subscribers' in q for q in executed))
+
+    async def test_add_subscriber_marks_user_active(self):
+        from bot.active_subscribers import active_subscribers
+        active_subscribers.discard(2)
+        with patch('bot.subscriber_manager.PLANS', {'trial': {'name': 'Trial', 'duration_days': 1}}), \
+             patch('bot.subscriber_manager.CHANNELS', {}):
+            self.assertFalse(active_subscribers.is_active(2))
+            await self.manager.add_subscriber(user_id=2, plan_name='Trial')
+            self.assertTrue(active_subscribers.is_active(2))
+
+    async def test_outbox_dispatcher_sends_and_retries(self):
+        from bot.outbox import OutboxDispatcher
+        executed = []
+
+        class DummyConn(FakeConn):
+            async def fetch(self, *args, **kwargs):
+                return [
+                    {'id': 2, 'kind': 'message', 'payload': '{"chat_id": 1, "text": "hi"}', 'attempts': 1},
+                    {'id': 1, 'kind': 'invite', 'payload': '{"user_id": 1, "channel_id": "@channel"}', 'attempts': 1},
+                ]
+            def transaction(self):
+                raise AssertionError('no transaction may span Telegram calls')
+            async def execute(self, query, *args):
+                executed.append((query, args))
+
+        class DummyAcquire:
+            async def __aenter__(self):
+                return DummyConn()
+            async def __aexit__(self, exc_type, exc, tb):
+                pass
+
+        manager = types.SimpleNamespace(pool=types.SimpleNamespace(acquire=lambda: DummyAcquire()))
+        bot = types.SimpleNamespace(
+            create_chat_invite_link=AsyncMock(return_value=types.SimpleNamespace(invite_link='link')),
+            send_message=AsyncMock(side_effect=[None, RuntimeError('boom')]),
+        )
+        dispatcher = OutboxDispatcher(manager=manager, bot=bot)
+
+        self.assertEqual(await dispatcher.drain_once(), 2)
+        bot.send_message.assert_any_call(chat_id=1, text='Join @channel: link')
+        bot.create_chat_invite_link.assert_awaited_once_with(
+            chat_id='@channel', name='user 1', creates_join_request=True
+        )
+        retry = [args for query, args in executed if 'next_attempt_at' in query]
+        self.assertEqual(retry, [(2, 'pending', 'boom', 5.0)])
+        done = [args for query, args in executed if "status='done'" in query]
+        self.assertEqual(done, [(1,)])
 
     async def test_record_and_get_users(self):
         class DummyConn(FakeConn):
@@ -100,5 +273,137 @@ class TestSubscriberManager(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(user['language'], 'en')
         self.assertEqual(user['status'], 'never')
 
+    async def test_get_expired_members(self):
+        class DummyConn(FakeConn):
+            async def fetch(self, query, *args, **kwargs):
+                self.query = query
+                return [{'channel_id': -100, 'user_id': 7}]
+
+        conn = DummyConn()
+
+        class DummyAcquire:
+            async def __aenter__(self):
+                return conn
+            async def __aexit__(self, exc_type, exc, tb):
+                pass
+
+        self.manager.pool.acquire = lambda: DummyAcquire()
+
+        members = await self.manager.get_expired_members()
+        self.assertEqual(members, [{'channel_id': -100, 'user_id': 7}])
+        self.assertIn('left_at IS NULL', conn.query)
+
+    async def test_iter_subscribers_streams_cursor(self):
+        class DummyConn(FakeConn):
+            def cursor(self, query, *args, prefetch=None):
+                self.query, self.args, self.prefetch = query, args, prefetch
+
+                async def rows():
+                    for user_id in (1, 2):
+                        yield {'user_id': user_id, 'plan': 'Trial'}
+                return rows()
+
+        conn = DummyConn()
+
+        class DummyAcquire:
+            async def __aenter__(self):
+                return conn
+            async def __aexit__(self, exc_type, exc, tb):
+                pass
+
+        self.manager.pool.acquire = lambda: DummyAcquire()
+
+        rows = [r async for r in self.manager.iter_subscribers(status='active', plan='Trial', prefetch=50)]
+        self.assertEqual([r['user_id'] for r in rows], [1, 2])
+        self.assertIn('s.expires_at > NOW()', conn.query)
+        self.assertEqual(conn.args, ('Trial', None, None))
+        self.assertEqual(conn.prefetch, 50)
+
+        with self.assertRaises(ValueError):
+            async for _ in self.manager.iter_subscribers(status='bogus'):
+                pass
+
+    async def test_search_subscribers_keyset(self):
+        class DummyConn(FakeConn):
+            async def fetch(self, query, *args, **kwargs):
+                self.query, self.args = query, args
+                return [{'user_id': 9}]
+
+        conn = DummyConn()
+
+        class DummyAcquire:
+            async def __aenter__(self):
+                return conn
+            async def __aexit__(self, exc_type, exc, tb):
+                pass
+
+        self.manager.pool.acquire = lambda: DummyAcquire()
+        after = (datetime(2024, 1, 1), 5)
+
+        rows = await self.manager.search_subscribers(plan='Monthly', after=after, limit=11)
+        self.assertEqual(rows, [{'user_id': 9}])
+        self.assertIn('(s.expires_at, s.user_id) > ($2, $3)', conn.query)
+        self.assertIn('ORDER BY s.expires_at, s.user_id', conn.query)
+        self.assertNotIn('OFFSET', conn.query)
+        self.assertEqual(conn.args, ('Monthly', datetime(2024, 1, 1), 5, 11))
+
+        await self.manager.search_subscribers(order='user_id', after=(None, 5))
+        self.assertIn('s.user_id > $1', conn.query)
+
+    async def test_expiring_within_is_a_range(self):
+        calls = []
+
+        class DummyConn(FakeConn):
+            async def fetchval(self, query, *args):
+                calls.append((query, args))
+                return 4
+
+            async def fetch(self, query, *args, **kwargs):
+                calls.append((query, args))
+                return [{'user_id': 3}]
+
+        class DummyAcquire:
+            async def __aenter__(self):
+                return DummyConn()
+            async def __aexit__(self, exc_type, exc, tb):
+                pass
+
+        self.manager.pool.acquire = lambda: DummyAcquire()
+
+        result = await self.manager.expiring_within(3, limit=10)
+        self.assertEqual(result, {'count': 4, 'subscribers': [{'user_id': 3}]})
+        (count_query, (start, end)), (page_query, page_args) = calls
+        self.assertIn('expires_at >= $1 AND expires_at < $2', count_query)
+        self.assertEqual((end - start).days, 3)
+        self.assertIn('s.expires_at >= $1', page_query)
+        self.assertIn('s.expires_at < $2', page_query)
+        self.assertEqual(page_args, (start, end, 10))
+
+        calls.clear()
+        result = await self.manager.expiring_within(3, count=False)
+        self.assertEqual(result, {'count': None, 'subscribers': []})
+        self.assertEqual(calls, [])
+
+    async def test_claim_webhook_only_once(self):
+        claimed = set()
+
+        class DummyConn(FakeConn):
+            async def fetchval(self, query, transaction_id, *args):
+                if transaction_id in claimed:
+                    return None
+                claimed.add(transaction_id)
+                return transaction_id
+
+        class DummyAcquire:
+            async def __aenter__(self):
+                return DummyConn()
+            async def __aexit__(self, exc_type, exc, tb):
+                pass
+
+        self.manager.pool.acquire = lambda: DummyAcquire()
+
+        self.assertTrue(await self.manager.claim_webhook('tx1', 1, 'trial'))
+        self.assertFalse(await self.manager.claim_webhook('tx1', 1, 'trial'))
+
 if __name__ == '__main__':
     unittest.main()
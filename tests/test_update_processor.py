@@ -0,0 +1,122 @@
+import asyncio
+import unittest
+import sys
+import os
+import types
+from typing import final
+from unittest.mock import patch
+
+ROOT_DIR = os.path.dirname(os.path.dirname(__file__))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+try:
+    from telegram.ext import BaseUpdateProcessor
+except ImportError:
+    # Same contract as python-telegram-bot's BaseUpdateProcessor, whose
+    # process_update is final: subclasses only implement do_process_update
+    class BaseUpdateProcessor:
+        def __init__(self, max_concurrent_updates):
+            self._semaphore = asyncio.BoundedSemaphore(max_concurrent_updates)
+
+        @final
+        async def process_update(self, update, coroutine):
+            async with self._semaphore:
+                await self.do_process_update(update, coroutine)
+
+with patch.dict(sys.modules, {'telegram.ext': types.SimpleNamespace(BaseUpdateProcessor=BaseUpdateProcessor)}):
+    from bot.update_processor import PerUserUpdateProcessor, ordering_key
+
+
+def update_from(user_id):
+    return types.SimpleNamespace(effective_user=types.SimpleNamespace(id=user_id), effective_chat=None)
+
+
+class TestPerUserUpdateProcessor(unittest.IsolatedAsyncioTestCase):
+    async def test_same_user_in_order_other_users_concurrent(self):
+        processor = PerUserUpdateProcessor(8)
+        events = []
+
+        async def handle(name, delay):
+            events.append(('start', name))
+            await asyncio.sleep(delay)
+            events.append(('end', name))
+
+        await asyncio.gather(
+            processor.process_update(update_from(1), handle('a1', 0.02)),
+            processor.process_update(update_from(1), handle('a2', 0)),
+            processor.process_update(update_from(2), handle('b1', 0)),
+        )
+
+        # a2 waits for a1; b1 does not
+        self.assertLess(events.index(('end', 'a1')), events.index(('start', 'a2')))
+        self.assertLess(events.index(('end', 'b1')), events.index(('end', 'a1')))
+        self.assertEqual(processor._queues, {})
+
+    async def test_flooding_user_does_not_block_others(self):
+        processor = PerUserUpdateProcessor(2)
+        release = asyncio.Event()
+        served = []
+
+        async def slow(name):
+            await release.wait()
+            served.append(name)
+
+        async def fast(name):
+            served.append(name)
+
+        flood = [
+            asyncio.create_task(processor.process_update(update_from(1), slow(f'a{i}')))
+            for i in range(10)
+        ]
+        await asyncio.sleep(0)
+        # The flood queues behind its own first update and holds one slot
+        await asyncio.wait_for(processor.process_update(update_from(2), fast('b1')), 0.5)
+        self.assertEqual(served, ['b1'])
+
+        release.set()
+        await asyncio.gather(*flood)
+        self.assertEqual(served, ['b1'] + [f'a{i}' for i in range(10)])
+        self.assertEqual(processor._queues, {})
+
+    def test_only_implements_the_extension_point(self):
+        self.assertIs(PerUserUpdateProcessor.process_update, BaseUpdateProcessor.process_update)
+
+    async def test_failed_update_does_not_stop_later_ones(self):
+        processor = PerUserUpdateProcessor(4)
+        done = []
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise RuntimeError('boom')
+
+        async def handle(name):
+            done.append(name)
+
+        with self.assertLogs('bot.update_processor', level='ERROR'):
+            await asyncio.gather(
+                processor.process_update(update_from(1), fail()),
+                processor.process_update(update_from(1), handle('a2')),
+            )
+        self.assertEqual(done, ['a2'])
+        self.assertEqual(processor._queues, {})
+
+    async def test_updates_without_user_are_not_serialized(self):
+        processor = PerUserUpdateProcessor(2)
+        update = types.SimpleNamespace(effective_user=None, effective_chat=None)
+        self.assertIsNone(ordering_key(update))
+        done = []
+
+        async def handle():
+            done.append(1)
+
+        await processor.process_update(update, handle())
+        self.assertEqual(done, [1])
+
+    def test_falls_back_to_chat(self):
+        update = types.SimpleNamespace(effective_user=None, effective_chat=types.SimpleNamespace(id=-100))
+        self.assertEqual(ordering_key(update), -100)
+
+
+if __name__ == '__main__':
+    unittest.main()